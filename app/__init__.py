@@ -3,26 +3,44 @@ from flask import Flask, redirect, url_for
 
 from .config import Config
 from .extensions import db
+from . import changes, columnar, database, events, filesending, health, metrics, migrations, profiling, querybudget, replicas, sla, stats
 
-# import blueprints
-from .upload_data.routes import upload_data_bp
-from .process_data.routes import process_data_bp
-from .defects.routes import defects_bp
-from .developer.routes import developer_bp
 
+def create_app(config_object=Config):
+    """Build the application.
 
-def create_app():
+    Importing the package does no work: there is no module-level ``app`` and
+    nothing here touches the database, so the Flask CLI, gunicorn and tests
+    all go through this factory (``FLASK_APP=app:create_app``). Heavy file
+    parsers (pygltflib, pypdf, pyarrow) load on the requests that need them.
+    """
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_object)
 
     db.init_app(app)
-
-    with app.app_context():
-        # Import models so SQLAlchemy knows about them before creating tables
-        from . import models
-        db.create_all()
+    metrics.init_app(app)
+    profiling.init_app(app)
+    querybudget.init_app(app)
+    database.init_app(app)
+    replicas.init_app(app)
+    changes.init_app(app)
+    stats.init_app(app)
+    columnar.init_app(app)
+    events.init_app(app)
+    sla.init_app(app)
+    migrations.init_app(app)
+    health.init_app(app)
+    filesending.init_app(app)
+
+    # The schema is created and upgraded at deploy time: `flask schema upgrade`
+    from . import models  # noqa: F401
 
     # register blueprints
+    from .upload_data.routes import upload_data_bp
+    from .process_data.routes import process_data_bp
+    from .defects.routes import defects_bp
+    from .developer.routes import developer_bp
+
     app.register_blueprint(upload_data_bp)
     app.register_blueprint(process_data_bp)
     app.register_blueprint(defects_bp)
@@ -33,5 +51,3 @@ def create_app():
         return redirect(url_for("defects.list_projects"))
 
     return app
-
-app = create_app()
\ No newline at end of file
@@ -0,0 +1,107 @@
+"""Conditional GET and response caching keyed on ``Scan.version``.
+
+Every defect write bumps its scan's version (see :mod:`app.changes`), so a
+read endpoint's output for a scan is fully determined by the version plus
+the request itself. :func:`scan_versioned` turns that into an ETag, answers
+matching ``If-None-Match`` requests with 304 and keeps rendered bodies in a
+small in-process LRU so repeat requests skip the database work entirely.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from typing import Hashable, Optional, Tuple
+
+from flask import abort, current_app, make_response, request, session
+
+from app.changes import scan_version
+
+CachedBody = Tuple[bytes, Optional[str], Tuple[str, ...]]
+
+
+class ResponseCache:
+    """Thread-safe LRU of rendered response bodies."""
+
+    def __init__(self):
+        self._entries: "OrderedDict[Hashable, CachedBody]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CachedBody]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, entry: CachedBody, max_entries: int) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+responses = ResponseCache()
+
+
+def _etag(scan_id: int, version: int, daily: bool) -> str:
+    variant = [request.full_path, request.headers.get("Accept", "")]
+    if daily:
+        variant.append(datetime.utcnow().date().isoformat())
+    digest = hashlib.sha1("\0".join(variant).encode("utf-8")).hexdigest()[:16]
+    return f"scan{scan_id}-v{version}-{digest}"
+
+
+def scan_versioned(daily: bool = False):
+    """Serve a per-scan view with ETags and a version-keyed response cache.
+
+    The view must take ``scan_id`` and depend only on that scan's data and the
+    request URL/Accept header. Pass ``daily=True`` for output that also depends
+    on today's date (e.g. "last 30 days" trends).
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(scan_id, **kwargs):
+            version = scan_version(scan_id)
+            if version is None:
+                abort(404)
+            # Pages carrying flash messages are one-off renders.
+            if session.get("_flashes"):
+                return view(scan_id, **kwargs)
+
+            etag = _etag(scan_id, version, daily)
+            if request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+            else:
+                key = (request.endpoint, etag)
+                cached = responses.get(key)
+                if cached is None:
+                    response = make_response(view(scan_id, **kwargs))
+                    if response.status_code != 200 or response.is_streamed:
+                        return response
+                    responses.put(
+                        key,
+                        (response.get_data(), response.headers.get("Content-Type"), tuple(response.vary)),
+                        current_app.config.get("RESPONSE_CACHE_MAX_ENTRIES", 256),
+                    )
+                else:
+                    body, content_type, vary = cached
+                    response = current_app.response_class(body, content_type=content_type)
+                    response.vary.update(vary)
+
+            response.set_etag(etag)
+            response.cache_control.no_cache = True
+            return response
+
+        return wrapper
+
+    return decorator
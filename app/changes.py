@@ -0,0 +1,131 @@
+"""Track which scans a database transaction touched.
+
+Defects are written from several blueprints (status edits, bulk updates,
+image assignment, ...). Rather than having every route remember to bump
+versions and invalidate caches, the listeners here collect the scan ids of
+every ``Defect`` inserted, updated or deleted when the session flushes,
+bump ``Scan.version`` for them in the same transaction and hand them to the
+registered callbacks once the transaction commits.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Callable, Dict, Generic, Iterable, List, Optional, Set, Tuple, TypeVar
+
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+_SESSION_KEY = "changed_scan_ids"
+
+_callbacks: List[Callable[[Set[int]], None]] = []
+
+T = TypeVar("T")
+
+
+def on_scans_changed(callback: Callable[[Set[int]], None]) -> Callable[[Set[int]], None]:
+    """Register *callback* to run with the changed scan ids after each commit."""
+    if callback not in _callbacks:
+        _callbacks.append(callback)
+    return callback
+
+
+def mark_scans_changed(session: Session, scan_ids: Iterable[int]) -> None:
+    """Bump the version of scans changed by bulk SQL that bypasses the unit of work."""
+    from app.models import Scan
+
+    scan_ids = {int(scan_id) for scan_id in scan_ids if scan_id is not None}
+    if not scan_ids:
+        return
+    scans = Scan.__table__
+    session.connection().execute(
+        scans.update().where(scans.c.id.in_(sorted(scan_ids))).values(version=scans.c.version + 1)
+    )
+    session.info.setdefault(_SESSION_KEY, set()).update(scan_ids)
+
+
+def scan_version(scan_id: int) -> Optional[int]:
+    """Return the version of *scan_id*, or ``None`` if the scan does not exist."""
+    from app.extensions import db
+    from app.models import Scan
+
+    return db.session.query(Scan.version).filter(Scan.id == scan_id).scalar()
+
+
+def _defect_scan_ids(obj) -> Set[int]:
+    scan_ids = {obj.scan_id}
+    # A defect moved between scans changes both of them.
+    history = inspect(obj).attrs.scan_id.history
+    scan_ids.update(history.deleted or ())
+    return {scan_id for scan_id in scan_ids if scan_id is not None}
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    from app.models import Defect
+
+    changed: Set[int] = set()
+    for obj in session.new:
+        if isinstance(obj, Defect):
+            changed.update(_defect_scan_ids(obj))
+    for obj in session.deleted:
+        if isinstance(obj, Defect):
+            changed.update(_defect_scan_ids(obj))
+    for obj in session.dirty:
+        if isinstance(obj, Defect) and session.is_modified(obj, include_collections=False):
+            changed.update(_defect_scan_ids(obj))
+    if changed:
+        mark_scans_changed(session, changed)
+
+
+def _after_commit(session: Session) -> None:
+    scan_ids = session.info.pop(_SESSION_KEY, None)
+    if not scan_ids:
+        return
+    for callback in list(_callbacks):
+        try:
+            callback(set(scan_ids))
+        except Exception:  # noqa: BLE001 - a cache hook must never fail a commit
+            current_app.logger.exception("Scan change callback %r failed", callback)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+class ScanCache(Generic[T]):
+    """Per-scan values built on demand and rebuilt when the scan's version moves.
+
+    Keying on the stored version keeps every worker process correct, not only
+    the one that made the write; the commit callback merely frees memory early.
+    """
+
+    def __init__(self, build: Callable[[int], T]):
+        self._build = build
+        self._values: Dict[int, Tuple[Optional[int], T]] = {}
+        self._lock = threading.Lock()
+        on_scans_changed(self.invalidate)
+
+    def get(self, scan_id: int) -> T:
+        version = scan_version(scan_id)
+        with self._lock:
+            cached = self._values.get(scan_id)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        value = self._build(scan_id)
+        with self._lock:
+            self._values[scan_id] = (version, value)
+        return value
+
+    def invalidate(self, scan_ids: Set[int]) -> None:
+        with self._lock:
+            for scan_id in scan_ids:
+                self._values.pop(scan_id, None)
+
+
+def init_app(app) -> None:
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_rollback", _after_rollback)
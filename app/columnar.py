@@ -0,0 +1,223 @@
+"""Typed columnar (Parquet / Arrow IPC) export of defects, scans and activity.
+
+Rows are read from the database in batches and each batch becomes one
+Arrow record batch, i.e. one Parquet row group or one IPC stream message,
+so exports never materialise a whole table in memory and can be streamed
+straight into an HTTP response. Coordinates are float64, timestamps are
+Arrow timestamps and low-cardinality text columns (status, severity, ...)
+are dictionary encoded, which pandas/polars read back as categoricals.
+
+``pyarrow`` is an optional dependency, imported on first export rather
+than with the app; without it :func:`iter_export` raises ``RuntimeError``
+and the routes answer 501.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence
+
+import click
+from flask.cli import with_appcontext
+
+from app.developer.export import scope_name
+from app.extensions import db
+from app.models import ActivityLog, Defect, Scan
+
+# Bound by _require_pyarrow() on first use.
+pa = None
+pq = None
+
+BATCH_SIZE = 50_000
+
+
+class Format(NamedTuple):
+    extension: str
+    mimetype: str
+
+
+FORMATS: Dict[str, Format] = {
+    "parquet": Format(".parquet", "application/vnd.apache.parquet"),
+    # The stream flavour of IPC, so dictionaries may differ between batches.
+    "arrow": Format(".arrows", "application/vnd.apache.arrow.stream"),
+}
+
+# name -> (column, arrow type name); "category" is dictionary-encoded text.
+_DATASETS: Dict[str, List[tuple]] = {
+    "defects": [
+        ("id", Defect.id, "int64"),
+        ("scan_id", Defect.scan_id, "int64"),
+        ("x", Defect.x, "float64"),
+        ("y", Defect.y, "float64"),
+        ("z", Defect.z, "float64"),
+        ("element", Defect.element, "string"),
+        ("location", Defect.location, "category"),
+        ("defect_type", Defect.defect_type, "category"),
+        ("severity", Defect.severity, "category"),
+        ("priority", Defect.priority, "category"),
+        ("status", Defect.status, "category"),
+        ("description", Defect.description, "string"),
+        ("notes", Defect.notes, "string"),
+        ("image_path", Defect.image_path, "string"),
+        ("created_at", Defect.created_at, "timestamp"),
+    ],
+    "scans": [
+        ("id", Scan.id, "int64"),
+        ("name", Scan.name, "string"),
+        ("model_path", Scan.model_path, "string"),
+        ("created_at", Scan.created_at, "timestamp"),
+        ("version", Scan.version, "int64"),
+    ],
+    "activity": [
+        ("id", ActivityLog.id, "int64"),
+        ("defect_id", ActivityLog.defect_id, "int64"),
+        ("scan_id", ActivityLog.scan_id, "int64"),
+        ("action", ActivityLog.action, "category"),
+        ("old_value", ActivityLog.old_value, "string"),
+        ("new_value", ActivityLog.new_value, "string"),
+        ("timestamp", ActivityLog.timestamp, "timestamp"),
+    ],
+}
+DATASETS = tuple(_DATASETS)
+
+# Column each dataset is filtered on when exporting selected scans.
+_SCAN_COLUMNS = {"defects": Defect.scan_id, "scans": Scan.id, "activity": ActivityLog.scan_id}
+_ORDER = {"defects": Defect.id, "scans": Scan.id, "activity": ActivityLog.id}
+
+
+def available() -> bool:
+    return pa is not None or importlib.util.find_spec("pyarrow") is not None
+
+
+def _require_pyarrow() -> None:
+    global pa, pq
+    if pa is not None:
+        return
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:  # pragma: no cover - optional dependency
+        raise RuntimeError("pyarrow is not installed; run `pip install pyarrow` to export Parquet/Arrow.") from None
+    pa, pq = pyarrow, pyarrow.parquet
+
+
+def _arrow_type(kind: str):
+    if kind == "category":
+        return pa.dictionary(pa.int32(), pa.string())
+    if kind == "timestamp":
+        return pa.timestamp("us")
+    return getattr(pa, kind)()
+
+
+def schema(dataset: str):
+    """Arrow schema of *dataset*."""
+    _require_pyarrow()
+    return pa.schema([(name, _arrow_type(kind)) for name, _, kind in _DATASETS[dataset]])
+
+
+def _array(values: Sequence, kind: str):
+    if kind == "category":
+        return pa.array(values, type=pa.string()).dictionary_encode()
+    return pa.array(values, type=_arrow_type(kind))
+
+
+def iter_batches(dataset: str, scan_ids: Optional[Sequence[int]] = None,
+                 batch_size: int = BATCH_SIZE) -> Iterator:
+    """Yield ``pyarrow.RecordBatch`` objects of *dataset*, *batch_size* rows each."""
+    _require_pyarrow()
+    columns = _DATASETS[dataset]
+    arrow_schema = schema(dataset)
+    query = db.select(*[column for _, column, _ in columns]).order_by(_ORDER[dataset])
+    if scan_ids is not None:
+        query = query.where(_SCAN_COLUMNS[dataset].in_(list(scan_ids)))
+
+    result = db.session.execute(query.execution_options(yield_per=batch_size))
+    for rows in result.partitions():
+        arrays = [_array([row[i] for row in rows], kind) for i, (_, _, kind) in enumerate(columns)]
+        yield pa.RecordBatch.from_arrays(arrays, schema=arrow_schema)
+
+
+class _ChunkSink:
+    """Write-only file object whose contents are drained after every batch."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _writer(fmt: str, sink: _ChunkSink, arrow_schema):
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, arrow_schema, compression="snappy")
+        return writer.write_batch, writer.close
+    writer = pa.ipc.new_stream(sink, arrow_schema)
+    return writer.write_batch, writer.close
+
+
+def iter_export(dataset: str, fmt: str, scan_ids: Optional[Sequence[int]] = None,
+                batch_size: int = BATCH_SIZE) -> Iterator[bytes]:
+    """Yield the bytes of *dataset* encoded as *fmt*, one row group at a time."""
+    _require_pyarrow()
+    if dataset not in _DATASETS:
+        raise ValueError(f"Unknown dataset {dataset!r}; expected one of {', '.join(DATASETS)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
+
+    sink = _ChunkSink()
+    write_batch, close = _writer(fmt, sink, schema(dataset))
+    for batch in iter_batches(dataset, scan_ids, batch_size):
+        write_batch(batch)
+        chunk = sink.drain()
+        if chunk:
+            yield chunk
+    close()
+    yield sink.drain()
+
+
+def filename(dataset: str, fmt: str, scan_ids: Optional[Sequence[int]] = None) -> str:
+    return f"{scope_name(list(scan_ids) if scan_ids else None)}_{dataset}{FORMATS[fmt].extension}"
+
+
+@click.command("export-columnar")
+@click.argument("dataset", type=click.Choice(DATASETS))
+@click.option("--format", "fmt", type=click.Choice(list(FORMATS)), default="parquet", show_default=True)
+@click.option("--scan-id", "scan_ids", type=int, multiple=True, help="Limit to these scans (repeatable); default all.")
+@click.option("--batch-size", type=int, default=BATCH_SIZE, show_default=True, help="Rows per row group.")
+@click.option("-o", "--output", type=click.Path(dir_okay=False, writable=True), help="Output file; default derived from the dataset.")
+@with_appcontext
+def export_command(dataset: str, fmt: str, scan_ids: Sequence[int], batch_size: int, output: Optional[str]) -> None:
+    """Export defects, scans or activity to Parquet or Arrow IPC."""
+    try:
+        _require_pyarrow()
+    except RuntimeError as exc:
+        raise click.ClickException(str(exc))
+    output = output or filename(dataset, fmt, scan_ids)
+    written = 0
+    with open(output, "wb") as fh:
+        for chunk in iter_export(dataset, fmt, scan_ids or None, batch_size):
+            written += fh.write(chunk)
+    click.echo(f"Wrote {output} ({written} bytes).")
+
+
+def init_app(app) -> None:
+    app.cli.add_command(export_command)
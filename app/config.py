@@ -1,6 +1,57 @@
 import os
 
+from .replicas import replica_binds
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _engine_options(uri):
+    options = {
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+    # SQLite runs in-process; sizing a connection pool only matters for a server database.
+    if not uri.startswith('sqlite'):
+        options.update(
+            pool_size=int(os.environ.get('DB_POOL_SIZE', 5)),
+            max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+            pool_timeout=int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        )
+    return options
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///ldms.db'
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
+    # Comma-separated read replica URLs; GET requests read from them (app/replicas.py)
+    SQLALCHEMY_BINDS = replica_binds(os.environ.get('DATABASE_REPLICA_URLS'))
+    # After a write, the client reads from the primary this long to see its own changes
+    REPLICA_STICKY_SECONDS = float(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+    # cProfile a fraction of requests into instance/profiles (app/profiling.py); requests with a
+    # signed X-Profile header (`flask profiling token`) are profiled even when this is off
+    PROFILING_ENABLED = _env_bool('PROFILING_ENABLED', False)
+    PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0.01))
+    PROFILING_MAX_FILES = int(os.environ.get('PROFILING_MAX_FILES', 200))
+    PROFILING_TOKEN_MAX_AGE = int(os.environ.get('PROFILING_TOKEN_MAX_AGE', 3600))
+    # SQL statements per request over a view's @query_budget: off, warn (log) or raise (tests)
+    QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE') or 'off'
+    # Model/image downloads: direct, x-accel-redirect (nginx, see nginx.conf) or x-sendfile (app/filesending.py)
+    FILE_SERVING = os.environ.get('FILE_SERVING') or 'direct'
+    # nginx internal location that aliases the instance folder
+    FILE_SERVING_ACCEL_PREFIX = os.environ.get('FILE_SERVING_ACCEL_PREFIX') or '/_files/'
+    # Applied to every SQLite connection: WAL lets readers run alongside the writer
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 256))
+    # 'local' (default, one process) or a redis:// URL to share change events between workers
+    EVENTS_BROKER_URL = os.environ.get('EVENTS_BROKER_URL') or 'local'
+    EVENTS_HEARTBEAT_SECONDS = float(os.environ.get('EVENTS_HEARTBEAT_SECONDS', 15))
+    # Open SSE streams per process (0 = unlimited); gunicorn.conf.py adds this many threads per worker for them
+    EVENTS_MAX_STREAMS = int(os.environ.get('EVENTS_MAX_STREAMS', 25))
@@ -0,0 +1,48 @@
+"""Per-connection database settings and engine housekeeping for serving.
+
+SQLite connections get ``journal_mode`` (WAL by default, so readers do not
+block behind the writer) and ``busy_timeout`` (a writer waits for the lock
+instead of failing with "database is locked" straight away). Server
+databases are tuned through ``SQLALCHEMY_ENGINE_OPTIONS`` in the config.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import event
+
+from app.extensions import db
+
+
+def _sqlite_pragmas(journal_mode: str, busy_timeout_ms: int):
+    def on_connect(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+            cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+            if journal_mode.upper() == "WAL":
+                # Durable at checkpoints; the usual pairing with WAL.
+                cursor.execute("PRAGMA synchronous = NORMAL")
+        finally:
+            cursor.close()
+
+    return on_connect
+
+
+def dispose_engines(app) -> None:
+    """Drop pooled connections inherited from a parent process (call after fork).
+
+    ``close=False`` leaves the parent's sockets alone; the child just stops
+    using them and opens its own on first checkout.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def init_app(app) -> None:
+    journal_mode = app.config.get("SQLITE_JOURNAL_MODE", "WAL")
+    busy_timeout_ms = app.config.get("SQLITE_BUSY_TIMEOUT_MS", 5000)
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == "sqlite":
+                event.listen(engine, "connect", _sqlite_pragmas(journal_mode, busy_timeout_ms))
@@ -0,0 +1,217 @@
+"""Apply many defect create/update/delete operations in one transaction.
+
+Operations are validated up front; if any of them is invalid nothing is
+written. Otherwise creates, updates and deletes each go to the database as
+one bulk statement, together with one bulk insert of the resulting
+``ActivityLog`` rows and one update of the scan's ``scan_stats`` row.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from app import events
+from app.changes import mark_scans_changed
+from app.extensions import db
+from app.models import ActivityLog, Defect, DefectPriority, DefectSeverity, DefectStatus
+from app.stats import StatsDelta
+
+MAX_OPERATIONS = 5000
+
+CREATE_DEFAULTS = {
+    "x": 0,
+    "y": 0,
+    "z": 0,
+    "element": "",
+    "location": "",
+    "defect_type": "Unknown",
+    "severity": DefectSeverity.MEDIUM.value,
+    "priority": DefectPriority.MEDIUM.value,
+    "description": "",
+    "status": DefectStatus.REPORTED.value,
+    "notes": "",
+}
+UPDATABLE_FIELDS = ("status", "priority", "severity", "notes", "location", "defect_type")
+CHOICES = {
+    "status": {e.value for e in DefectStatus},
+    "priority": {e.value for e in DefectPriority},
+    "severity": {e.value for e in DefectSeverity},
+}
+# Field changes recorded in the activity log, as on the developer pages.
+LOGGED_FIELDS = {
+    "status": "status updated (batch)",
+    "priority": "priority updated (batch)",
+}
+
+
+class BatchError(ValueError):
+    """Raised when the request body is not a list of operations at all."""
+
+
+def _check_choices(data: Dict[str, Any]) -> None:
+    for field, allowed in CHOICES.items():
+        if field in data and data[field] not in allowed:
+            raise ValueError(f"Invalid {field}: {data[field]!r}")
+
+
+def _validate(index: int, operation: Any) -> Dict[str, Any]:
+    if not isinstance(operation, dict):
+        raise ValueError("Operation must be an object")
+    op = operation.get("op")
+    data = operation.get("data") or {}
+    if not isinstance(data, dict):
+        raise ValueError('"data" must be an object')
+
+    if op == "create":
+        values = dict(CREATE_DEFAULTS)
+        values.update({key: data[key] for key in CREATE_DEFAULTS if key in data})
+        try:
+            for axis in ("x", "y", "z"):
+                values[axis] = float(values[axis])
+        except (TypeError, ValueError):
+            raise ValueError("Coordinates must be numbers")
+        _check_choices(values)
+        return {"index": index, "op": op, "values": values}
+
+    if op in ("update", "delete"):
+        try:
+            defect_id = int(operation.get("id"))
+        except (TypeError, ValueError):
+            raise ValueError('"id" must be a defect id')
+        if op == "delete":
+            return {"index": index, "op": op, "id": defect_id}
+        values = {key: data[key] for key in UPDATABLE_FIELDS if key in data}
+        if not values:
+            raise ValueError(f"Nothing to update; allowed fields: {', '.join(UPDATABLE_FIELDS)}")
+        _check_choices(values)
+        return {"index": index, "op": op, "id": defect_id, "values": values}
+
+    raise ValueError('"op" must be one of create, update, delete')
+
+
+def apply_batch(scan_id: int, operations: Any) -> Tuple[bool, List[Dict[str, Any]]]:
+    """Validate and apply *operations* to *scan_id*.
+
+    Returns ``(ok, results)`` with one result per operation. When ``ok`` is
+    false the results explain which operations were rejected and the
+    transaction has not been touched.
+    """
+    if not isinstance(operations, list):
+        raise BatchError('"operations" must be a list')
+    if len(operations) > MAX_OPERATIONS:
+        raise BatchError(f"At most {MAX_OPERATIONS} operations per batch")
+
+    parsed: List[Dict[str, Any]] = []
+    results: List[Dict[str, Any]] = []
+    for index, operation in enumerate(operations):
+        try:
+            parsed.append(_validate(index, operation))
+            results.append({"index": index, "op": operation.get("op"), "ok": True})
+        except ValueError as exc:
+            op = operation.get("op") if isinstance(operation, dict) else None
+            results.append({"index": index, "op": op, "ok": False, "error": str(exc)})
+
+    # One query for every defect the batch updates or deletes.
+    target_ids = {item["id"] for item in parsed if item["op"] != "create"}
+    current: Dict[int, Dict[str, Any]] = {}
+    if target_ids:
+        rows = (
+            db.session.query(Defect.id, *[getattr(Defect, field) for field in UPDATABLE_FIELDS])
+            .filter(Defect.scan_id == scan_id, Defect.id.in_(target_ids))
+            .all()
+        )
+        current = {row[0]: dict(zip(UPDATABLE_FIELDS, row[1:])) for row in rows}
+    original = {defect_id: dict(values) for defect_id, values in current.items()}
+
+    deleted = set()
+    for item in parsed:
+        if item["op"] == "create":
+            continue
+        result = results[item["index"]]
+        result["id"] = item["id"]
+        if item["id"] not in current:
+            result.update(ok=False, error=f"Defect {item['id']} not found in scan {scan_id}")
+        elif item["id"] in deleted:
+            result.update(ok=False, error=f"Defect {item['id']} is deleted earlier in the batch")
+        elif item["op"] == "delete":
+            deleted.add(item["id"])
+
+    if not all(result["ok"] for result in results):
+        return False, results
+
+    creates = [item for item in parsed if item["op"] == "create"]
+    deletes = sorted(deleted)
+    activities: List[Dict[str, Any]] = []
+
+    # Later updates to the same defect win, like sequential PUTs would.
+    updates: Dict[int, Dict[str, Any]] = {}
+    for item in parsed:
+        if item["op"] == "update" and item["id"] not in deleted:
+            before = current[item["id"]]
+            for field, action in LOGGED_FIELDS.items():
+                new_value = item["values"].get(field)
+                old_value = before[field] or (DefectPriority.MEDIUM.value if field == "priority" else None)
+                if new_value is not None and new_value != old_value:
+                    activities.append({
+                        "defect_id": item["id"], "scan_id": scan_id, "action": action,
+                        "old_value": old_value, "new_value": new_value,
+                    })
+            before.update(item["values"])
+            updates.setdefault(item["id"], {"id": item["id"]}).update(item["values"])
+
+    if creates:
+        created_ids = db.session.scalars(
+            db.insert(Defect).returning(Defect.id, sort_by_parameter_order=True),
+            [dict(item["values"], scan_id=scan_id) for item in creates],
+        ).all()
+        for item, defect_id in zip(creates, created_ids):
+            results[item["index"]]["id"] = defect_id
+            activities.append({
+                "defect_id": defect_id, "scan_id": scan_id, "action": "defect created (batch)",
+                "old_value": None, "new_value": item["values"]["status"],
+            })
+
+    if updates:
+        now = datetime.utcnow()
+        rows = []
+        for defect_id, values in updates.items():
+            row = dict(values, updated_at=now)
+            if current[defect_id]["status"] != original[defect_id]["status"]:
+                row["status_changed_at"] = now
+            rows.append(row)
+        db.session.execute(db.update(Defect), rows)
+
+    if deletes:
+        # Keep the history but detach it, as deleting through the ORM does.
+        db.session.execute(
+            db.update(ActivityLog).where(ActivityLog.defect_id.in_(deletes)).values(defect_id=None)
+        )
+        db.session.execute(db.delete(Defect).where(Defect.id.in_(deletes)))
+        activities.extend({
+            "defect_id": None, "scan_id": scan_id, "action": "defect deleted (batch)",
+            "old_value": f"#{defect_id}", "new_value": None,
+        } for defect_id in deletes)
+
+    if activities:
+        db.session.execute(db.insert(ActivityLog), activities)
+
+    delta = StatsDelta()
+    delta.touch(scan_id)
+    for item in creates:
+        values = item["values"]
+        delta.add(scan_id, values["status"], values["priority"], values["severity"])
+    for defect_id in list(updates) + deletes:
+        before = original[defect_id]
+        delta.add(scan_id, before["status"], before["priority"], before["severity"], sign=-1)
+    for defect_id in updates:
+        after = current[defect_id]
+        delta.add(scan_id, after["status"], after["priority"], after["severity"])
+    delta.apply(db.session.connection())
+
+    mark_scans_changed(db.session, [scan_id])
+    events.record(db.session, scan_id, events.CREATED, [results[item["index"]]["id"] for item in creates])
+    events.record(db.session, scan_id, events.UPDATED, updates,
+                  {field for values in updates.values() for field in values if field != "id"})
+    events.record(db.session, scan_id, events.DELETED, deletes)
+    return True, results
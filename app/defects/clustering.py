@@ -0,0 +1,149 @@
+"""Level-of-detail clustering of a scan's defects for the 3D viewer.
+
+Level 0 is a single voxel covering the whole scan; every following level
+halves the voxel edge. Defects sharing a voxel collapse into one cluster
+marker carrying the centroid, the number of defects and the worst severity
+among them. Levels are computed lazily and cached per scan, so a viewer
+zooming in only pays for the finer levels it actually requests.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.changes import ScanCache
+from app.extensions import db
+from app.models import Defect, DefectSeverity
+
+MAX_LEVEL = 20
+
+# Higher rank means worse, matching the severity sort on the scan detail page.
+SEVERITY_RANK = {
+    DefectSeverity.LOW.value: 1,
+    DefectSeverity.MEDIUM.value: 2,
+    DefectSeverity.HIGH.value: 3,
+    DefectSeverity.CRITICAL.value: 4,
+}
+_RANK_TO_SEVERITY = {rank: name for name, rank in SEVERITY_RANK.items()}
+
+
+class ClusterLevel:
+    """Clusters of one level, stored column-wise."""
+
+    def __init__(self, cell_size: float, centroids: np.ndarray, counts: np.ndarray,
+                 worst: np.ndarray, first_ids: np.ndarray):
+        self.cell_size = cell_size
+        self.centroids = centroids
+        self.counts = counts
+        self.worst = worst
+        self.first_ids = first_ids
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def to_dicts(self, lower: Optional[Iterable[float]] = None,
+                 upper: Optional[Iterable[float]] = None) -> List[dict]:
+        selected = np.arange(len(self))
+        if lower is not None and upper is not None:
+            inside = np.all((self.centroids >= np.asarray(lower)) & (self.centroids <= np.asarray(upper)), axis=1)
+            selected = selected[inside]
+
+        clusters = []
+        for pos in selected:
+            x, y, z = (float(axis) for axis in self.centroids[pos])
+            count = int(self.counts[pos])
+            cluster = {
+                "x": x,
+                "y": y,
+                "z": z,
+                "count": count,
+                "severity": _RANK_TO_SEVERITY.get(int(self.worst[pos])),
+            }
+            if count == 1:
+                cluster["defectId"] = int(self.first_ids[pos])
+            clusters.append(cluster)
+        return clusters
+
+
+class ClusterHierarchy:
+    """Voxel clusters of one scan at every level of detail."""
+
+    def __init__(self, ids: np.ndarray, points: np.ndarray, severity_ranks: np.ndarray):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        self.ranks = np.asarray(severity_ranks, dtype=np.int64)
+        if len(self.ids):
+            self.lower = self.points.min(axis=0)
+            extent = float((self.points.max(axis=0) - self.lower).max())
+        else:
+            self.lower = np.zeros(3)
+            extent = 0.0
+        # Pad so the farthest defect still falls inside the single level-0 voxel.
+        self.root_size = extent * (1 + 1e-9) if extent > 0 else 1.0
+        self._levels: Dict[int, ClusterLevel] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def cell_size(self, level: int) -> float:
+        return self.root_size / (1 << level)
+
+    def level_for_cell_size(self, cell_size: float) -> int:
+        """Return the coarsest level whose voxels are no larger than *cell_size*."""
+        if cell_size <= 0:
+            return MAX_LEVEL
+        level = int(np.ceil(np.log2(self.root_size / cell_size)))
+        return min(max(level, 0), MAX_LEVEL)
+
+    def level(self, level: int) -> ClusterLevel:
+        level = min(max(int(level), 0), MAX_LEVEL)
+        with self._lock:
+            cached = self._levels.get(level)
+        if cached is None:
+            cached = self._compute(level)
+            with self._lock:
+                self._levels[level] = cached
+        return cached
+
+    def _compute(self, level: int) -> ClusterLevel:
+        cell_size = self.cell_size(level)
+        if not len(self):
+            empty = np.empty(0, dtype=np.int64)
+            return ClusterLevel(cell_size, np.empty((0, 3)), empty, empty, empty)
+
+        cells = np.floor((self.points - self.lower) / cell_size).astype(np.int64)
+        _, inverse, counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+        inverse = inverse.reshape(-1)
+
+        centroids = np.stack(
+            [np.bincount(inverse, weights=self.points[:, axis]) for axis in range(3)], axis=1
+        ) / counts[:, None]
+        worst = np.zeros(len(counts), dtype=np.int64)
+        np.maximum.at(worst, inverse, self.ranks)
+        first_ids = np.zeros(len(counts), dtype=np.int64)
+        first_ids[inverse[::-1]] = self.ids[::-1]
+        return ClusterLevel(cell_size, centroids, counts, worst, first_ids)
+
+
+def _build_hierarchy(scan_id: int) -> ClusterHierarchy:
+    rows = (
+        db.session.query(Defect.id, Defect.x, Defect.y, Defect.z, Defect.severity)
+        .filter(Defect.scan_id == scan_id)
+        .all()
+    )
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    points = np.array([row[1:4] for row in rows], dtype=np.float64).reshape(-1, 3)
+    ranks = np.fromiter((SEVERITY_RANK.get(row[4], 0) for row in rows), dtype=np.int64, count=len(rows))
+    return ClusterHierarchy(ids, points, ranks)
+
+
+_hierarchies: ScanCache[ClusterHierarchy] = ScanCache(_build_hierarchy)
+
+
+def get_hierarchy(scan_id: int) -> ClusterHierarchy:
+    """Return the cached cluster hierarchy for *scan_id*, building it if needed."""
+    return _hierarchies.get(scan_id)
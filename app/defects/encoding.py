@@ -0,0 +1,106 @@
+"""Compact binary columnar encodings for the 3D viewer.
+
+Layout (all integers little-endian)::
+
+    b"PCDC"                 magic
+    uint32 format version   currently 1
+    uint32 header length    bytes of UTF-8 JSON that follow
+    JSON header             space-padded so the body starts 4-byte aligned
+    body                    column buffers, each starting 4-byte aligned
+
+The header lists ``count`` (rows per column) and one entry per column with
+its ``name``, ``type`` (``int32``, ``float32``, ``uint8``, ``uint16`` or
+``uint32``), ``offset`` and ``length`` in bytes relative to the body.
+Columns with ``components`` hold that many interleaved values per row, so
+the defect ``position`` column is ``count * 3`` float32 x/y/z values ready to
+wrap in a ``Float32Array``. Categorical columns carry a ``dictionary`` array
+and store one code per row indexing into it (``null`` for missing values).
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+MIMETYPE = "application/vnd.pcd.defect-columns"
+VOXEL_MIMETYPE = "application/vnd.pcd.voxel-columns"
+MAGIC = b"PCDC"
+FORMAT_VERSION = 1
+
+CATEGORICAL_COLUMNS = ("status", "severity", "defect_type", "element", "location", "description", "created_at")
+
+
+def _pad(data: bytes, fill: bytes = b"\0") -> bytes:
+    return data + fill * (-len(data) % 4)
+
+
+def _dictionary_encode(values: Sequence[Optional[str]]):
+    dictionary: List[Optional[str]] = []
+    positions: Dict[Optional[str], int] = {}
+    codes = np.empty(len(values), dtype=np.uint32)
+    for pos, value in enumerate(values):
+        code = positions.get(value)
+        if code is None:
+            code = positions[value] = len(dictionary)
+            dictionary.append(value)
+        codes[pos] = code
+
+    if len(dictionary) <= 1 << 8:
+        dtype, name = "<u1", "uint8"
+    elif len(dictionary) <= 1 << 16:
+        dtype, name = "<u2", "uint16"
+    else:
+        dtype, name = "<u4", "uint32"
+    return dictionary, codes.astype(dtype), name
+
+
+class _ColumnWriter:
+    def __init__(self):
+        self.columns: List[Dict[str, Any]] = []
+        self.buffers: List[bytes] = []
+        self.offset = 0
+
+    def add(self, name: str, type_name: str, buffer: bytes, **extra: Any) -> None:
+        self.columns.append({"name": name, "type": type_name, "offset": self.offset, "length": len(buffer), **extra})
+        padded = _pad(buffer)
+        self.buffers.append(padded)
+        self.offset += len(padded)
+
+    def to_bytes(self, **header: Any) -> bytes:
+        encoded = _pad(json.dumps(dict(header, columns=self.columns)).encode("utf-8"), b" ")
+        return MAGIC + struct.pack("<II", FORMAT_VERSION, len(encoded)) + encoded + b"".join(self.buffers)
+
+
+def encode_defects(ids: Sequence[int], positions: Sequence[Sequence[float]],
+                   categorical: Dict[str, Sequence[Optional[str]]]) -> bytes:
+    """Pack defect columns into the binary layout described above."""
+    count = len(ids)
+    writer = _ColumnWriter()
+    writer.add("id", "int32", np.asarray(ids, dtype="<i4").tobytes())
+    writer.add("position", "float32", np.asarray(positions, dtype="<f4").reshape(-1, 3).tobytes(), components=3)
+    for name in CATEGORICAL_COLUMNS:
+        dictionary, codes, type_name = _dictionary_encode(categorical.get(name) or [None] * count)
+        writer.add(name, type_name, codes.tobytes(), dictionary=dictionary)
+    return writer.to_bytes(count=count)
+
+
+def encode_voxels(origin: Sequence[float], voxel_size: float, dims: Sequence[int],
+                  cells: np.ndarray, counts: np.ndarray, values: np.ndarray) -> bytes:
+    """Pack a sparse voxel grid: int32 ``cell`` triples, uint32 ``count``, float32 ``value``.
+
+    The header adds ``origin``, ``voxel_size`` and ``dims``; voxel ``(i, j, k)``
+    spans ``origin + (i, j, k) * voxel_size`` to one voxel further on each axis.
+    """
+    writer = _ColumnWriter()
+    writer.add("cell", "int32", np.asarray(cells, dtype="<i4").reshape(-1, 3).tobytes(), components=3)
+    writer.add("count", "uint32", np.asarray(counts, dtype="<u4").tobytes())
+    writer.add("value", "float32", np.asarray(values, dtype="<f4").tobytes())
+    return writer.to_bytes(
+        count=len(counts),
+        origin=[float(axis) for axis in origin],
+        voxel_size=float(voxel_size),
+        dims=[int(axis) for axis in dims],
+    )
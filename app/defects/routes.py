@@ -1,21 +1,33 @@
-from flask import Blueprint, jsonify, request, send_from_directory, abort, render_template, url_for, current_app
+from flask import Blueprint, jsonify, request, abort, render_template, url_for, current_app
+from app import events
+from app.caching import scan_versioned
 from app.extensions import db
-from app.models import Defect, Scan
+from app.filesending import send_file_from
+from app.models import Defect, Scan, ScanStats
+from app.querybudget import query_budget
+from . import batch, clustering, encoding, spatial, voxels
 import os
 import json
+import math
 from datetime import datetime
 
 defects_bp = Blueprint('defects', __name__)
 
 @defects_bp.route('/projects', methods=['GET'])
+@query_budget(1)
 def list_projects():
     """List all scans/projects in the database"""
-    scans = Scan.query.order_by(Scan.created_at.desc()).all()
+    # Defect counts come from the scan_stats rollup, in the same query as the scans
+    rows = (
+        db.session.query(Scan, db.func.coalesce(ScanStats.defect_count, 0))
+        .outerjoin(ScanStats, ScanStats.scan_id == Scan.id)
+        .order_by(Scan.created_at.desc())
+        .all()
+    )
     
     # Enhance scan data with defect counts and metadata
     projects = []
-    for scan in scans:
-        defect_count = Defect.query.filter_by(scan_id=scan.id).count()
+    for scan, defect_count in rows:
         
         # Try to load metadata specific to this scan. We store a
         # per-scan snapshot at scan_<id>_metadata.json so that each
@@ -42,6 +54,7 @@ def list_projects():
     return render_template('defects/projects.html', projects=projects)
 
 @defects_bp.route('/scans/<int:scan_id>/visualize', methods=['GET'])
+@query_budget(2)
 def visualize_scan(scan_id):
     scan = Scan.query.get_or_404(scan_id)
     defects = Defect.query.filter_by(scan_id=scan_id).all()
@@ -66,9 +79,10 @@ def visualize_scan(scan_id):
                           upload_metadata=upload_metadata)
 
 @defects_bp.route('/scans/<int:scan_id>/defects', methods=['GET'])
+@query_budget(3)
+@scan_versioned()
 def get_scan_defects(scan_id):
     scan = Scan.query.get_or_404(scan_id)
-    defects = Defect.query.filter_by(scan_id=scan_id).all()
     
     # Load per-scan upload metadata to get the scan date
     upload_date = None
@@ -82,7 +96,46 @@ def get_scan_defects(scan_id):
         except Exception as e:
             print(f"Error loading upload metadata for scan {scan_id}: {e}")
     
-    defect_list = [{
+    # Viewers that ask for it get the packed columnar encoding instead of JSON
+    if request.accept_mimetypes.best_match(['application/json', encoding.MIMETYPE]) == encoding.MIMETYPE:
+        response = current_app.response_class(_encode_scan_defects(scan_id, upload_date), mimetype=encoding.MIMETYPE)
+        response.vary.add('Accept')
+        return response
+
+    defects = Defect.query.filter_by(scan_id=scan_id).all()
+    defect_list = [dict(
+        _defect_summary(d),
+        created_at=upload_date if upload_date else (d.created_at.strftime('%Y-%m-%d') if d.created_at else None)
+    ) for d in defects]
+    response = jsonify(defect_list)
+    response.vary.add('Accept')
+    return response
+
+def _encode_scan_defects(scan_id, upload_date):
+    rows = db.session.query(
+        Defect.id, Defect.x, Defect.y, Defect.z, Defect.status, Defect.severity, Defect.defect_type,
+        Defect.element, Defect.location, Defect.description, Defect.created_at
+    ).filter(Defect.scan_id == scan_id).all()
+    columns = list(zip(*rows)) if rows else [()] * 11
+    created = [upload_date] * len(rows) if upload_date else [
+        value.strftime('%Y-%m-%d') if value else None for value in columns[10]
+    ]
+    return encoding.encode_defects(
+        columns[0],
+        list(zip(columns[1], columns[2], columns[3])),
+        {
+            'status': columns[4],
+            'severity': columns[5],
+            'defect_type': columns[6],
+            'element': columns[7],
+            'location': columns[8],
+            'description': columns[9],
+            'created_at': created,
+        },
+    )
+
+def _defect_summary(d):
+    return {
         'defectId': d.id,
         'x': d.x,
         'y': d.y,
@@ -93,11 +146,167 @@ def get_scan_defects(scan_id):
         'severity': d.severity,
         'status': d.status,
         'description': d.description,
-        'created_at': upload_date if upload_date else (d.created_at.strftime('%Y-%m-%d') if d.created_at else None)
-    } for d in defects]
-    return jsonify(defect_list)
+    }
+
+# ===== Spatial queries =====
+
+SPATIAL_DEFAULT_LIMIT = 1000
+SPATIAL_MAX_LIMIT = 10000
+
+def _float_args(*names):
+    """Read required finite float query parameters, raising ValueError if any is missing or invalid."""
+    values = []
+    for name in names:
+        try:
+            value = float(request.args[name])
+        except (KeyError, ValueError):
+            value = math.nan
+        # float() also accepts "nan" and "inf", which no spatial query can use
+        if not math.isfinite(value):
+            raise ValueError(f'Query parameter "{name}" must be a finite number')
+        values.append(value)
+    return values
+
+def _spatial_response(ids, distances=None):
+    """Hydrate up to ``limit`` matched defects in match order."""
+    limit = min(request.args.get('limit', SPATIAL_DEFAULT_LIMIT, type=int), SPATIAL_MAX_LIMIT)
+    page = [int(i) for i in ids[:max(limit, 0)]]
+    by_id = {d.id: d for d in Defect.query.filter(Defect.id.in_(page)).all()} if page else {}
+    results = []
+    for pos, defect_id in enumerate(page):
+        defect = by_id.get(defect_id)
+        if defect is None:
+            continue
+        item = _defect_summary(defect)
+        if distances is not None:
+            item['distance'] = float(distances[pos])
+        results.append(item)
+    return jsonify({'count': int(len(ids)), 'defects': results})
+
+@defects_bp.route('/scans/<int:scan_id>/defects/bbox', methods=['GET'])
+@query_budget(4)
+def query_defects_bbox(scan_id):
+    """Defects inside the box ``min_x..max_x``, ``min_y..max_y``, ``min_z..max_z``."""
+    Scan.query.get_or_404(scan_id)
+    try:
+        min_x, min_y, min_z, max_x, max_y, max_z = _float_args('min_x', 'min_y', 'min_z', 'max_x', 'max_y', 'max_z')
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    ids = spatial.get_index(scan_id).bbox((min_x, min_y, min_z), (max_x, max_y, max_z))
+    return _spatial_response(ids)
+
+@defects_bp.route('/scans/<int:scan_id>/defects/radius', methods=['GET'])
+@query_budget(4)
+def query_defects_radius(scan_id):
+    """Defects within ``r`` of the point ``(x, y, z)``, nearest first."""
+    Scan.query.get_or_404(scan_id)
+    try:
+        x, y, z, r = _float_args('x', 'y', 'z', 'r')
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    if r < 0:
+        return jsonify({'error': 'Radius must not be negative'}), 400
+    ids, distances = spatial.get_index(scan_id).radius((x, y, z), r)
+    return _spatial_response(ids, distances)
+
+@defects_bp.route('/scans/<int:scan_id>/defects/nearest', methods=['GET'])
+@query_budget(4)
+def query_defects_nearest(scan_id):
+    """The ``k`` defects closest to the point ``(x, y, z)``."""
+    Scan.query.get_or_404(scan_id)
+    try:
+        x, y, z = _float_args('x', 'y', 'z')
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    k = request.args.get('k', 10, type=int)
+    if k < 1 or k > SPATIAL_MAX_LIMIT:
+        return jsonify({'error': f'k must be between 1 and {SPATIAL_MAX_LIMIT}'}), 400
+    ids, distances = spatial.get_index(scan_id).nearest((x, y, z), k)
+    return _spatial_response(ids, distances)
+
+@defects_bp.route('/scans/<int:scan_id>/defects/clusters', methods=['GET'])
+@query_budget(3)
+def get_defect_clusters(scan_id):
+    """Cluster markers for one level of detail.
+
+    Pass ``level`` (0 = one marker for the whole scan, each level halves the
+    voxel size) or ``cell_size`` in model units. The optional ``min_*``/``max_*``
+    box limits the response to clusters visible in the current view.
+    """
+    Scan.query.get_or_404(scan_id)
+    hierarchy = clustering.get_hierarchy(scan_id)
+
+    if 'cell_size' in request.args:
+        try:
+            level = hierarchy.level_for_cell_size(*_float_args('cell_size'))
+        except ValueError as exc:
+            return jsonify({'error': str(exc)}), 400
+    else:
+        level = request.args.get('level', 0, type=int)
+        if level < 0 or level > clustering.MAX_LEVEL:
+            return jsonify({'error': f'level must be between 0 and {clustering.MAX_LEVEL}'}), 400
+
+    lower = upper = None
+    if 'min_x' in request.args:
+        try:
+            min_x, min_y, min_z, max_x, max_y, max_z = _float_args('min_x', 'min_y', 'min_z', 'max_x', 'max_y', 'max_z')
+        except ValueError as exc:
+            return jsonify({'error': str(exc)}), 400
+        lower, upper = (min_x, min_y, min_z), (max_x, max_y, max_z)
+
+    clusters = hierarchy.level(level)
+    return jsonify({
+        'level': level,
+        'max_level': clustering.MAX_LEVEL,
+        'cell_size': clusters.cell_size,
+        'total': len(hierarchy),
+        'clusters': clusters.to_dicts(lower, upper),
+    })
+
+@defects_bp.route('/scans/<int:scan_id>/defects/voxel-heatmap', methods=['GET'])
+@query_budget(3)
+@scan_versioned()
+def get_voxel_heatmap(scan_id):
+    """Sparse 3D density grid of the scan's defects for the viewer's heat overlay.
+
+    ``voxel_size`` (model units) or ``resolution`` (voxels along the longest
+    axis, default 32) sets the grid; ``weight`` is ``count``, ``priority`` or
+    ``severity``. Send ``Accept: application/vnd.pcd.voxel-columns`` for the
+    packed binary form.
+    """
+    source = voxels.get_source(scan_id)
+    weighting = request.args.get('weight', 'count')
+    if weighting not in voxels.WEIGHTINGS:
+        return jsonify({'error': f'weight must be one of {", ".join(voxels.WEIGHTINGS)}'}), 400
+
+    if 'voxel_size' in request.args:
+        try:
+            voxel_size, = _float_args('voxel_size')
+        except ValueError as exc:
+            return jsonify({'error': str(exc)}), 400
+        try:
+            resolution = source.resolution_for(voxel_size)
+        except ValueError as exc:
+            return jsonify({'error': str(exc)}), 400
+        if resolution > voxels.MAX_RESOLUTION:
+            return jsonify({'error': f'voxel_size gives more than {voxels.MAX_RESOLUTION} voxels per axis'}), 400
+    else:
+        resolution = request.args.get('resolution', voxels.DEFAULT_RESOLUTION, type=int)
+        if resolution < 1 or resolution > voxels.MAX_RESOLUTION:
+            return jsonify({'error': f'resolution must be between 1 and {voxels.MAX_RESOLUTION}'}), 400
+        voxel_size = source.voxel_size_for(resolution)
+
+    grid = source.grid(voxel_size, weighting)
+    if request.accept_mimetypes.best_match(['application/json', encoding.VOXEL_MIMETYPE]) == encoding.VOXEL_MIMETYPE:
+        body = encoding.encode_voxels(grid.origin, grid.voxel_size, grid.dims, grid.cells, grid.counts, grid.values)
+        response = current_app.response_class(body, mimetype=encoding.VOXEL_MIMETYPE)
+    else:
+        response = jsonify(dict(grid.to_dict(), weight=weighting))
+    response.vary.add('Accept')
+    return response
 
 @defects_bp.route('/defect/<int:defect_id>', methods=['GET'])
+@query_budget(1)
 def get_defect_details(defect_id):
     defect = Defect.query.get_or_404(defect_id)
     image_url = None
@@ -119,6 +328,7 @@ def get_defect_details(defect_id):
     })
 
 @defects_bp.route('/defect/<int:defect_id>/status', methods=['PUT'])
+@query_budget(5)
 def update_defect_status(defect_id):
     defect = Defect.query.get_or_404(defect_id)
     data = request.get_json()
@@ -136,6 +346,7 @@ def update_defect_status(defect_id):
     return jsonify({'message': 'Defect updated successfully', 'status': defect.status})
 
 @defects_bp.route('/defect/<int:defect_id>', methods=['DELETE'])
+@query_budget(6)
 def delete_defect(defect_id):
     defect = Defect.query.get_or_404(defect_id)
     db.session.delete(defect)
@@ -143,6 +354,7 @@ def delete_defect(defect_id):
     return jsonify({'message': 'Defect deleted successfully'})
 
 @defects_bp.route('/scans/<int:scan_id>/defects', methods=['POST'])
+@query_budget(5)
 def create_defect(scan_id):
     scan = Scan.query.get_or_404(scan_id)
     data = request.get_json()
@@ -163,25 +375,83 @@ def create_defect(scan_id):
     db.session.commit()
     return jsonify({'message': 'Defect created', 'defectId': defect.id}), 201
 
+@defects_bp.route('/scans/<int:scan_id>/defects/batch', methods=['POST'])
+@query_budget(11)
+def batch_update_defects(scan_id):
+    """Apply a list of create/update/delete operations in one transaction.
+
+    Body: ``{"operations": [{"op": "create", "data": {...}},
+    {"op": "update", "id": 5, "data": {"status": "Fixed"}}, {"op": "delete", "id": 7}]}``.
+    Either every operation is applied or, if any is invalid, none are.
+    """
+    Scan.query.get_or_404(scan_id)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    try:
+        ok, results = batch.apply_batch(scan_id, data.get('operations'))
+    except batch.BatchError as exc:
+        return jsonify({'error': str(exc)}), 400
+    if not ok:
+        db.session.rollback()
+        return jsonify({'message': 'Batch rejected; no changes were made', 'results': results}), 400
+    db.session.commit()
+    return jsonify({'message': f'Applied {len(results)} operation(s)', 'results': results})
+
+def _event_stream(channel):
+    release = events.acquire_stream_slot()
+    if release is None:
+        # Every stream holds a worker thread; past the limit the pages poll instead
+        response = jsonify({'error': 'Too many open event streams, poll instead'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '60'
+        return response
+    broker = events.get_broker()
+    heartbeat = current_app.config['EVENTS_HEARTBEAT_SECONDS']
+    try:
+        response = current_app.response_class(events.stream(broker, channel, heartbeat), mimetype='text/event-stream')
+    except Exception:
+        release()
+        raise
+    response.call_on_close(release)
+    response.headers['Cache-Control'] = 'no-cache'
+    # Let proxies pass events through as they are written
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@defects_bp.route('/scans/<int:scan_id>/events', methods=['GET'])
+@query_budget(1)
+def scan_events(scan_id):
+    """Server-Sent Events stream of committed defect changes in one scan."""
+    Scan.query.get_or_404(scan_id)
+    return _event_stream(events.scan_channel(scan_id))
+
+@defects_bp.route('/events', methods=['GET'])
+@query_budget(0)
+def all_events():
+    """Server-Sent Events stream of committed defect changes in every scan."""
+    return _event_stream(events.GLOBAL_CHANNEL)
+
 @defects_bp.route('/scans/<int:scan_id>/model', methods=['GET'])
+@query_budget(1)
 def serve_model(scan_id):
     scan = Scan.query.get_or_404(scan_id)
     if not scan.model_path:
         abort(404)
     upload_dir = os.path.join(current_app.instance_path, 'uploads', 'upload_data')
-    response = send_from_directory(upload_dir, scan.model_path)
-    response.headers['Content-Type'] = 'model/gltf-binary'
-    return response
+    return send_file_from(upload_dir, scan.model_path, mimetype='model/gltf-binary')
 
 @defects_bp.route('/defects/image/<int:defect_id>', methods=['GET'])
+@query_budget(1)
 def serve_defect_image(defect_id):
     defect = Defect.query.get_or_404(defect_id)
     if not defect.image_path:
         abort(404)
     upload_dir = os.path.join(current_app.instance_path, 'uploads', 'upload_data')
-    return send_from_directory(upload_dir, defect.image_path)
+    return send_file_from(upload_dir, defect.image_path)
 
 @defects_bp.route('/project/<int:scan_id>', methods=['GET'])
+@query_budget(2)
 def view_project(scan_id):
     scan = Scan.query.get_or_404(scan_id)
     defects = Defect.query.filter_by(scan_id=scan_id).all()
@@ -0,0 +1,155 @@
+"""Spatial queries over a scan's defect coordinates.
+
+Each scan gets a uniform grid built with NumPy: defects are bucketed into
+cubic cells sized for a handful of defects per cell and stored sorted by
+cell key, so a query only touches the cells overlapping its search volume.
+Indexes are cached per scan and dropped whenever a transaction writes to
+that scan's defects (see :mod:`app.changes`).
+"""
+
+from __future__ import annotations
+
+from typing import Iterable, Tuple
+
+import numpy as np
+
+from app.changes import ScanCache
+from app.extensions import db
+from app.models import Defect
+
+TARGET_DEFECTS_PER_CELL = 8
+MAX_CELLS_PER_AXIS = 1 << 20
+
+
+class SpatialIndex:
+    """Uniform grid over one scan's defect coordinates."""
+
+    def __init__(self, ids: np.ndarray, points: np.ndarray):
+        ids = np.asarray(ids, dtype=np.int64)
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+
+        if len(ids):
+            self.lower = points.min(axis=0)
+            self.upper = points.max(axis=0)
+        else:
+            self.lower = np.zeros(3)
+            self.upper = np.zeros(3)
+        self.cell_size = self._choose_cell_size(self.upper - self.lower, len(ids))
+        self.dims = np.minimum(
+            np.floor((self.upper - self.lower) / self.cell_size).astype(np.int64) + 1,
+            MAX_CELLS_PER_AXIS,
+        )
+
+        keys = self._keys(self._cells(points))
+        order = np.argsort(keys, kind="stable")
+        self.ids = ids[order]
+        self.points = points[order]
+        self.cell_keys, self.cell_starts, counts = np.unique(
+            keys[order], return_index=True, return_counts=True
+        )
+        self.cell_ends = self.cell_starts + counts
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @staticmethod
+    def _choose_cell_size(extent: np.ndarray, count: int) -> float:
+        # Flat or linear scans (all defects on one floor, say) have no volume,
+        # so size cells over the axes that actually spread out.
+        spread = extent[extent > 1e-9]
+        if count == 0 or len(spread) == 0:
+            return 1.0
+        cells_wanted = max(1.0, count / TARGET_DEFECTS_PER_CELL)
+        return float(np.prod(spread) / cells_wanted) ** (1.0 / len(spread))
+
+    def _cells(self, points: np.ndarray) -> np.ndarray:
+        cells = np.floor((np.asarray(points, dtype=np.float64) - self.lower) / self.cell_size).astype(np.int64)
+        return np.clip(cells, 0, self.dims - 1)
+
+    def _keys(self, cells: np.ndarray) -> np.ndarray:
+        cells = np.asarray(cells, dtype=np.int64).reshape(-1, 3)
+        return (cells[:, 0] * self.dims[1] + cells[:, 1]) * self.dims[2] + cells[:, 2]
+
+    def _candidates(self, lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+        """Return positions of defects in grid cells overlapping the box."""
+        if not len(self) or np.any(upper < self.lower) or np.any(lower > self.upper):
+            return np.empty(0, dtype=np.int64)
+
+        low_cell = self._cells(lower).reshape(3)
+        high_cell = self._cells(upper).reshape(3)
+        span = high_cell - low_cell + 1
+
+        if int(np.prod(span)) <= len(self.cell_keys):
+            axes = [np.arange(lo, hi + 1) for lo, hi in zip(low_cell, high_cell)]
+            wanted = self._keys(np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1))
+            positions = np.searchsorted(self.cell_keys, wanted)
+            in_range = positions < len(self.cell_keys)
+            positions, wanted = positions[in_range], wanted[in_range]
+            cells = positions[self.cell_keys[positions] == wanted]
+        else:
+            # The box covers more cells than are occupied: test occupied cells instead.
+            i = self.cell_keys // (self.dims[1] * self.dims[2])
+            j = (self.cell_keys // self.dims[2]) % self.dims[1]
+            k = self.cell_keys % self.dims[2]
+            decoded = np.stack([i, j, k], axis=1)
+            inside = np.all((decoded >= low_cell) & (decoded <= high_cell), axis=1)
+            cells = np.nonzero(inside)[0]
+
+        starts = self.cell_starts[cells]
+        lengths = self.cell_ends[cells] - starts
+        offsets = np.cumsum(lengths) - lengths
+        return np.repeat(starts - offsets, lengths) + np.arange(int(lengths.sum()))
+
+    def bbox(self, lower: Iterable[float], upper: Iterable[float]) -> np.ndarray:
+        """Return the ids of defects inside the axis-aligned box (inclusive)."""
+        lower = np.asarray(lower, dtype=np.float64)
+        upper = np.asarray(upper, dtype=np.float64)
+        candidates = self._candidates(lower, upper)
+        points = self.points[candidates]
+        inside = np.all((points >= lower) & (points <= upper), axis=1)
+        return self.ids[candidates[inside]]
+
+    def radius(self, center: Iterable[float], radius: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Return ``(ids, distances)`` of defects within *radius*, nearest first."""
+        center = np.asarray(center, dtype=np.float64)
+        candidates = self._candidates(center - radius, center + radius)
+        distances = np.linalg.norm(self.points[candidates] - center, axis=1)
+        inside = distances <= radius
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.argsort(distances, kind="stable")
+        return self.ids[candidates[order]], distances[order]
+
+    def nearest(self, center: Iterable[float], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return ``(ids, distances)`` of the *k* defects closest to *center*."""
+        center = np.asarray(center, dtype=np.float64)
+        k = min(int(k), len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        # Grow the search sphere until it holds k defects; anything outside the
+        # sphere is farther than the k-th candidate found inside it.
+        farthest = float(np.linalg.norm(np.maximum(np.abs(center - self.lower), np.abs(center - self.upper))))
+        radius = self.cell_size
+        while True:
+            ids, distances = self.radius(center, radius)
+            if len(ids) >= k or radius >= farthest:
+                return ids[:k], distances[:k]
+            radius *= 2
+
+
+def _build_index(scan_id: int) -> SpatialIndex:
+    rows = (
+        db.session.query(Defect.id, Defect.x, Defect.y, Defect.z)
+        .filter(Defect.scan_id == scan_id)
+        .all()
+    )
+    data = np.array(rows, dtype=np.float64).reshape(-1, 4)
+    return SpatialIndex(data[:, 0].astype(np.int64), data[:, 1:])
+
+
+_indexes: ScanCache[SpatialIndex] = ScanCache(_build_index)
+
+
+def get_index(scan_id: int) -> SpatialIndex:
+    """Return the cached spatial index for *scan_id*, building it if needed."""
+    return _indexes.get(scan_id)
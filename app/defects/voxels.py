@@ -0,0 +1,139 @@
+"""3D voxel density grids of a scan's defects for the viewer's heat overlay.
+
+Defect coordinates are binned into cubic voxels with NumPy and each voxel
+sums a per-defect weight (1, or a priority/severity weight). Only occupied
+voxels are returned. Grids are cached per scan version and per parameter
+set, so repeated overlay requests cost a dictionary lookup.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from typing import Dict, Tuple
+
+import numpy as np
+
+from app.changes import ScanCache
+from app.extensions import db
+from app.models import Defect, DefectPriority
+
+from .clustering import SEVERITY_RANK
+
+DEFAULT_RESOLUTION = 32
+MAX_RESOLUTION = 512
+# Grids kept per scan; the viewer only ever cycles through a handful of sizes.
+MAX_CACHED_GRIDS = 16
+WEIGHTINGS = ("count", "priority", "severity")
+
+PRIORITY_WEIGHT = {
+    DefectPriority.URGENT.value: 4,
+    DefectPriority.HIGH.value: 3,
+    DefectPriority.MEDIUM.value: 2,
+    DefectPriority.LOW.value: 1,
+}
+# Unknown or missing values weigh like Medium, as on the location heatmap.
+DEFAULT_WEIGHT = 2
+
+
+class VoxelGrid:
+    """Occupied voxels of one grid, stored column-wise."""
+
+    def __init__(self, origin: np.ndarray, voxel_size: float, dims: np.ndarray,
+                 cells: np.ndarray, counts: np.ndarray, values: np.ndarray):
+        self.origin = origin
+        self.voxel_size = voxel_size
+        self.dims = dims
+        self.cells = cells
+        self.counts = counts
+        self.values = values
+
+    def to_dict(self) -> dict:
+        return {
+            "origin": [float(axis) for axis in self.origin],
+            "voxel_size": self.voxel_size,
+            "dims": [int(axis) for axis in self.dims],
+            "max_value": float(self.values.max()) if len(self.values) else 0.0,
+            # [i, j, k, count, value] per occupied voxel
+            "voxels": [
+                [int(i), int(j), int(k), int(count), float(value)]
+                for (i, j, k), count, value in zip(self.cells, self.counts, self.values)
+            ],
+        }
+
+
+class VoxelSource:
+    """A scan's defect coordinates and weights, with grids computed on demand."""
+
+    def __init__(self, points: np.ndarray, weights: Dict[str, np.ndarray]):
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        self.weights = weights
+        if len(self.points):
+            self.lower = self.points.min(axis=0)
+            self.extent = float((self.points.max(axis=0) - self.lower).max())
+        else:
+            self.lower = np.zeros(3)
+            self.extent = 0.0
+        self._grids: Dict[Tuple[float, str], VoxelGrid] = {}
+        self._lock = threading.Lock()
+
+    def voxel_size_for(self, resolution: int) -> float:
+        """Voxel edge that splits the scan's longest axis into *resolution* voxels."""
+        return self.extent / resolution if self.extent > 0 else 1.0
+
+    def resolution_for(self, voxel_size: float) -> int:
+        """Number of voxels along the scan's longest axis for *voxel_size* (positive and finite)."""
+        if not math.isfinite(voxel_size) or voxel_size <= 0:
+            raise ValueError("voxel_size must be a positive finite number")
+        return int(np.floor(self.extent / voxel_size)) + 1
+
+    def grid(self, voxel_size: float, weighting: str) -> VoxelGrid:
+        key = (float(voxel_size), weighting)
+        with self._lock:
+            cached = self._grids.get(key)
+        if cached is None:
+            cached = self._compute(float(voxel_size), weighting)
+            with self._lock:
+                if len(self._grids) >= MAX_CACHED_GRIDS:
+                    self._grids.pop(next(iter(self._grids)))
+                self._grids[key] = cached
+        return cached
+
+    def _compute(self, voxel_size: float, weighting: str) -> VoxelGrid:
+        origin = self.lower
+        if not len(self.points):
+            return VoxelGrid(origin, voxel_size, np.zeros(3, dtype=np.int64),
+                             np.empty((0, 3), dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0))
+
+        cells = np.floor((self.points - origin) / voxel_size).astype(np.int64)
+        occupied, inverse, counts = np.unique(cells, axis=0, return_inverse=True, return_counts=True)
+        inverse = inverse.reshape(-1)
+        if weighting == "count":
+            values = counts.astype(np.float64)
+        else:
+            values = np.bincount(inverse, weights=self.weights[weighting], minlength=len(counts))
+        return VoxelGrid(origin, voxel_size, cells.max(axis=0) + 1, occupied, counts, values)
+
+
+def _build_source(scan_id: int) -> VoxelSource:
+    rows = (
+        db.session.query(Defect.x, Defect.y, Defect.z, Defect.priority, Defect.severity)
+        .filter(Defect.scan_id == scan_id)
+        .all()
+    )
+    points = np.array([row[:3] for row in rows], dtype=np.float64).reshape(-1, 3)
+    weights = {
+        "priority": np.fromiter((PRIORITY_WEIGHT.get(row[3], DEFAULT_WEIGHT) for row in rows),
+                                dtype=np.float64, count=len(rows)),
+        "severity": np.fromiter((SEVERITY_RANK.get(row[4], DEFAULT_WEIGHT) for row in rows),
+                                dtype=np.float64, count=len(rows)),
+    }
+    return VoxelSource(points, weights)
+
+
+_sources: ScanCache[VoxelSource] = ScanCache(_build_source)
+
+
+def get_source(scan_id: int) -> VoxelSource:
+    """Return the cached voxel source for *scan_id*, building it if needed."""
+    return _sources.get(scan_id)
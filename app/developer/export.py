@@ -0,0 +1,104 @@
+"""Streamed CSV export of defects.
+
+Rows are fetched from the database in batches (``yield_per``, which uses a
+server-side cursor where the driver supports one) and written out as CSV
+chunks as they arrive, optionally gzip-compressed on the fly, so exporting
+a large scan never holds the whole file in memory.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import zlib
+from typing import Iterable, Iterator, List, Optional
+
+from app.extensions import db
+from app.models import Defect, DefectPriority, Scan
+
+BATCH_SIZE = 1000
+
+HEADER = ['ID', 'Element', 'Location', 'Type', 'Severity', 'Priority', 'Status', 'Description', 'Notes', 'Created']
+# Cross-scan exports say which project each row belongs to.
+SCAN_HEADER = ['Scan ID', 'Project']
+
+_COLUMNS = (
+    Defect.id, Defect.element, Defect.location, Defect.defect_type, Defect.severity,
+    Defect.priority, Defect.status, Defect.description, Defect.notes, Defect.created_at,
+)
+
+
+def scope_name(scan_ids: Optional[List[int]]) -> str:
+    """Filename prefix for an export of *scan_ids* (every scan if ``None``), short however many there are."""
+    if scan_ids is None:
+        return 'all_scans'
+    if not scan_ids:
+        return 'no_scans'
+    ids = sorted(set(scan_ids))
+    if len(ids) <= 3:
+        return 'scans_' + '-'.join(map(str, ids))
+    return f'scans_{ids[0]}-{ids[-1]}_{len(ids)}'
+
+
+def _row(values) -> List[str]:
+    (defect_id, element, location, defect_type, severity,
+     priority, status, description, notes, created_at) = values
+    return [
+        defect_id,
+        element or '',
+        location or '',
+        defect_type or '',
+        severity or '',
+        priority or DefectPriority.MEDIUM.value,
+        status or '',
+        description or '',
+        notes or '',
+        created_at.strftime('%Y-%m-%d %H:%M') if created_at else '',
+    ]
+
+
+def _rows(scan_ids: Optional[List[int]], with_scan: bool):
+    query = db.session.query(*_COLUMNS)
+    if with_scan:
+        query = query.add_columns(Scan.id, Scan.name).join(Scan, Scan.id == Defect.scan_id)
+        order = (Defect.scan_id, Defect.created_at.desc())
+    else:
+        order = (Defect.created_at.desc(),)
+    if scan_ids is not None:
+        query = query.filter(Defect.scan_id.in_(scan_ids))
+    return query.order_by(*order).execution_options(yield_per=BATCH_SIZE)
+
+
+def iter_csv(scan_ids: Optional[List[int]] = None, with_scan: bool = False) -> Iterator[bytes]:
+    """Yield the CSV export of *scan_ids* (every scan if ``None``) in UTF-8 chunks.
+
+    Each chunk holds up to :data:`BATCH_SIZE` rows. With *with_scan* every row
+    is prefixed with its scan id and project name.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(SCAN_HEADER + HEADER if with_scan else HEADER)
+
+    pending = 0
+    for values in _rows(scan_ids, with_scan):
+        if with_scan:
+            writer.writerow(list(values[-2:]) + _row(values[:-2]))
+        else:
+            writer.writerow(_row(values))
+        pending += 1
+        if pending >= BATCH_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue().encode('utf-8')
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """Compress *chunks* into a single gzip stream as they are produced."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -1,9 +1,18 @@
 import json
 import os
+import time
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
+from app import columnar, events, profiling, search, sla
+from app.caching import scan_versioned
+from app.changes import mark_scans_changed
 from app.extensions import db
-from app.models import Scan, Defect, DefectStatus, DefectPriority
+from app.filesending import send_file_from
+from app.models import Scan, ScanStats, Defect, DefectStatus, DefectPriority
+from app.querybudget import query_budget
+from app.stats import StatsDelta
+
+from . import export
 
 developer_bp = Blueprint("developer", __name__)
 
@@ -43,22 +52,25 @@ def _load_latest_upload_metadata(scan_id: int | None = None):
         return None
 
 
-@developer_bp.route("/developer", methods=["GET"])
-def dashboard():
-    """Developer dashboard - view all projects and their defects"""
-    sort = request.args.get("sort", "recent")
-    status_filter = request.args.get("status_filter", "all")
-    date_range = request.args.get("date_range", "all")
+def _dashboard_scans(sort="recent", status_filter="all", date_range="all"):
+    """Scans with their defect counts, filtered and sorted as on the dashboard"""
     order_clause = Scan.created_at.desc() if sort == "recent" else Scan.created_at.asc()
 
-    # Get all scans with defect counts
+    # Per-scan counts come from the scan_stats rollup, kept current by every defect write
+    def stat(column):
+        return db.func.coalesce(column, 0)
+
+    defect_count = stat(ScanStats.defect_count)
+    reported_count = stat(ScanStats.reported_count)
+    review_count = stat(ScanStats.review_count)
+    fixed_count = stat(ScanStats.fixed_count)
     query = db.session.query(
         Scan,
-        db.func.count(Defect.id).label('defect_count'),
-        db.func.coalesce(db.func.sum(db.case((Defect.status == 'Reported', 1), else_=0)), 0).label('reported_count'),
-        db.func.coalesce(db.func.sum(db.case((Defect.status == 'Under Review', 1), else_=0)), 0).label('review_count'),
-        db.func.coalesce(db.func.sum(db.case((Defect.status == 'Fixed', 1), else_=0)), 0).label('fixed_count')
-    ).outerjoin(Defect).group_by(Scan.id).order_by(order_clause)
+        defect_count.label('defect_count'),
+        reported_count.label('reported_count'),
+        review_count.label('review_count'),
+        fixed_count.label('fixed_count')
+    ).outerjoin(ScanStats, ScanStats.scan_id == Scan.id).order_by(order_clause)
     
     # Apply date range filter
     from datetime import datetime, timedelta
@@ -72,20 +84,26 @@ def dashboard():
         cutoff = datetime.now() - timedelta(days=90)
         query = query.filter(Scan.created_at >= cutoff)
     
-    scans = query.all()
-    
-    # Apply status filter in Python (simpler than SQL HAVING clause)
-    if status_filter != "all":
-        filtered_scans = []
-        for scan_data in scans:
-            scan, defect_count, reported, review, fixed = scan_data
-            if status_filter == "complete" and defect_count > 0 and fixed == defect_count:
-                filtered_scans.append(scan_data)
-            elif status_filter == "in_progress" and review > 0:
-                filtered_scans.append(scan_data)
-            elif status_filter == "started" and reported > 0 and review == 0 and fixed == 0:
-                filtered_scans.append(scan_data)
-        scans = filtered_scans
+    # Apply status filter
+    if status_filter == "complete":
+        query = query.filter(defect_count > 0, fixed_count == defect_count)
+    elif status_filter == "in_progress":
+        query = query.filter(review_count > 0)
+    elif status_filter == "started":
+        query = query.filter(reported_count > 0, review_count == 0, fixed_count == 0)
+
+    return query
+
+
+@developer_bp.route("/developer", methods=["GET"])
+@query_budget(4)
+def dashboard():
+    """Developer dashboard - view all projects and their defects"""
+    sort = request.args.get("sort", "recent")
+    status_filter = request.args.get("status_filter", "all")
+    date_range = request.args.get("date_range", "all")
+
+    scans = _dashboard_scans(sort, status_filter, date_range).all()
 
     total_defects = sum(row.defect_count for row in scans)
     total_reported = sum(row.reported_count for row in scans)
@@ -93,27 +111,17 @@ def dashboard():
     total_fixed = sum(row.fixed_count for row in scans)
 
     # --- Dashboard "At a Glance" Metrics ---
-    from datetime import datetime, timedelta
     
     # 1. Urgent Attention: High/Urgent priority that are NOT fixed
-    urgent_attention = Defect.query.filter(
-        Defect.priority.in_([DefectPriority.URGENT, DefectPriority.HIGH]),
-        Defect.status != DefectStatus.FIXED
-    ).count()
-
-    # 2. Stale Reviews: 'Under Review' status for > 7 days
-    seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    # Note: tracking strictly by 'updated_at' would be better if we had it on Defect, 
-    # but we can approximate using created_at or join with ActivityLog. 
-    # For now, let's use created_at for simplicity or assume if it's still Under Review it's stale.
-    # A better approach: Join with ActivityLog to find when it was last updated.
-    # Simple proxy: Defects created > 7 days ago still in 'Under Review'
-    stale_reviews = Defect.query.filter(
-        Defect.status == DefectStatus.UNDER_REVIEW,
-        Defect.created_at < seven_days_ago
-    ).count()
+    urgent_attention = db.session.query(
+        db.func.coalesce(db.func.sum(ScanStats.open_urgent_count), 0)
+    ).scalar()
+
+    # 2. Stale Reviews: in 'Under Review' for > 7 days, by when the status was entered
+    stale_reviews = sla.stale_review_count()
 
     # 3. Recent Activity: Defects created in last 24h
+    from datetime import datetime, timedelta
     last_24h = datetime.utcnow() - timedelta(hours=24)
     new_defects_24h = Defect.query.filter(Defect.created_at >= last_24h).count()
 
@@ -136,33 +144,27 @@ def dashboard():
 
 
 @developer_bp.route("/developer/scan/<int:scan_id>", methods=["GET"])
+@query_budget(3)
+@scan_versioned()
 def view_scan(scan_id):
     """View detailed defects for a specific scan"""
-    from sqlalchemy import or_
-
     scan = Scan.query.get_or_404(scan_id)
     search_query = request.args.get('search', '').strip()
 
     # Base query for this scan
     query = Defect.query.filter_by(scan_id=scan_id)
 
-    # Apply search filter if present
-    if search_query:
-        term = f"%{search_query}%"
-        query = query.filter(
-            or_(
-                Defect.description.ilike(term),
-                Defect.element.ilike(term),
-                Defect.location.ilike(term),
-                Defect.notes.ilike(term),
-                Defect.defect_type.ilike(term)
-            )
-        )
+    # Apply full-text search filter if present (every word matched as a prefix)
+    matches = search.matches(search_query) if search_query else None
+    if matches is not None:
+        query = query.join(matches, matches.c.id == Defect.id)
 
-    # Apply sorting
-    sort_by = request.args.get('sort_by', 'created_desc')
-    
-    if sort_by == 'created_asc':
+    # Apply sorting; searches rank by relevance unless another order is picked
+    sort_by = request.args.get('sort_by', 'relevance' if matches is not None else 'created_desc')
+
+    if sort_by == 'relevance' and matches is not None:
+        query = query.order_by(matches.c.score.desc(), Defect.created_at.desc())
+    elif sort_by == 'created_asc':
         query = query.order_by(Defect.created_at.asc())
     elif sort_by == 'priority':
         # Custom sort for priority: Urgent > High > Medium > Low
@@ -207,6 +209,7 @@ def view_scan(scan_id):
 
 
 @developer_bp.route("/developer/defect/<int:defect_id>/update", methods=["POST"])
+@query_budget(7)
 def update_defect_progress(defect_id):
     """Update defect status/progress"""
     from app.models import ActivityLog
@@ -268,9 +271,10 @@ def update_defect_progress(defect_id):
 
 
 @developer_bp.route("/developer/image/<path:image_path>", methods=["GET"])
+@query_budget(0)
 def serve_defect_image(image_path: str):
     """Serve defect images from the uploads directory"""
-    from flask import send_from_directory, current_app, abort
+    from flask import current_app, abort
     import os
 
     current_app.logger.info(f"Serving defect image: {image_path}")
@@ -303,12 +307,14 @@ def serve_defect_image(image_path: str):
     filename = os.path.basename(full_image_path_abs)
 
     current_app.logger.info(f"Serving {filename} from {image_dir}")
-    return send_from_directory(image_dir, filename)
+    return send_file_from(image_dir, filename)
 
 
 @developer_bp.route("/developer/scan/<int:scan_id>/bulk-update", methods=["POST"])
+@query_budget(6)
 def bulk_update_defects(scan_id):
     """Bulk update multiple defects at once"""
+    from datetime import datetime
     from app.models import ActivityLog
     
     scan = Scan.query.get_or_404(scan_id)
@@ -332,164 +338,405 @@ def bulk_update_defects(scan_id):
         flash("⚠ Invalid priority", "error")
         return redirect(url_for('developer.view_scan', scan_id=scan_id))
     
-    # Update all selected defects
-    updated_count = 0
-    for defect_id in defect_ids:
-        defect = Defect.query.filter_by(id=int(defect_id), scan_id=scan_id).first()
-        if defect:
-            # Log status change
-            if new_status and new_status != defect.status:
-                activity = ActivityLog(
-                    defect_id=defect.id,
-                    scan_id=scan_id,
-                    action='status updated (bulk)',
-                    old_value=defect.status,
-                    new_value=new_status
-                )
-                db.session.add(activity)
-            
-            # Log priority change
-            if new_priority and new_priority != defect.priority:
-                activity = ActivityLog(
-                    defect_id=defect.id,
-                    scan_id=scan_id,
-                    action='priority updated (bulk)',
-                    old_value=defect.priority or DefectPriority.MEDIUM.value,
-                    new_value=new_priority
-                )
-                db.session.add(activity)
-            
-            if new_status:
-                defect.status = new_status
-            if new_priority:
-                defect.priority = new_priority
-            updated_count += 1
-    
+    started = time.perf_counter()
+    ids = {int(defect_id) for defect_id in defect_ids if str(defect_id).isdigit()}
+
+    # Load every selected defect in one query
+    targets = []
+    if ids:
+        targets = (
+            db.session.query(Defect.id, Defect.status, Defect.priority, Defect.severity)
+            .filter(Defect.scan_id == scan_id, Defect.id.in_(ids))
+            .all()
+        )
+    updated_count = len(targets)
+
+    activities = []
+    delta = StatsDelta()
+    for defect in targets:
+        # Log status change
+        if new_status and new_status != defect.status:
+            activities.append({
+                "defect_id": defect.id,
+                "scan_id": scan_id,
+                "action": 'status updated (bulk)',
+                "old_value": defect.status,
+                "new_value": new_status,
+            })
+
+        # Log priority change
+        if new_priority and new_priority != defect.priority:
+            activities.append({
+                "defect_id": defect.id,
+                "scan_id": scan_id,
+                "action": 'priority updated (bulk)',
+                "old_value": defect.priority or DefectPriority.MEDIUM.value,
+                "new_value": new_priority,
+            })
+
+        delta.add(scan_id, defect.status, defect.priority, defect.severity, sign=-1)
+        delta.add(scan_id, new_status or defect.status, new_priority or defect.priority, defect.severity)
+
+    values = {}
+    if new_status:
+        values["status"] = new_status
+    if new_priority:
+        values["priority"] = new_priority
+
+    # One UPDATE and one INSERT regardless of how many defects were selected
+    if targets and values:
+        columns = dict(values, updated_at=datetime.utcnow())
+        if new_status:
+            columns.update(sla.status_changed_values(new_status, columns["updated_at"]))
+        db.session.execute(
+            db.update(Defect)
+            .where(Defect.id.in_([defect.id for defect in targets]))
+            .values(**columns)
+        )
+        if activities:
+            db.session.execute(db.insert(ActivityLog), activities)
+        # Bulk statements bypass the flush listeners, so keep the rollup and version in step here
+        delta.apply(db.session.connection())
+        mark_scans_changed(db.session, [scan_id])
+        events.record(db.session, scan_id, events.UPDATED, [defect.id for defect in targets], values)
+
     db.session.commit()
-    flash(f"✓ Successfully updated {updated_count} defect(s)", "success")
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    current_app.logger.info(
+        "Bulk update of scan %s: %d of %d defect(s), %d activity row(s) in %.1f ms",
+        scan_id, updated_count, len(defect_ids), len(activities), elapsed_ms,
+    )
+    flash(f"✓ Successfully updated {updated_count} defect(s) in {elapsed_ms:.0f} ms", "success")
     return redirect(url_for('developer.view_scan', scan_id=scan_id))
 
 
+def _csv_response(chunks, filename):
+    """Stream CSV *chunks* as a download, gzip-compressed when asked for or accepted."""
+    from flask import Response, stream_with_context
+
+    headers = {}
+    mimetype = 'text/csv'
+    if request.args.get("gzip", type=int):
+        # Explicit .csv.gz download
+        chunks = export.gzip_chunks(chunks)
+        mimetype = 'application/gzip'
+        filename += '.gz'
+    elif 'gzip' in request.accept_encodings:
+        # Compressed on the wire, plain CSV once the client has decoded it
+        chunks = export.gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    headers['Content-Disposition'] = f'attachment; filename={filename}'
+
+    response = Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+    response.vary.add('Accept-Encoding')
+    return response
+
+
 @developer_bp.route("/developer/scan/<int:scan_id>/export-csv", methods=["GET"])
+@query_budget(2)
 def export_scan_csv(scan_id):
-    """Export scan defects to CSV"""
-    from flask import Response
-    import csv
-    from io import StringIO
-    
+    """Export scan defects to CSV, streamed in batches"""
     scan = Scan.query.get_or_404(scan_id)
-    defects = Defect.query.filter_by(scan_id=scan_id).order_by(Defect.created_at.desc()).all()
-    
-    # Create CSV
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    # Header
-    writer.writerow(['ID', 'Element', 'Location', 'Type', 'Severity', 'Priority', 'Status', 'Description', 'Notes', 'Created'])
-    
-    # Data rows
-    for d in defects:
-        writer.writerow([
-            d.id,
-            d.element or '',
-            d.location or '',
-            d.defect_type or '',
-            d.severity or '',
-            d.priority or 'Medium',
-            d.status or '',
-            d.description or '',
-            d.notes or '',
-            d.created_at.strftime('%Y-%m-%d %H:%M') if d.created_at else ''
-        ])
-    
-    output.seek(0)
+    return _csv_response(export.iter_csv([scan_id]), f'{scan.name}_defects.csv')
+
+
+@developer_bp.route("/developer/export-csv", methods=["GET"])
+@query_budget(2)
+def export_scans_csv():
+    """Export defects of several projects to one CSV.
+
+    Pick the projects with ?scan_id=1&scan_id=2 or with the dashboard's
+    status_filter/date_range; default all.
+    """
+    scan_ids = request.args.getlist("scan_id", type=int)
+    status_filter = request.args.get("status_filter", "all")
+    date_range = request.args.get("date_range", "all")
+    if scan_ids:
+        found = {row[0] for row in db.session.query(Scan.id).filter(Scan.id.in_(scan_ids))}
+        missing = sorted(set(scan_ids) - found)
+        if missing:
+            return jsonify({"error": f"Unknown scan id(s): {', '.join(map(str, missing))}"}), 404
+    elif status_filter != "all" or date_range != "all":
+        query = _dashboard_scans(status_filter=status_filter, date_range=date_range)
+        scan_ids = [row[0] for row in query.with_entities(Scan.id)]
+    else:
+        scan_ids = None
+    filename = f"{export.scope_name(scan_ids)}_defects.csv"
+    return _csv_response(export.iter_csv(scan_ids, with_scan=True), filename)
+
+
+@developer_bp.route("/developer/export/<dataset>.<fmt>", methods=["GET"])
+@query_budget(2)
+def export_columnar(dataset, fmt):
+    """Export defects, scans or activity as Parquet/Arrow (?scan_id=1&scan_id=2, default all)"""
+    from flask import Response, stream_with_context
+
+    if dataset not in columnar.DATASETS or fmt not in columnar.FORMATS:
+        return jsonify({"error": f"Expected /developer/export/<{'|'.join(columnar.DATASETS)}>.<{'|'.join(columnar.FORMATS)}>"}), 404
+    if not columnar.available():
+        return jsonify({"error": "pyarrow is not installed on this server"}), 501
+
+    scan_ids = request.args.getlist("scan_id", type=int)
+    if scan_ids:
+        found = {row[0] for row in db.session.query(Scan.id).filter(Scan.id.in_(scan_ids))}
+        missing = sorted(set(scan_ids) - found)
+        if missing:
+            return jsonify({"error": f"Unknown scan id(s): {', '.join(map(str, missing))}"}), 404
+
     return Response(
-        output.getvalue(),
-        mimetype='text/csv',
-        headers={'Content-Disposition': f'attachment; filename={scan.name}_defects.csv'}
+        stream_with_context(columnar.iter_export(dataset, fmt, scan_ids or None)),
+        mimetype=columnar.FORMATS[fmt].mimetype,
+        headers={'Content-Disposition': f'attachment; filename={columnar.filename(dataset, fmt, scan_ids)}'},
     )
 
 
+SEARCH_DEFAULT_LIMIT = 50
+SEARCH_MAX_LIMIT = 500
+
+
+@developer_bp.route("/developer/search", methods=["GET"])
+@query_budget(3)
+def search_defects():
+    """Ranked full-text defect search (?q=, optional scan_id, limit, offset), across all scans by default"""
+    query = request.args.get("q", "").strip()
+    scan_id = request.args.get("scan_id", type=int)
+    limit = min(max(request.args.get("limit", SEARCH_DEFAULT_LIMIT, type=int), 1), SEARCH_MAX_LIMIT)
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    if not search.words(query):
+        return jsonify({"error": "q must contain at least one word"}), 400
+
+    results = search.search(query, scan_id=scan_id, limit=limit, offset=offset)
+    scan_names = dict(
+        db.session.query(Scan.id, Scan.name).filter(Scan.id.in_({d.scan_id for d, _ in results}))
+    ) if results else {}
+    return jsonify({
+        "query": query,
+        "backend": search.backend() or "like",
+        "limit": limit,
+        "offset": offset,
+        "results": [{
+            "id": d.id,
+            "scan_id": d.scan_id,
+            "scan_name": scan_names.get(d.scan_id),
+            "score": float(score or 0),
+            "element": d.element,
+            "location": d.location,
+            "defect_type": d.defect_type,
+            "severity": d.severity,
+            "priority": d.priority or DefectPriority.MEDIUM.value,
+            "status": d.status,
+            "description": d.description,
+            "url": url_for("developer.view_scan", scan_id=d.scan_id, search=query),
+        } for d, score in results],
+    })
+
+
+def _sla_status_arg(default=None):
+    status = request.args.get("status", default)
+    if status is not None and status not in [e.value for e in DefectStatus]:
+        raise ValueError(f"status must be one of {', '.join(e.value for e in DefectStatus)}")
+    return status
+
+
+@developer_bp.route("/developer/sla/time-in-status", methods=["GET"])
+@query_budget(1)
+def get_time_in_status():
+    """Defects per status with how long they have been in it (?status=, ?scan_id=)"""
+    try:
+        status = _sla_status_arg()
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify({
+        "buckets": [label for label, _ in sla.AGE_BUCKETS],
+        "statuses": sla.time_in_status(status, scan_id=request.args.get("scan_id", type=int)),
+    })
+
+
+@developer_bp.route("/developer/sla/overdue", methods=["GET"])
+@query_budget(2)
+def get_overdue_defects():
+    """Defects stuck in a status longer than ?days= (default: Under Review for 7 days), longest first"""
+    from datetime import datetime
+
+    try:
+        status = _sla_status_arg(DefectStatus.UNDER_REVIEW.value)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    days = request.args.get("days", sla.STALE_REVIEW_DAYS, type=float)
+    if days < 0:
+        return jsonify({"error": "days must not be negative"}), 400
+    limit = min(max(request.args.get("limit", 100, type=int), 1), 1000)
+    offset = max(request.args.get("offset", 0, type=int), 0)
+
+    now = datetime.utcnow()
+    total, defects = sla.overdue(status, days, scan_id=request.args.get("scan_id", type=int),
+                                 limit=limit, offset=offset, now=now)
+    return jsonify({
+        "status": status,
+        "days": days,
+        "total": total,
+        "limit": limit,
+        "offset": offset,
+        "defects": [{
+            "id": d.id,
+            "scan_id": d.scan_id,
+            "element": d.element,
+            "location": d.location,
+            "priority": d.priority or DefectPriority.MEDIUM.value,
+            "severity": d.severity,
+            "status_changed_at": d.status_changed_at.strftime('%Y-%m-%d %H:%M:%S'),
+            "days_in_status": round((now - d.status_changed_at).total_seconds() / 86400, 2),
+        } for d in defects],
+    })
+
+
 # ===== PHASE 3: Analytics, Charts, Assignments, Activity =====
 
 # (Team assignment removed)
 
 
+CHART_BUCKETS = ("day", "week", "month")
+CHART_MAX_DAYS = 3650
+
+
+def _bucket_start(day, bucket):
+    """Return the first day of the day/week (Monday)/month bucket containing *day*."""
+    from datetime import timedelta
+
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
 @developer_bp.route("/developer/scan/<int:scan_id>/charts-data", methods=["GET"])
+@query_budget(5)
+@scan_versioned(daily=True)
 def get_charts_data(scan_id):
-    """Get data for charts (status, priority, trend)"""
-    from datetime import datetime, timedelta
+    """Get data for charts (status, priority, trend)
+
+    ``days`` sets the trend window (default 30) and ``bucket`` groups it by
+    ``day``, ``week`` or ``month``; every bucket in the window is present.
+    """
+    from datetime import date, datetime, timedelta
     
     scan = Scan.query.get_or_404(scan_id)
-    defects = Defect.query.filter_by(scan_id=scan_id).all()
-    
+    days = request.args.get("days", 30, type=int)
+    bucket = request.args.get("bucket", "day")
+    if days < 1 or days > CHART_MAX_DAYS:
+        return jsonify({"success": False, "message": f"days must be between 1 and {CHART_MAX_DAYS}"}), 400
+    if bucket not in CHART_BUCKETS:
+        return jsonify({"success": False, "message": f"bucket must be one of {', '.join(CHART_BUCKETS)}"}), 400
+
     # Status distribution
-    status_counts = {}
-    for d in defects:
-        status_counts[d.status] = status_counts.get(d.status, 0) + 1
+    status = db.func.coalesce(Defect.status, 'Unknown')
+    status_counts = dict(
+        db.session.query(status, db.func.count(Defect.id))
+        .filter(Defect.scan_id == scan_id)
+        .group_by(status)
+        .all()
+    )
     
     # Priority distribution
-    priority_counts = {}
-    for d in defects:
-        priority = d.priority or 'Medium'
-        priority_counts[priority] = priority_counts.get(priority, 0) + 1
+    priority = db.func.coalesce(db.func.nullif(Defect.priority, ''), 'Medium')
+    priority_counts = dict(
+        db.session.query(priority, db.func.count(Defect.id))
+        .filter(Defect.scan_id == scan_id)
+        .group_by(priority)
+        .all()
+    )
     
-    # Defect trend (by day for last 30 days)
+    # Defect trend: daily counts from SQL, rolled up into the requested buckets
     today = datetime.utcnow().date()
+    first_day = today - timedelta(days=days - 1)
+    created_day = db.func.date(Defect.created_at)
+    daily_counts = (
+        db.session.query(created_day, db.func.count(Defect.id))
+        .filter(Defect.scan_id == scan_id, Defect.created_at >= datetime.combine(first_day, datetime.min.time()))
+        .group_by(created_day)
+        .all()
+    )
+
     trend_data = {}
-    for i in range(30):
-        date = today - timedelta(days=i)
-        count = len([d for d in defects if d.created_at and d.created_at.date() == date])
-        trend_data[str(date)] = count
-    
-    # Sort trend data by date
-    sorted_trend = dict(sorted(trend_data.items()))
+    day = _bucket_start(first_day, bucket)
+    while day <= today:
+        trend_data[str(day)] = 0
+        day = _bucket_start(day + timedelta(days=32 if bucket == "month" else 7 if bucket == "week" else 1), bucket)
+    for created, count in daily_counts:
+        if created is None:
+            continue
+        created = created if isinstance(created, date) else date.fromisoformat(str(created))
+        key = str(_bucket_start(created, bucket))
+        if key in trend_data:
+            trend_data[key] += count
     
     return jsonify({
         'status': status_counts,
         'priority': priority_counts,
-        'trend': sorted_trend,
-        'total': len(defects)
+        'trend': trend_data,
+        'bucket': bucket,
+        'days': days,
+        'total': sum(status_counts.values())
     })
 
 
 @developer_bp.route("/developer/scan/<int:scan_id>/heatmap-data", methods=["GET"])
+@query_budget(3)
+@scan_versioned()
 def get_heatmap_data(scan_id):
     """Get heatmap data by location"""
     scan = Scan.query.get_or_404(scan_id)
-    defects = Defect.query.filter_by(scan_id=scan_id).all()
-    
-    # Count defects by location
-    location_counts = {}
-    for d in defects:
-        location = d.location or 'Unknown'
-        location_counts[location] = location_counts.get(location, 0) + 1
     
-    # Priority weight (for intensity)
-    priority_weight = {'Urgent': 4, 'High': 3, 'Medium': 2, 'Low': 1}
-    location_priority = {}
-    for d in defects:
-        location = d.location or 'Unknown'
-        priority = d.priority or 'Medium'
-        weight = priority_weight.get(priority, 2)
-        location_priority[location] = location_priority.get(location, 0) + weight
+    # Count defects by location, weighting each by priority (for intensity)
+    location = db.func.coalesce(db.func.nullif(Defect.location, ''), 'Unknown')
+    priority_weight = db.case(
+        (Defect.priority == 'Urgent', 4),
+        (Defect.priority == 'High', 3),
+        (Defect.priority == 'Low', 1),
+        else_=2
+    )
+    rows = (
+        db.session.query(location, db.func.count(Defect.id), db.func.sum(priority_weight))
+        .filter(Defect.scan_id == scan_id)
+        .group_by(location)
+        .order_by(location)
+        .all()
+    )
     
     return jsonify({
-        'locations': list(location_counts.keys()),
-        'counts': list(location_counts.values()),
-        'priority_weights': list(location_priority.values())
+        'locations': [row[0] for row in rows],
+        'counts': [row[1] for row in rows],
+        'priority_weights': [int(row[2] or 0) for row in rows]
     })
 
 
-@developer_bp.route("/developer/recent-activity", methods=["GET"])
-def get_recent_activity():
-    """Get recent activity across all scans"""
-    from app.models import ActivityLog
-    
-    # Get last 20 activities
-    activities = ActivityLog.query.order_by(ActivityLog.timestamp.desc()).limit(20).all()
-    
-    return jsonify([{
+ACTIVITY_DEFAULT_LIMIT = 50
+ACTIVITY_MAX_LIMIT = 500
+# Ids are taken at INSERT but rows appear at COMMIT, so a lower id can show up
+# after a higher one. Cursors stay behind rows younger than this and clients
+# see those rows again (dedupe on id) until they have settled.
+ACTIVITY_SETTLE_SECONDS = 30
+
+
+def _activity_cursor(rows, default):
+    """Highest id a poller can move past: the last returned row below the oldest unsettled one.
+
+    Unsettled rows may still have lower ids in flight, so the cursor never
+    passes them; they are sent again until they settle.
+    """
+    from datetime import datetime, timedelta
+
+    settled_before = datetime.utcnow() - timedelta(seconds=ACTIVITY_SETTLE_SECONDS)
+    unsettled = [a.id for a in rows if a.timestamp is not None and a.timestamp > settled_before]
+    if unsettled:
+        first_unsettled = min(unsettled)
+        return max((a.id for a in rows if a.id < first_unsettled), default=default)
+    return max((a.id for a in rows), default=default)
+
+
+def _activity_dict(a):
+    return {
         'id': a.id,
         'action': a.action,
         'old_value': a.old_value,
@@ -497,4 +744,104 @@ def get_recent_activity():
         'defect_id': a.defect_id,
         'scan_id': a.scan_id,
         'timestamp': a.timestamp.strftime('%Y-%m-%d %H:%M:%S') if a.timestamp else ''
-    } for a in activities])
+    }
+
+
+@developer_bp.route("/developer/recent-activity", methods=["GET"])
+@query_budget(1)
+def get_recent_activity():
+    """Get recent activity across all scans"""
+    from app.models import ActivityLog
+
+    # Last 20 activities; ids grow with time and walk the primary key backwards
+    activities = ActivityLog.query.order_by(ActivityLog.id.desc()).limit(20).all()
+
+    return jsonify([_activity_dict(a) for a in activities])
+
+
+@developer_bp.route("/developer/activity", methods=["GET"])
+@query_budget(1)
+def get_activity_feed():
+    """Incremental activity feed paged by id cursors.
+
+    ``?since=<cursor>`` returns activity newer than the cursor, oldest first;
+    ``?before=<cursor>`` pages backwards through history, newest first; with
+    neither the latest page is returned. Filter with ``scan_id``,
+    ``defect_id`` and ``action`` (repeatable). Poll with the returned
+    ``cursor`` and load older pages with ``before``. The cursor lags behind
+    rows of the last ``ACTIVITY_SETTLE_SECONDS``, so polls can repeat items:
+    dedupe on ``id``.
+    """
+    from app.models import ActivityLog
+
+    since = request.args.get("since", type=int)
+    before = request.args.get("before", type=int)
+    if since is not None and before is not None:
+        return jsonify({"error": "Use either since or before, not both"}), 400
+    limit = min(max(request.args.get("limit", ACTIVITY_DEFAULT_LIMIT, type=int), 1), ACTIVITY_MAX_LIMIT)
+
+    query = ActivityLog.query
+    scan_id = request.args.get("scan_id", type=int)
+    defect_id = request.args.get("defect_id", type=int)
+    actions = request.args.getlist("action")
+    if scan_id is not None:
+        query = query.filter(ActivityLog.scan_id == scan_id)
+    if defect_id is not None:
+        query = query.filter(ActivityLog.defect_id == defect_id)
+    if actions:
+        query = query.filter(ActivityLog.action.in_(actions))
+
+    # One row past the page tells whether there is more
+    if since is not None:
+        rows = query.filter(ActivityLog.id > since).order_by(ActivityLog.id.asc()).limit(limit + 1).all()
+    elif before is not None:
+        rows = query.filter(ActivityLog.id < before).order_by(ActivityLog.id.desc()).limit(limit + 1).all()
+    else:
+        rows = query.order_by(ActivityLog.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    ids = [a.id for a in rows]
+    if since is not None:
+        cursor, older = _activity_cursor(rows, since), None
+    else:
+        # Only the latest page can seed polling; a history page says nothing about newer rows
+        cursor = _activity_cursor(rows, 0) if before is None else None
+        older = min(ids) if has_more else None
+
+    return jsonify({
+        "items": [_activity_dict(a) for a in rows],
+        "cursor": cursor,
+        "before": older,
+        "has_more": has_more,
+    })
+
+
+@developer_bp.route("/developer/profiles", methods=["GET"])
+@query_budget(0)
+def list_profiles():
+    """Slowest requests captured by the profiler, slowest first."""
+    limit = min(request.args.get("limit", 50, type=int), 500)
+    return render_template(
+        "developer/profiles.html",
+        profiles=profiling.slowest(limit),
+        profiling_enabled=current_app.config.get("PROFILING_ENABLED", False),
+        sample_rate=current_app.config.get("PROFILING_SAMPLE_RATE"),
+    )
+
+
+@developer_bp.route("/developer/profiles/<name>", methods=["GET"])
+@query_budget(0)
+def view_profile(name: str):
+    """pstats listing of one capture; ``?download=1`` returns the raw .prof file."""
+    from flask import abort, send_file
+
+    path = profiling.profile_path(name)
+    if path is None:
+        abort(404)
+    if request.args.get("download"):
+        return send_file(path, mimetype="application/octet-stream", as_attachment=True, download_name=f"{name}.prof")
+    sort = request.args.get("sort", "cumulative")
+    if sort not in ("cumulative", "tottime", "ncalls"):
+        sort = "cumulative"
+    return current_app.response_class(profiling.report(path, sort=sort), mimetype="text/plain")
@@ -0,0 +1,274 @@
+"""Push committed defect changes to Server-Sent Events subscribers.
+
+A flush listener records which defects a transaction created, updated,
+deleted or assigned an image to; once the transaction commits the changes
+are grouped into one event per scan and kind and published on the
+``scan:<id>`` and ``all`` channels. Bulk SQL paths that bypass the unit of
+work call :func:`record` themselves.
+
+Delivery goes through a broker. :class:`LocalBroker` fans events out to the
+subscribers of this process; :class:`RedisBroker` (``EVENTS_BROKER_URL =
+redis://...``) relays them through Redis pub/sub so subscribers connected
+to any worker see writes made by every other one.
+
+Every open stream holds a server thread, so each process serves at most
+``EVENTS_MAX_STREAMS`` of them at once (:func:`acquire_stream_slot`); the
+pages fall back to polling when a stream is refused.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import itertools
+import json
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+_SESSION_KEY = "defect_events"
+
+CREATED = "defect.created"
+UPDATED = "defect.updated"
+DELETED = "defect.deleted"
+IMAGE_ASSIGNED = "defect.image_assigned"
+
+GLOBAL_CHANNEL = "all"
+MAX_QUEUED_EVENTS = 256
+
+
+def scan_channel(scan_id: int) -> str:
+    return f"scan:{scan_id}"
+
+
+class Subscription:
+    """Queue of events for one connected client."""
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self.events: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=MAX_QUEUED_EVENTS)
+
+    def put(self, payload: Dict[str, Any]) -> None:
+        # A client that stops reading loses its oldest events, never blocks publishers.
+        while True:
+            try:
+                self.events.put_nowait(payload)
+                return
+            except queue.Full:
+                try:
+                    self.events.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        try:
+            return self.events.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LocalBroker:
+    """In-process pub/sub: events reach subscribers of this process only."""
+
+    def __init__(self):
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self, channel: str) -> Subscription:
+        subscription = Subscription(channel)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.channel]
+
+    def publish(self, channels: Iterable[str], payload: Dict[str, Any]) -> None:
+        self.deliver(channels, payload)
+
+    def deliver(self, channels: Iterable[str], payload: Dict[str, Any]) -> None:
+        payload = dict(payload, id=next(self._ids))
+        with self._lock:
+            targets = [sub for channel in channels for sub in self._subscriptions.get(channel, ())]
+        for subscription in targets:
+            subscription.put(payload)
+
+
+class RedisBroker(LocalBroker):
+    """Relay events through Redis pub/sub to the subscribers of every process."""
+
+    def __init__(self, url: str, prefix: str = "pcd:events:"):
+        import redis
+
+        super().__init__()
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self._listener: Optional[threading.Thread] = None
+
+    def subscribe(self, channel: str) -> Subscription:
+        self._ensure_listener()
+        return super().subscribe(channel)
+
+    def publish(self, channels: Iterable[str], payload: Dict[str, Any]) -> None:
+        message = json.dumps({"channels": list(channels), "payload": payload})
+        self._redis.publish(self._prefix + "defects", message)
+
+    def _ensure_listener(self) -> None:
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(target=self._listen, name="events-redis", daemon=True)
+            self._listener.start()
+
+    def _listen(self) -> None:
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self._prefix + "defects")
+        for message in pubsub.listen():
+            try:
+                data = json.loads(message["data"])
+                self.deliver(data["channels"], data["payload"])
+            except (KeyError, TypeError, ValueError):
+                continue
+
+
+def create_broker(url: Optional[str]) -> LocalBroker:
+    if url and url.startswith(("redis://", "rediss://", "unix://")):
+        if importlib.util.find_spec("redis") is None:
+            raise RuntimeError("EVENTS_BROKER_URL points at Redis but the redis package is not installed.")
+        return RedisBroker(url)
+    if url and url != "local":
+        raise RuntimeError(f"Unsupported EVENTS_BROKER_URL: {url!r}")
+    return LocalBroker()
+
+
+def get_broker(app=None) -> LocalBroker:
+    return (app or current_app).extensions["events"]
+
+
+def record(session: Session, scan_id: int, kind: str, defect_ids: Iterable[int],
+           fields: Iterable[str] = ()) -> None:
+    """Queue a change for publication when *session* commits."""
+    defect_ids = [int(defect_id) for defect_id in defect_ids if defect_id is not None]
+    if scan_id is None or not defect_ids:
+        return
+    pending = session.info.setdefault(_SESSION_KEY, {})
+    entry = pending.setdefault((int(scan_id), kind), {"ids": [], "fields": set()})
+    entry["ids"].extend(defect_ids)
+    entry["fields"].update(fields)
+
+
+def _changed_fields(obj) -> List[str]:
+    state = inspect(obj)
+    return [column.key for column in state.mapper.column_attrs if state.attrs[column.key].history.has_changes()]
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    from app.models import Defect
+
+    for obj in session.new:
+        if isinstance(obj, Defect):
+            record(session, obj.scan_id, CREATED, [obj.id])
+    for obj in session.deleted:
+        if isinstance(obj, Defect):
+            history = inspect(obj).attrs.scan_id.history
+            scan_id = history.deleted[0] if history.deleted else obj.scan_id
+            record(session, scan_id, DELETED, [obj.id])
+    for obj in session.dirty:
+        if not isinstance(obj, Defect) or not session.is_modified(obj, include_collections=False):
+            continue
+        fields = _changed_fields(obj)
+        if "image_path" in fields:
+            record(session, obj.scan_id, IMAGE_ASSIGNED, [obj.id], ["image_path"])
+            fields.remove("image_path")
+        if fields:
+            record(session, obj.scan_id, UPDATED, [obj.id], fields)
+            # A defect moved between scans also changes the scan it left.
+            for old_scan_id in inspect(obj).attrs.scan_id.history.deleted or ():
+                record(session, old_scan_id, DELETED, [obj.id])
+
+
+def _after_commit(session: Session) -> None:
+    pending = session.info.pop(_SESSION_KEY, None)
+    if not pending or not has_app_context():
+        return
+    broker = current_app.extensions.get("events")
+    if broker is None:
+        return
+    for (scan_id, kind), entry in pending.items():
+        payload = {
+            "type": kind,
+            "scan_id": scan_id,
+            "defect_ids": sorted(set(entry["ids"])),
+            "fields": sorted(entry["fields"]),
+        }
+        try:
+            broker.publish([scan_channel(scan_id), GLOBAL_CHANNEL], payload)
+        except Exception:  # noqa: BLE001 - a lost notification must never fail a commit
+            current_app.logger.exception("Publishing %s for scan %s failed", kind, scan_id)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+def stream(broker: LocalBroker, channel: str, heartbeat: float) -> Iterator[str]:
+    """Subscribe to *channel* now and return its ``text/event-stream`` frames.
+
+    The generator runs until the client goes away, sending a comment every
+    *heartbeat* seconds so idle connections are not dropped by proxies.
+    """
+    subscription = broker.subscribe(channel)
+    return _frames(broker, subscription, heartbeat)
+
+
+def _frames(broker: LocalBroker, subscription: Subscription, heartbeat: float) -> Iterator[str]:
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            payload = subscription.get(timeout=heartbeat)
+            if payload is None:
+                yield ": keepalive\n\n"
+                continue
+            yield f"id: {payload['id']}\nevent: {payload['type']}\ndata: {json.dumps(payload)}\n\n"
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def acquire_stream_slot(app=None) -> Optional[Callable[[], None]]:
+    """Reserve one of this process's stream slots.
+
+    Returns the function that gives the slot back, or ``None`` when
+    ``EVENTS_MAX_STREAMS`` streams are already open.
+    """
+    slots = (app or current_app).extensions.get("events_streams")
+    if slots is None:
+        return lambda: None
+    if not slots.acquire(blocking=False):
+        return None
+    released = threading.Event()
+
+    def release() -> None:
+        if not released.is_set():
+            released.set()
+            slots.release()
+
+    return release
+
+
+def init_app(app) -> None:
+    app.extensions["events"] = create_broker(app.config.get("EVENTS_BROKER_URL"))
+    limit = int(app.config.get("EVENTS_MAX_STREAMS") or 0)
+    app.extensions["events_streams"] = threading.BoundedSemaphore(limit) if limit > 0 else None
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_rollback", _after_rollback)
@@ -0,0 +1,63 @@
+"""Hand file downloads to the front proxy instead of streaming them from a worker.
+
+``FILE_SERVING`` selects how :func:`send_file_from` answers:
+
+``direct`` (default)
+    ``send_from_directory``; the worker streams the file.
+``x-accel-redirect``
+    An empty response with ``X-Accel-Redirect: <FILE_SERVING_ACCEL_PREFIX><path>``,
+    the path relative to the instance folder. nginx serves the file from an
+    ``internal`` location aliasing that folder (see ``nginx.conf``). Files
+    outside the instance folder are still sent directly.
+``x-sendfile``
+    Flask's ``USE_X_SENDFILE``: an empty response with the absolute path in
+    ``X-Sendfile`` (Apache mod_xsendfile, lighttpd).
+
+The views still authorize the request and resolve the path; only the
+transfer moves to the proxy, so a slow client no longer holds a worker.
+"""
+
+from __future__ import annotations
+
+import mimetypes
+import os
+from typing import Optional
+from urllib.parse import quote
+
+from flask import abort, current_app, send_from_directory
+from werkzeug.security import safe_join
+
+MODES = ("direct", "x-accel-redirect", "x-sendfile")
+
+
+def _accel_uri(path: str) -> Optional[str]:
+    root = os.path.abspath(current_app.instance_path)
+    path = os.path.abspath(path)
+    if os.path.commonpath([root, path]) != root:
+        return None
+    prefix = current_app.config.get("FILE_SERVING_ACCEL_PREFIX", "/_files/").rstrip("/")
+    return f"{prefix}/{quote(os.path.relpath(path, root).replace(os.sep, '/'))}"
+
+
+def send_file_from(directory: str, filename: str, mimetype: Optional[str] = None):
+    """``send_from_directory`` that offloads the transfer as ``FILE_SERVING`` says."""
+    if current_app.config.get("FILE_SERVING", "direct") == "x-accel-redirect":
+        path = safe_join(directory, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        uri = _accel_uri(path)
+        if uri is not None:
+            response = current_app.response_class(
+                mimetype=mimetype or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            )
+            response.headers["X-Accel-Redirect"] = uri
+            return response
+    return send_from_directory(directory, filename, mimetype=mimetype)
+
+
+def init_app(app) -> None:
+    mode = app.config.get("FILE_SERVING", "direct")
+    if mode not in MODES:
+        raise RuntimeError(f"FILE_SERVING must be one of {', '.join(MODES)}, not {mode!r}")
+    if mode == "x-sendfile":
+        app.config["USE_X_SENDFILE"] = True
@@ -0,0 +1,45 @@
+"""Liveness and readiness endpoints for the process manager and load balancer.
+
+``/healthz`` answers as long as the worker can serve a request and never
+touches the database, so a slow database does not get workers restarted.
+``/readyz`` checks that the database answers and the schema is fully
+migrated; until it does, the instance should not receive traffic.
+"""
+
+from __future__ import annotations
+
+from flask import Blueprint, jsonify
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import migrations
+from app.extensions import db
+
+health_bp = Blueprint("health", __name__)
+
+
+@health_bp.route("/healthz")
+def liveness():
+    return jsonify({"status": "ok"})
+
+
+@health_bp.route("/readyz")
+def readiness():
+    try:
+        with db.engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        pending = migrations.pending(db.engine)
+    except SQLAlchemyError as exc:
+        return jsonify({"status": "unavailable", "database": "error", "error": str(exc.__class__.__name__)}), 503
+
+    if pending:
+        return jsonify({
+            "status": "unavailable",
+            "database": "ok",
+            "pending_migrations": [f"{migration.version:04d}_{migration.name}" for migration in pending],
+        }), 503
+    return jsonify({"status": "ok", "database": "ok"})
+
+
+def init_app(app) -> None:
+    app.register_blueprint(health_bp)
@@ -0,0 +1,258 @@
+"""Per-request performance metrics, exported in Prometheus text format at ``/metrics``.
+
+Every request records its latency, response size and the number and total
+time of the SQL statements it ran (counted by engine cursor events),
+labelled by endpoint. Ingest code wraps its phases in :func:`stage` to
+record how long each one takes::
+
+    with metrics.stage("upload_scan_data.extract_pdf_images"):
+        ...
+
+By default values live in the memory of the process that served the
+request. With several gunicorn workers behind one port, set
+``PROMETHEUS_MULTIPROC_DIR``: every worker then also writes its values to
+files there (``prometheus_client`` multiprocess mode) and ``/metrics``
+sums them across workers, whichever worker answers the scrape. The
+directory must be empty when the server starts (``gunicorn.conf.py``
+clears it). Streaming responses (exports, event streams) are timed to the
+first byte and have no size.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from flask import Blueprint, Response, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+        # prometheus_client counterpart in multiprocess mode
+        self.shared = None
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        if self.shared is not None:
+            self.shared.labels(*labelvalues).inc(amount)
+            return
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {_format_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # labels -> [per-bucket counts (not cumulative), sum, count]
+        self._values: Dict[LabelValues, list] = {}
+        self._lock = threading.Lock()
+        self.shared = None
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        if self.shared is not None:
+            self.shared.labels(*labelvalues).observe(value)
+            return
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labelvalues)
+            if state is None:
+                state = self._values[labelvalues] = [[0] * len(self.buckets), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, ([*counts], total, count)) for labels, (counts, total, count) in self._values.items())
+        for labelvalues, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labelvalues, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_format_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+REQUEST_LATENCY = Histogram(
+    "ldms_request_duration_seconds", "Time to produce a response, per endpoint.",
+    ("endpoint", "method", "status"),
+)
+RESPONSE_SIZE = Histogram(
+    "ldms_response_size_bytes", "Response body size for non-streamed responses.",
+    ("endpoint",), buckets=SIZE_BUCKETS,
+)
+REQUEST_SQL_QUERIES = Histogram(
+    "ldms_request_sql_queries", "SQL statements executed per request.",
+    ("endpoint",), buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_SQL_TIME = Histogram(
+    "ldms_request_sql_duration_seconds", "Total SQL execution time per request.",
+    ("endpoint",),
+)
+SQL_QUERIES = Counter("ldms_sql_queries_total", "SQL statements executed, per database bind.", ("bind",))
+SQL_TIME = Counter("ldms_sql_duration_seconds_total", "SQL execution time, per database bind.", ("bind",))
+STAGE_DURATION = Histogram("ldms_stage_duration_seconds", "Duration of labelled ingest stages.", ("stage",))
+
+REGISTRY = (
+    REQUEST_LATENCY, RESPONSE_SIZE, REQUEST_SQL_QUERIES, REQUEST_SQL_TIME,
+    SQL_QUERIES, SQL_TIME, STAGE_DURATION,
+)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Record the duration of the enclosed block as stage *name*."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - started, name)
+
+
+def multiprocess_dir() -> Optional[str]:
+    return os.environ.get("PROMETHEUS_MULTIPROC_DIR") or None
+
+
+def _share_values() -> None:
+    """Record through ``prometheus_client`` so every worker's values reach the shared directory."""
+    if importlib.util.find_spec("prometheus_client") is None:
+        raise RuntimeError("PROMETHEUS_MULTIPROC_DIR is set but the prometheus_client package is not installed.")
+    import prometheus_client
+
+    for metric in REGISTRY:
+        if metric.shared is not None:
+            continue
+        if isinstance(metric, Histogram):
+            metric.shared = prometheus_client.Histogram(
+                metric.name, metric.documentation, metric.labelnames,
+                buckets=metric.buckets, registry=None,
+            )
+        else:
+            metric.shared = prometheus_client.Counter(
+                metric.name, metric.documentation, metric.labelnames, registry=None,
+            )
+
+
+def render() -> str:
+    if multiprocess_dir():
+        from prometheus_client import CollectorRegistry, generate_latest, multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry).decode("utf-8")
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = conn.info.get("metrics_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    bind = conn.engine.url.database or conn.engine.url.drivername
+    SQL_QUERIES.inc(bind)
+    SQL_TIME.inc(bind, amount=elapsed)
+    if has_app_context():
+        totals = g.get("metrics_sql")
+        if totals is not None:
+            totals[0] += 1
+            totals[1] += elapsed
+
+
+def _handle_error(context) -> None:
+    connection = context.connection
+    if connection is not None and connection.info.get("metrics_started"):
+        connection.info["metrics_started"].pop()
+
+
+def _start_request() -> None:
+    g.metrics_started = time.perf_counter()
+    g.metrics_sql = [0, 0.0]
+
+
+def _record_request(response):
+    started = g.pop("metrics_started", None)
+    if started is None:
+        return response
+    endpoint = request.endpoint or "unmatched"
+    REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint, request.method, str(response.status_code))
+    if not response.is_streamed and response.content_length is not None:
+        RESPONSE_SIZE.observe(response.content_length, endpoint)
+    queries, sql_seconds = g.pop("metrics_sql", (0, 0.0))
+    REQUEST_SQL_QUERIES.observe(queries, endpoint)
+    REQUEST_SQL_TIME.observe(sql_seconds, endpoint)
+    return response
+
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/metrics")
+def export_metrics():
+    return Response(render(), content_type=CONTENT_TYPE)
+
+
+def init_app(app) -> None:
+    if multiprocess_dir():
+        _share_values()
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+    app.before_request(_start_request)
+    app.after_request(_record_request)
+    app.register_blueprint(metrics_bp)
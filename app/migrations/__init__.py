@@ -0,0 +1,158 @@
+"""Versioned schema migrations, applied at deploy time with ``flask schema upgrade``.
+
+Each migration is a module ``vNNNN_<name>.py`` in this package with an
+``upgrade(connection)`` function. Pending migrations run in version order,
+each in its own transaction together with the ``schema_migrations`` row
+that records it, so a failed migration leaves nothing half applied. On
+PostgreSQL an advisory lock serializes concurrent ``upgrade`` runs, e.g.
+several containers starting at once.
+
+Migrations describe their own tables and columns (``Table`` stubs, DDL)
+rather than importing the models, so each keeps doing the same change as
+``app/models.py`` moves on. Databases that predate the runner already have
+some of their objects: write them to be idempotent (``checkfirst=True``,
+``IF NOT EXISTS``, :func:`app.schema.add_missing_columns`).
+"""
+
+from __future__ import annotations
+
+import importlib
+import pkgutil
+import re
+import sys
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, text
+
+from app.extensions import db
+
+_MODULE_NAME = re.compile(r"^v(\d{4})_(\w+)$")
+# pg_advisory_lock key held while migrations run
+_LOCK_KEY = 0x7363686D
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    description: str
+    upgrade: Callable
+
+
+def discover() -> List[Migration]:
+    """All migrations in this package, in version order."""
+    migrations = []
+    for module in pkgutil.iter_modules(__path__):
+        match = _MODULE_NAME.match(module.name)
+        if not match:
+            continue
+        loaded = importlib.import_module(f"{__name__}.{module.name}")
+        description = (loaded.__doc__ or "").strip().splitlines()[0] if loaded.__doc__ else match.group(2)
+        migrations.append(Migration(int(match.group(1)), match.group(2), description, loaded.upgrade))
+    migrations.sort(key=lambda migration: migration.version)
+    versions = [migration.version for migration in migrations]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"Duplicate migration versions in {__name__}: {versions}")
+    return migrations
+
+
+def applied_versions(connection) -> List[int]:
+    if not inspect(connection).has_table(schema_migrations.name):
+        return []
+    return [row[0] for row in connection.execute(schema_migrations.select().order_by(schema_migrations.c.version))]
+
+
+def pending(engine) -> List[Migration]:
+    with engine.connect() as connection:
+        done = set(applied_versions(connection))
+    return [migration for migration in discover() if migration.version not in done]
+
+
+@contextmanager
+def _lock(engine):
+    """Hold the migration lock; a second ``upgrade`` waits here until the first is done."""
+    if engine.dialect.name != "postgresql":
+        yield
+        return
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _LOCK_KEY})
+        connection.commit()
+        try:
+            yield
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _LOCK_KEY})
+            connection.commit()
+
+
+def upgrade(engine, target: Optional[int] = None, echo: Callable[[str], None] = lambda message: None) -> int:
+    """Apply pending migrations up to *target* (default: all). Returns how many ran."""
+    count = 0
+    with _lock(engine):
+        with engine.begin() as connection:
+            _metadata.create_all(connection)
+
+        for migration in pending(engine):
+            if target is not None and migration.version > target:
+                break
+            echo(f"Applying {migration.version:04d} {migration.name}: {migration.description}")
+            with engine.begin() as connection:
+                # Recorded first: without the lock, a concurrent run fails on the key instead of applying it twice.
+                connection.execute(schema_migrations.insert().values(
+                    version=migration.version, name=migration.name, applied_at=datetime.utcnow(),
+                ))
+                migration.upgrade(connection)
+            count += 1
+    return count
+
+
+schema_cli = AppGroup("schema", help="Database schema migrations.")
+
+
+@schema_cli.command("upgrade")
+@click.option("--to", "target", type=int, help="Stop after this migration version.")
+def upgrade_command(target: Optional[int]) -> None:
+    """Apply pending migrations."""
+    count = upgrade(db.engine, target, echo=click.echo)
+    click.echo(f"{count} migration(s) applied." if count else "Schema is up to date.")
+
+
+@schema_cli.command("status")
+def status_command() -> None:
+    """List migrations and whether they have been applied."""
+    with db.engine.connect() as connection:
+        done = set(applied_versions(connection))
+    for migration in discover():
+        mark = "x" if migration.version in done else " "
+        click.echo(f"[{mark}] {migration.version:04d} {migration.name}: {migration.description}")
+
+
+@schema_cli.command("check-plans")
+def check_plans_command() -> None:
+    """EXPLAIN the dashboard and scan-detail queries and fail if any needs a full scan."""
+    from .plans import check_plans
+
+    failures = 0
+    for result in check_plans(db.engine):
+        click.echo(f"[{'ok' if result.ok else 'FAIL'}] {result.name}")
+        for line in result.plan:
+            click.echo(f"      {line}")
+        failures += not result.ok
+    if failures:
+        click.echo(f"{failures} query plan(s) without an index.", err=True)
+        sys.exit(1)
+
+
+def init_app(app) -> None:
+    app.cli.add_command(schema_cli)
@@ -0,0 +1,101 @@
+"""Check that the hot dashboard and scan-detail queries are served by indexes.
+
+Each query below mirrors one issued by the developer dashboard, the scan
+detail page or the activity feed. The check ``EXPLAIN``s them and fails
+any plan that reads ``defects`` or ``activity_logs`` with a full table
+scan. On PostgreSQL sequential scans are disabled for the check, so the
+answer does not depend on the planner preferring them for small tables.
+"""
+
+from __future__ import annotations
+
+import re
+from datetime import datetime, timedelta
+from typing import List, NamedTuple
+
+from sqlalchemy import text
+
+from app.extensions import db
+from app.models import ActivityLog, Defect, DefectStatus
+
+CHECKED_TABLES = ("defects", "activity_logs")
+
+
+class PlanResult(NamedTuple):
+    name: str
+    ok: bool
+    plan: List[str]
+
+
+def _queries() -> List[tuple]:
+    now = datetime(2000, 1, 1)
+    scan_id = 1
+    return [
+        ("dashboard: stale reviews", db.select(db.func.count(Defect.id)).where(
+            Defect.status == DefectStatus.UNDER_REVIEW.value,
+            Defect.status_changed_at < now - timedelta(days=7),
+        )),
+        ("dashboard: new defects in 24h", db.select(db.func.count(Defect.id)).where(
+            Defect.created_at >= now - timedelta(hours=24),
+        )),
+        ("scan detail: defects newest first", db.select(Defect).where(
+            Defect.scan_id == scan_id,
+        ).order_by(Defect.created_at.desc())),
+        ("scan detail: status counts", db.select(Defect.status, db.func.count(Defect.id)).where(
+            Defect.scan_id == scan_id,
+        ).group_by(Defect.status)),
+        ("scan detail: creation trend", db.select(db.func.date(Defect.created_at), db.func.count(Defect.id)).where(
+            Defect.scan_id == scan_id,
+            Defect.created_at >= now - timedelta(days=30),
+        ).group_by(db.func.date(Defect.created_at))),
+        ("scan detail: open defects", db.select(Defect.id).where(
+            Defect.scan_id == scan_id,
+            Defect.status == DefectStatus.REPORTED.value,
+        )),
+        ("activity: history of one defect", db.select(ActivityLog).where(
+            ActivityLog.defect_id == 1,
+        ).order_by(ActivityLog.id.desc())),
+        ("activity: since a time", db.select(ActivityLog).where(
+            ActivityLog.timestamp >= now,
+        )),
+    ]
+
+
+def _sqlite_plan(connection, sql: str) -> List[str]:
+    return [row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+def _sqlite_full_scan(line: str) -> bool:
+    # "SCAN t USING INDEX i" walks the whole index; only SEARCH is a seek.
+    return bool(re.match(rf"SCAN ({'|'.join(CHECKED_TABLES)})\b", line))
+
+
+def _postgres_plan(connection, sql: str) -> List[str]:
+    connection.execute(text("SET LOCAL enable_seqscan = off"))
+    return [row[0] for row in connection.execute(text(f"EXPLAIN {sql}"))]
+
+
+def _postgres_full_scan(line: str) -> bool:
+    return bool(re.search(rf"Seq Scan on ({'|'.join(CHECKED_TABLES)})\b", line))
+
+
+_DIALECTS = {
+    "sqlite": (_sqlite_plan, _sqlite_full_scan),
+    "postgresql": (_postgres_plan, _postgres_full_scan),
+}
+
+
+def check_plans(engine) -> List[PlanResult]:
+    """EXPLAIN every checked query on *engine*; ``ok`` is false for full scans."""
+    if engine.dialect.name not in _DIALECTS:
+        raise RuntimeError(f"Query plan checks support SQLite and PostgreSQL, not {engine.dialect.name}")
+    explain, is_full_scan = _DIALECTS[engine.dialect.name]
+
+    results = []
+    for name, statement in _queries():
+        sql = str(statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+        with engine.connect() as connection:
+            plan = explain(connection, sql)
+            connection.rollback()
+        results.append(PlanResult(name, not any(is_full_scan(line) for line in plan), plan))
+    return results
@@ -0,0 +1,57 @@
+"""Scans, defects and activity logs as they stood before versioned migrations.
+
+A frozen copy of the original schema, independent of ``app/models.py``:
+every change since is a later migration. Databases created by
+``create_app`` before the runner existed already have these tables and are
+left alone.
+"""
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, MetaData, String, Table, Text
+
+metadata = MetaData()
+
+Table(
+    "scans",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String(255), nullable=False),
+    Column("model_path", String(500)),
+    Column("created_at", DateTime),
+)
+
+Table(
+    "defects",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("scan_id", Integer, ForeignKey("scans.id"), nullable=False),
+    Column("x", Float, nullable=False),
+    Column("y", Float, nullable=False),
+    Column("z", Float, nullable=False),
+    Column("element", String(255)),
+    Column("location", String(100)),
+    Column("defect_type", String(50)),
+    Column("severity", String(20)),
+    Column("priority", String(20)),
+    Column("description", Text),
+    Column("status", String(50)),
+    Column("image_path", String(500)),
+    Column("notes", Text),
+    Column("created_at", DateTime),
+)
+
+Table(
+    "activity_logs",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("defect_id", Integer, ForeignKey("defects.id")),
+    Column("scan_id", Integer, ForeignKey("scans.id")),
+    Column("action", String(255), nullable=False),
+    Column("old_value", String(255)),
+    Column("new_value", String(255)),
+    Column("timestamp", DateTime),
+    Column("updated_at", DateTime),
+)
+
+
+def upgrade(connection) -> None:
+    metadata.create_all(connection)
@@ -0,0 +1,56 @@
+"""Full-text index over defect text fields (FTS5 on SQLite, tsvector on PostgreSQL)."""
+
+from sqlalchemy import inspect, text
+
+FIELDS = ("description", "element", "location", "notes", "defect_type")
+# setweight importance per field, in FIELDS order.
+POSTGRES_WEIGHTS = ("A", "B", "C", "C", "B")
+
+SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE defects_fts USING fts5(
+        {', '.join(FIELDS)},
+        content='defects', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER defects_fts_ai AFTER INSERT ON defects BEGIN
+        INSERT INTO defects_fts(rowid, {', '.join(FIELDS)})
+        VALUES (new.id, {', '.join('new.' + field for field in FIELDS)});
+    END""",
+    f"""CREATE TRIGGER defects_fts_ad AFTER DELETE ON defects BEGIN
+        INSERT INTO defects_fts(defects_fts, rowid, {', '.join(FIELDS)})
+        VALUES ('delete', old.id, {', '.join('old.' + field for field in FIELDS)});
+    END""",
+    f"""CREATE TRIGGER defects_fts_au AFTER UPDATE OF {', '.join(FIELDS)} ON defects BEGIN
+        INSERT INTO defects_fts(defects_fts, rowid, {', '.join(FIELDS)})
+        VALUES ('delete', old.id, {', '.join('old.' + field for field in FIELDS)});
+        INSERT INTO defects_fts(rowid, {', '.join(FIELDS)})
+        VALUES (new.id, {', '.join('new.' + field for field in FIELDS)});
+    END""",
+    "INSERT INTO defects_fts(defects_fts) VALUES ('rebuild')",
+]
+
+POSTGRES_VECTOR = " || ".join(
+    f"setweight(to_tsvector('simple', coalesce({field}, '')), '{weight}')"
+    for field, weight in zip(FIELDS, POSTGRES_WEIGHTS)
+)
+POSTGRES_DDL = [
+    f"ALTER TABLE defects ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    f"GENERATED ALWAYS AS ({POSTGRES_VECTOR}) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_defects_search_vector ON defects USING GIN (search_vector)",
+]
+
+
+def _sqlite_has_fts5(connection) -> bool:
+    options = {row[0] for row in connection.execute(text("PRAGMA compile_options"))}
+    return "ENABLE_FTS5" in options
+
+
+def upgrade(connection) -> None:
+    # Other backends, and SQLite builds without FTS5, search with ILIKE (app/search.py).
+    if connection.dialect.name == "sqlite" and _sqlite_has_fts5(connection):
+        if "defects_fts" not in inspect(connection).get_table_names():
+            for statement in SQLITE_DDL:
+                connection.execute(text(statement))
+    elif connection.dialect.name == "postgresql":
+        for statement in POSTGRES_DDL:
+            connection.execute(text(statement))
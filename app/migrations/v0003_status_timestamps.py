@@ -0,0 +1,53 @@
+"""Defect status_changed_at and updated_at, indexed by (status, status_changed_at) and backfilled."""
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table, func, select
+
+from app.schema import add_missing_columns
+
+metadata = MetaData()
+
+defects = Table(
+    "defects",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("status", String(50)),
+    Column("created_at", DateTime),
+    Column("status_changed_at", DateTime),
+    Column("updated_at", DateTime),
+)
+Index("ix_defects_status_status_changed_at", defects.c.status, defects.c.status_changed_at)
+
+activity_logs = Table(
+    "activity_logs",
+    metadata,
+    Column("defect_id", Integer),
+    Column("action", String(255)),
+    Column("timestamp", DateTime),
+)
+
+
+def _backfill(connection) -> None:
+    # The last logged status change is the best record of when the current
+    # status was entered; defects never changed fall back to created_at.
+    last_change = (
+        select(func.max(activity_logs.c.timestamp))
+        .where(activity_logs.c.defect_id == defects.c.id, activity_logs.c.action.like("status updated%"))
+        .scalar_subquery()
+    )
+    connection.execute(
+        defects.update()
+        .where(defects.c.status_changed_at.is_(None))
+        .values(status_changed_at=func.coalesce(last_change, defects.c.created_at))
+    )
+    connection.execute(
+        defects.update()
+        .where(defects.c.updated_at.is_(None))
+        .values(updated_at=func.coalesce(defects.c.status_changed_at, defects.c.created_at))
+    )
+
+
+def upgrade(connection) -> None:
+    add_missing_columns(connection, metadata)
+    for index in defects.indexes:
+        index.create(connection, checkfirst=True)
+    _backfill(connection)
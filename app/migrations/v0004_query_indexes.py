@@ -0,0 +1,32 @@
+"""Indexes for the per-scan defect queries and the activity feed."""
+
+from sqlalchemy import Column, DateTime, Index, Integer, MetaData, String, Table
+
+metadata = MetaData()
+
+defects = Table(
+    "defects",
+    metadata,
+    Column("scan_id", Integer),
+    Column("status", String(50)),
+    Column("created_at", DateTime),
+)
+Index("ix_defects_scan_id", defects.c.scan_id)
+Index("ix_defects_scan_id_status", defects.c.scan_id, defects.c.status)
+Index("ix_defects_scan_id_created_at", defects.c.scan_id, defects.c.created_at)
+Index("ix_defects_created_at", defects.c.created_at)
+
+activity_logs = Table(
+    "activity_logs",
+    metadata,
+    Column("defect_id", Integer),
+    Column("timestamp", DateTime),
+)
+Index("ix_activity_logs_timestamp", activity_logs.c.timestamp)
+Index("ix_activity_logs_defect_id", activity_logs.c.defect_id)
+
+
+def upgrade(connection) -> None:
+    for table in metadata.sorted_tables:
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            index.create(connection, checkfirst=True)
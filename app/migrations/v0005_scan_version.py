@@ -0,0 +1,17 @@
+"""Per-scan version counter behind the defect ETags and response cache."""
+
+from sqlalchemy import Column, Integer, MetaData, Table
+
+from app.schema import add_missing_columns
+
+metadata = MetaData()
+
+Table(
+    "scans",
+    metadata,
+    Column("version", Integer, nullable=False, server_default="0"),
+)
+
+
+def upgrade(connection) -> None:
+    add_missing_columns(connection, metadata)
@@ -0,0 +1,74 @@
+"""Per-scan defect count rollup (scan_stats), filled in for existing scans."""
+
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, MetaData, String, Table, case, exists, func, select
+
+metadata = MetaData()
+
+scans = Table("scans", metadata, Column("id", Integer, primary_key=True))
+
+defects = Table(
+    "defects",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("scan_id", Integer),
+    Column("status", String(50)),
+    Column("priority", String(20)),
+    Column("severity", String(20)),
+)
+
+# counter column -> (defect column, value counted); missing priorities count as Medium
+VALUE_COUNTS = {
+    "reported_count": ("status", "Reported"),
+    "review_count": ("status", "Under Review"),
+    "fixed_count": ("status", "Fixed"),
+    "urgent_priority_count": ("priority", "Urgent"),
+    "high_priority_count": ("priority", "High"),
+    "medium_priority_count": ("priority", "Medium"),
+    "low_priority_count": ("priority", "Low"),
+    "critical_severity_count": ("severity", "Critical"),
+    "high_severity_count": ("severity", "High"),
+    "medium_severity_count": ("severity", "Medium"),
+    "low_severity_count": ("severity", "Low"),
+}
+
+scan_stats = Table(
+    "scan_stats",
+    metadata,
+    Column("scan_id", Integer, ForeignKey("scans.id"), primary_key=True),
+    Column("defect_count", Integer, nullable=False),
+    *(Column(name, Integer, nullable=False) for name in VALUE_COUNTS),
+    Column("open_urgent_count", Integer, nullable=False),  # Urgent/High priority and not Fixed
+    Column("last_activity_at", DateTime),
+)
+
+
+def _backfill(connection) -> None:
+    """One row per scan that has none, counted from its defects."""
+    fields = {
+        "status": defects.c.status,
+        "priority": func.coalesce(defects.c.priority, "Medium"),
+        "severity": defects.c.severity,
+    }
+
+    def total(condition):
+        # Scans without defects join one all-NULL row, which must not count as Medium
+        return func.coalesce(func.sum(case((defects.c.id.isnot(None) & condition, 1), else_=0)), 0)
+
+    columns = [scans.c.id, func.count(defects.c.id)]
+    columns.extend(total(fields[field] == value) for field, value in VALUE_COUNTS.values())
+    columns.append(total(
+        fields["priority"].in_(("Urgent", "High")) & (func.coalesce(defects.c.status, "") != "Fixed")
+    ))
+    query = (
+        select(*columns)
+        .select_from(scans.outerjoin(defects, defects.c.scan_id == scans.c.id))
+        .where(~exists().where(scan_stats.c.scan_id == scans.c.id))
+        .group_by(scans.c.id)
+    )
+    names = ["scan_id", "defect_count", *VALUE_COUNTS, "open_urgent_count"]
+    connection.execute(scan_stats.insert().from_select(names, query))
+
+
+def upgrade(connection) -> None:
+    scan_stats.create(connection, checkfirst=True)
+    _backfill(connection)
@@ -25,6 +25,7 @@ class Scan(db.Model):
     name = db.Column(db.String(255), nullable=False)
     model_path = db.Column(db.String(500))  # Path to 3D model file
     created_at = db.Column(db.DateTime, default=db.func.now())
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Bumped by every defect write (see app/changes.py)
 
     defects = db.relationship('Defect', backref='scan', lazy=True)
 
@@ -45,8 +46,40 @@ class Defect(db.Model):
     image_path = db.Column(db.String(500))  # Path to snapshot image
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=db.func.now())
+    status_changed_at = db.Column(db.DateTime, default=datetime.utcnow)  # Set whenever status changes (see app/sla.py)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     activities = db.relationship('ActivityLog', backref='defect', lazy=True)
 
+    # Indexes backing the dashboard and scan-detail queries (see app/migrations/plans.py)
+    __table_args__ = (
+        db.Index('ix_defects_scan_id', 'scan_id'),
+        db.Index('ix_defects_scan_id_status', 'scan_id', 'status'),
+        db.Index('ix_defects_scan_id_created_at', 'scan_id', 'created_at'),
+        db.Index('ix_defects_created_at', 'created_at'),
+        db.Index('ix_defects_status_status_changed_at', 'status', 'status_changed_at'),
+    )
+
+class ScanStats(db.Model):
+    """Per-scan defect counts, kept current by every defect write (see app/stats.py)"""
+    __tablename__ = 'scan_stats'
+    scan_id = db.Column(db.Integer, db.ForeignKey('scans.id'), primary_key=True)
+    defect_count = db.Column(db.Integer, nullable=False, default=0)
+    reported_count = db.Column(db.Integer, nullable=False, default=0)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    fixed_count = db.Column(db.Integer, nullable=False, default=0)
+    urgent_priority_count = db.Column(db.Integer, nullable=False, default=0)
+    high_priority_count = db.Column(db.Integer, nullable=False, default=0)
+    medium_priority_count = db.Column(db.Integer, nullable=False, default=0)
+    low_priority_count = db.Column(db.Integer, nullable=False, default=0)
+    critical_severity_count = db.Column(db.Integer, nullable=False, default=0)
+    high_severity_count = db.Column(db.Integer, nullable=False, default=0)
+    medium_severity_count = db.Column(db.Integer, nullable=False, default=0)
+    low_severity_count = db.Column(db.Integer, nullable=False, default=0)
+    open_urgent_count = db.Column(db.Integer, nullable=False, default=0)  # Urgent/High priority and not Fixed
+    last_activity_at = db.Column(db.DateTime)
+
+    scan = db.relationship('Scan', backref=db.backref('stats', uselist=False))
+
 # Assignment model removed
 
 class ActivityLog(db.Model):
@@ -61,4 +94,9 @@ class ActivityLog(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
     scan = db.relationship('Scan', backref='activities')
-    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
\ No newline at end of file
+    updated_at = db.Column(db.DateTime, default=db.func.now(), onupdate=db.func.now())
+
+    __table_args__ = (
+        db.Index('ix_activity_logs_timestamp', 'timestamp'),
+        db.Index('ix_activity_logs_defect_id', 'defect_id'),
+    )
\ No newline at end of file
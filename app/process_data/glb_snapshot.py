@@ -4,15 +4,31 @@
 from __future__ import annotations
 
 import argparse
+import importlib.util
 import json
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 try:
-    from pygltflib import GLTF2  # type: ignore
-except ImportError:  # pragma: no cover - runtime dependency
-    GLTF2 = None
+    from app.metrics import stage
+except ImportError:  # pragma: no cover - run as a standalone script
+    from contextlib import nullcontext as stage  # type: ignore
+
+
+def gltf_available() -> bool:
+    """Whether pygltflib is installed, without importing it."""
+    return importlib.util.find_spec("pygltflib") is not None
+
+
+def _load_gltf():
+    # pygltflib (and its dataclasses-json stack) is only imported by the code
+    # paths that parse GLB files, so app start-up does not pay for it.
+    try:
+        from pygltflib import GLTF2  # type: ignore
+    except ImportError:  # pragma: no cover - runtime dependency
+        raise RuntimeError("pygltflib is not installed; run `pip install pygltflib`.") from None
+    return GLTF2
 
 
 @dataclass
@@ -137,12 +153,12 @@ def extract_snapshots_from_nodes(nodes: Iterable[Any]) -> List[SnapshotRecord]:
 
 
 def extract_snapshots(glb_file: Path | str) -> List[SnapshotRecord]:
-    if GLTF2 is None:
-        raise RuntimeError("pygltflib is not installed; run `pip install pygltflib`." )
-
-    gltf = GLTF2().load(str(glb_file))
+    GLTF2 = _load_gltf()
+    with stage("extract_snapshots.load_glb"):
+        gltf = GLTF2().load(str(glb_file))
     nodes = gltf.nodes or []
-    return extract_snapshots_from_nodes(nodes)
+    with stage("extract_snapshots.parse_nodes"):
+        return extract_snapshots_from_nodes(nodes)
 
 
 def cli(argv: Optional[Sequence[str]] = None) -> int:
@@ -14,19 +14,19 @@ from flask import (
     redirect,
     render_template,
     request,
-    send_from_directory,
     url_for,
 )
 
-from .glb_snapshot import SnapshotRecord, extract_snapshots
-
-try:
-    from pygltflib import GLTF2
-except ImportError:  # pragma: no cover
-    GLTF2 = None
+from .glb_snapshot import SnapshotRecord, extract_snapshots, gltf_available
 
+from app import events
+from app.changes import mark_scans_changed
 from app.extensions import db
+from app.filesending import send_file_from
+from app.metrics import stage
 from app.models import Scan, Defect
+from app.querybudget import query_budget
+from app.stats import StatsDelta
 
 
 process_data_bp = Blueprint("process_data", __name__)
@@ -145,7 +145,7 @@ def _prepare_for_postgres(defects: List[DefectRecord]) -> List[dict]:
 
 
 def _parse_defects_from_glb(defect_filepath: str) -> List[DefectRecord]:
-    if GLTF2 is None:
+    if not gltf_available():
         raise RuntimeError("pygltflib is not installed; cannot parse GLB defects")
 
     snapshots: List[SnapshotRecord] = extract_snapshots(defect_filepath)
@@ -208,6 +208,27 @@ def _save_latest_metadata(metadata: dict) -> None:
         json.dump(metadata, fh, indent=2)
 
 
+def _bulk_create_defects(scan_id: int, rows: List[dict]) -> None:
+    """Insert a new scan's defects in one statement.
+
+    A bulk insert skips the ORM flush hooks, so the scan_stats counters, the
+    scan version and the change event are recorded here, as in
+    app/defects/batch.py.
+    """
+    if not rows:
+        return
+    # Core insert: one executemany even where rows differ in which values are None.
+    db.session.execute(Defect.__table__.insert(), rows)
+    delta = StatsDelta()
+    for row in rows:
+        delta.add(scan_id, row["status"], row["priority"], row["severity"])
+    delta.apply(db.session.connection())
+    mark_scans_changed(db.session, [scan_id])
+    # The scan is new, so its defects are exactly the rows just inserted.
+    defect_ids = db.session.scalars(db.select(Defect.id).where(Defect.scan_id == scan_id)).all()
+    events.record(db.session, scan_id, events.CREATED, defect_ids)
+
+
 def _save_scan_metadata(scan_id: int, metadata: dict) -> None:
     """Persist a copy of upload metadata for a specific Scan.
 
@@ -351,9 +372,11 @@ def _render_error(message: str):
 
 
 @process_data_bp.route("/process-data", methods=["GET", "POST"])
+@query_budget(9)
 def process_defect_file():
     if request.method == "POST" and "save_to_db" in request.form:
-        defects, source_path, source_kind = _load_defects()
+        with stage("process_defect_file.load_defects"):
+            defects, source_path, source_kind = _load_defects()
         if not defects:
             flash("No defects to save.", "error")
             return redirect(url_for("process_data.process_defect_file"))
@@ -362,41 +385,46 @@ def process_defect_file():
         metadata = _load_latest_metadata()
         defect_assignments = _defect_assignments_map(metadata) if metadata else {}
 
-        # Create a new scan
-        scan_name = request.form.get("scan_name", f"Scan from {source_kind}")
-        glb_file = _load_glb_defect_file()  # Get the GLB path
-        model_path = os.path.basename(glb_file) if glb_file else None
-        scan = Scan(name=scan_name, model_path=model_path)
-        db.session.add(scan)
-        db.session.commit()
-
-        # Create defects with image assignments
-        for rec in _prepare_for_postgres(defects):
-            # Get image path for this defect if assigned
-            image_path = None
-            defect_id_str = str(rec["defect_id"])
-            if defect_id_str in defect_assignments and metadata:
-                image_id = defect_assignments[defect_id_str]
-                resolved = _resolve_image(metadata, image_id)
-                if resolved:
-                    image_dir, filename = resolved
-                    # Store relative path from upload_data folder
-                    image_path = os.path.join(os.path.basename(image_dir), filename)
-
-            defect = Defect(
-                scan_id=scan.id,
-                x=rec["x"],
-                y=rec["y"],
-                z=rec["z"],
-                element=rec.get("element"),
-                defect_type=rec.get("defect_type", "Unknown"),
-                severity=rec.get("severity", "Medium"),
-                description=rec.get("description", ""),
-                status="Reported",
-                image_path=image_path,
-            )
-            db.session.add(defect)
-        db.session.commit()
+        with stage("process_defect_file.save_to_db"):
+            # Create a new scan
+            scan_name = request.form.get("scan_name", f"Scan from {source_kind}")
+            glb_file = _load_glb_defect_file()  # Get the GLB path
+            model_path = os.path.basename(glb_file) if glb_file else None
+            scan = Scan(name=scan_name, model_path=model_path)
+            db.session.add(scan)
+            db.session.commit()
+
+            # Create defects with image assignments
+            rows = []
+            for rec in _prepare_for_postgres(defects):
+                # Get image path for this defect if assigned
+                image_path = None
+                defect_id_str = str(rec["defect_id"])
+                if defect_id_str in defect_assignments and metadata:
+                    image_id = defect_assignments[defect_id_str]
+                    resolved = _resolve_image(metadata, image_id)
+                    if resolved:
+                        image_dir, filename = resolved
+                        # Store relative path from upload_data folder
+                        image_path = os.path.join(os.path.basename(image_dir), filename)
+
+                rows.append(
+                    dict(
+                        scan_id=scan.id,
+                        x=rec["x"],
+                        y=rec["y"],
+                        z=rec["z"],
+                        element=rec.get("element"),
+                        defect_type=rec.get("defect_type", "Unknown"),
+                        severity=rec.get("severity", "Medium"),
+                        priority="Medium",
+                        description=rec.get("description", ""),
+                        status="Reported",
+                        image_path=image_path,
+                    )
+                )
+            _bulk_create_defects(scan.id, rows)
+            db.session.commit()
 
         # Persist a per-scan copy of the upload metadata so that
         # each project keeps its own project details.
@@ -407,11 +435,13 @@ def process_defect_file():
         return redirect(url_for("defects.visualize_scan", scan_id=scan.id))
 
     # GET logic
-    defects, source_path, source_kind = _load_defects()
+    with stage("process_defect_file.load_defects"):
+        defects, source_path, source_kind = _load_defects()
     metadata = _load_latest_metadata()
     auto_assigned = False
     if metadata and defects:
-        auto_assigned = _auto_assign_images(metadata, defects)
+        with stage("process_defect_file.auto_assign_images"):
+            auto_assigned = _auto_assign_images(metadata, defects)
         if auto_assigned:
             _save_latest_metadata(metadata)
     image_entries = _image_entries(metadata)
@@ -445,20 +475,22 @@ def process_defect_file():
     project_name = metadata.get("project_name", "Scan") if metadata else "Scan"
     default_scan_name = f"scanID_{next_scan_id}_{project_name}"
 
-    return render_template(
-        "process_data/process_result.html",
-        error=error,
-        defects=defects,
-        prepared_records=prepared_records,
-        image_entries=image_entries,
-        defect_assignments=defect_assignments,
-        upload_metadata=metadata,
-        default_scan_name=default_scan_name,
-        auto_assigned=auto_assigned,
-    )
+    with stage("process_defect_file.render"):
+        return render_template(
+            "process_data/process_result.html",
+            error=error,
+            defects=defects,
+            prepared_records=prepared_records,
+            image_entries=image_entries,
+            defect_assignments=defect_assignments,
+            upload_metadata=metadata,
+            default_scan_name=default_scan_name,
+            auto_assigned=auto_assigned,
+        )
 
 
 @process_data_bp.route("/process-data.json", methods=["GET"])
+@query_budget(0)
 def process_defect_file_json():
     defects, source_path, source_kind = _load_defects()
     metadata = _load_latest_metadata()
@@ -485,6 +517,7 @@ def process_defect_file_json():
 
 
 @process_data_bp.route("/process-data/image/<image_id>", methods=["GET"])
+@query_budget(0)
 def serve_extracted_image(image_id: str):
     metadata = _load_latest_metadata()
     if not metadata:
@@ -502,10 +535,11 @@ def serve_extracted_image(image_id: str):
     if not os.path.exists(image_path):
         abort(404)
 
-    return send_from_directory(image_dir, filename)
+    return send_file_from(image_dir, filename)
 
 
 @process_data_bp.route("/process-data/assign-image", methods=["POST"])
+@query_budget(3)
 def assign_image_to_defect():
     metadata = _load_latest_metadata()
     if not metadata:
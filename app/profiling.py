@@ -0,0 +1,182 @@
+"""Opt-in cProfile capture of live requests, stored under ``instance/profiles``.
+
+A request is profiled when ``PROFILING_ENABLED`` is set and it falls in the
+``PROFILING_SAMPLE_RATE`` fraction, or when it carries a valid
+``X-Profile`` header. The header value is a token signed with the app's
+``SECRET_KEY`` (``flask profiling token``), so profiling one slow request
+in production needs no config change and cannot be triggered by anyone
+without the key.
+
+Each capture is a ``.prof`` file (load with ``pstats`` or snakeviz) plus a
+``.json`` summary of the request. Only the newest ``PROFILING_MAX_FILES``
+captures are kept. Streaming responses are profiled up to the first byte.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import time
+from datetime import datetime
+from io import StringIO
+from typing import List, Optional
+
+import click
+from flask import current_app, g, request
+from flask.cli import AppGroup
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+HEADER = "X-Profile"
+_SALT = "profile-request"
+_NAME = re.compile(r"^[\w.-]+$")
+
+
+def profile_dir(app=None) -> str:
+    app = app or current_app
+    return os.path.join(app.instance_path, "profiles")
+
+
+def _serializer(app) -> URLSafeTimedSerializer:
+    return URLSafeTimedSerializer(app.config["SECRET_KEY"], salt=_SALT)
+
+
+def make_token(app) -> str:
+    return _serializer(app).dumps("profile")
+
+
+def _valid_token(app, token: str) -> bool:
+    try:
+        _serializer(app).loads(token, max_age=app.config.get("PROFILING_TOKEN_MAX_AGE", 3600))
+    except BadSignature:
+        return False
+    return True
+
+
+def _should_profile(app) -> bool:
+    token = request.headers.get(HEADER)
+    if token:
+        return _valid_token(app, token)
+    if not app.config.get("PROFILING_ENABLED"):
+        return False
+    return random.random() < app.config.get("PROFILING_SAMPLE_RATE", 1.0)
+
+
+def _start_profile() -> None:
+    if not _should_profile(current_app):
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Only one profiler can be active at a time (Python 3.12+ shares it
+        # between threads); skip this request rather than fail it.
+        return
+    g.profiler = profiler
+    g.profile_started = time.perf_counter()
+
+
+def _record_status(response):
+    if "profiler" in g:
+        g.profile_status = response.status_code
+    return response
+
+
+def _stop_profile(exc: Optional[BaseException] = None) -> None:
+    # A teardown hook: it also runs when the view raised, so the profiler
+    # never stays enabled on this thread. No response means a 500.
+    profiler = g.pop("profiler", None)
+    if profiler is None:
+        return
+    profiler.disable()
+    duration = time.perf_counter() - g.pop("profile_started")
+    try:
+        _save(profiler, duration, g.pop("profile_status", 500))
+    except OSError:
+        current_app.logger.warning("Could not store request profile", exc_info=True)
+
+
+def _save(profiler: cProfile.Profile, duration: float, status: int) -> None:
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    endpoint = request.endpoint or "unmatched"
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    name = f"{stamp}-{endpoint}-{int(duration * 1000)}ms"
+    profiler.dump_stats(os.path.join(directory, f"{name}.prof"))
+    summary = {
+        "name": name,
+        "endpoint": endpoint,
+        "method": request.method,
+        "path": request.full_path.rstrip("?"),
+        "status": status,
+        "duration_ms": round(duration * 1000, 2),
+        "captured_at": datetime.utcnow().isoformat(timespec="seconds"),
+    }
+    sql = g.get("metrics_sql")
+    if sql is not None:
+        summary["sql_queries"], summary["sql_ms"] = sql[0], round(sql[1] * 1000, 2)
+    with open(os.path.join(directory, f"{name}.json"), "w", encoding="utf-8") as fh:
+        json.dump(summary, fh)
+    _rotate(directory, current_app.config.get("PROFILING_MAX_FILES", 200))
+
+
+def _rotate(directory: str, keep: int) -> None:
+    names = sorted(entry[:-5] for entry in os.listdir(directory) if entry.endswith(".json"))
+    for name in names[:max(len(names) - keep, 0)]:
+        for extension in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(directory, name + extension))
+            except FileNotFoundError:
+                pass
+
+
+def slowest(limit: int = 50) -> List[dict]:
+    """Summaries of the stored captures, slowest first."""
+    directory = profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    summaries = []
+    for entry in os.listdir(directory):
+        if not entry.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, entry), "r", encoding="utf-8") as fh:
+                summaries.append(json.load(fh))
+        except (OSError, ValueError):
+            continue
+    summaries.sort(key=lambda summary: summary.get("duration_ms", 0), reverse=True)
+    return summaries[:limit]
+
+
+def profile_path(name: str) -> Optional[str]:
+    if not _NAME.match(name):
+        return None
+    path = os.path.join(profile_dir(), f"{name}.prof")
+    return path if os.path.exists(path) else None
+
+
+def report(path: str, sort: str = "cumulative", limit: int = 40) -> str:
+    """The top of a ``pstats`` listing of the profile at *path*."""
+    out = StringIO()
+    stats = pstats.Stats(path, stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+profiling_cli = AppGroup("profiling", help="Request profiling.")
+
+
+@profiling_cli.command("token")
+def token_command() -> None:
+    """Print a token for the X-Profile header (valid for PROFILING_TOKEN_MAX_AGE seconds)."""
+    click.echo(make_token(current_app))
+
+
+def init_app(app) -> None:
+    app.before_request(_start_profile)
+    app.after_request(_record_status)
+    app.teardown_request(_stop_profile)
+    app.cli.add_command(profiling_cli)
@@ -0,0 +1,135 @@
+"""Per-route SQL query budgets.
+
+Every view declares how many SQL statements one request may issue::
+
+    @defects_bp.route('/projects')
+    @query_budget(2)
+    def list_projects(): ...
+
+Budgets are constants on purpose: a view whose query count grows with the
+number of scans or defects (an N+1 loop, a lazy relationship walked in a
+template) breaks its budget as soon as the dataset is big enough.
+
+``QUERY_BUDGET_MODE`` chooses what happens at runtime: ``off`` (default,
+nothing recorded), ``warn`` (log the statements of a request over budget)
+or ``raise`` (raise :class:`QueryBudgetExceeded`, for test runs). Outside
+a request, :func:`count_queries` records the statements of any block, and
+``python -m benchmarks.query_budgets`` checks every route against its
+budget at two dataset sizes.
+"""
+
+from __future__ import annotations
+
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+MODES = ("off", "warn", "raise")
+
+
+class QueryBudgetExceeded(AssertionError):
+    def __init__(self, endpoint: str, budget: int, statements: List[str]):
+        self.endpoint = endpoint
+        self.budget = budget
+        self.statements = statements
+        listing = "\n".join(f"  {index + 1}. {statement}" for index, statement in enumerate(statements))
+        super().__init__(f"{endpoint} issued {len(statements)} SQL statements, budget is {budget}:\n{listing}")
+
+
+class QueryLog:
+    """Statements recorded by :func:`count_queries`."""
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+_local = threading.local()
+
+
+def _active_logs() -> List[QueryLog]:
+    logs = getattr(_local, "logs", None)
+    if logs is None:
+        logs = _local.logs = []
+    return logs
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    for log in _active_logs():
+        log.statements.append(statement)
+    if has_app_context():
+        request_log = g.get("query_budget_log")
+        if request_log is not None:
+            request_log.statements.append(statement)
+
+
+def _listen() -> None:
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryLog]:
+    """Record every SQL statement this thread executes inside the block."""
+    _listen()
+    log = QueryLog()
+    logs = _active_logs()
+    logs.append(log)
+    try:
+        yield log
+    finally:
+        logs.remove(log)
+
+
+def query_budget(max_queries: int):
+    """Declare that one request to the decorated view issues at most *max_queries* statements."""
+
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+
+    return decorator
+
+
+def budget_for(view) -> Optional[int]:
+    return getattr(view, "query_budget", None)
+
+
+def _mode() -> str:
+    return current_app.config.get("QUERY_BUDGET_MODE", "off")
+
+
+def _start_request() -> None:
+    if _mode() != "off":
+        g.query_budget_log = QueryLog()
+
+
+def _check_request(response):
+    log = g.pop("query_budget_log", None)
+    if log is None:
+        return response
+    # Streamed bodies may still query while they are sent; only what ran before the first byte counts.
+    budget = budget_for(current_app.view_functions.get(request.endpoint))
+    if budget is None or log.count <= budget:
+        return response
+    error = QueryBudgetExceeded(request.endpoint, budget, log.statements)
+    if _mode() == "raise":
+        raise error
+    current_app.logger.warning("%s", error)
+    return response
+
+
+def init_app(app) -> None:
+    mode = app.config.get("QUERY_BUDGET_MODE", "off")
+    if mode not in MODES:
+        raise RuntimeError(f"QUERY_BUDGET_MODE must be one of {', '.join(MODES)}, not {mode!r}")
+    _listen()
+    app.before_request(_start_request)
+    app.after_request(_check_request)
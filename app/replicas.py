@@ -0,0 +1,98 @@
+"""Send the reads of read-only requests to database replicas.
+
+Replicas are binds named ``replica_<n>`` (``DATABASE_REPLICA_URLS``, see
+``Config``). For ``GET``/``HEAD`` requests :class:`RoutingSession` answers
+reads from one replica picked per request; everything else, and any
+statement that writes, goes to the primary. A view that writes on ``GET``
+opts out with :func:`use_primary`.
+
+Replicas lag behind the primary, so a client that has just written reads
+from the primary for ``REPLICA_STICKY_SECONDS`` afterwards (a cookie set on
+the response of the writing request), and a request that writes reads its
+own changes from the primary for the rest of the request.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from typing import List
+
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+REPLICA_PREFIX = "replica_"
+STICKY_COOKIE = "db_primary_until"
+_READ_METHODS = ("GET", "HEAD")
+_WROTE_KEY = "replicas_wrote"
+
+
+def replica_binds(urls: str | None) -> dict:
+    """``SQLALCHEMY_BINDS`` entries for a comma-separated list of replica URLs."""
+    if not urls:
+        return {}
+    return {f"{REPLICA_PREFIX}{index}": url.strip() for index, url in enumerate(urls.split(",")) if url.strip()}
+
+
+def replica_keys(engines) -> List[str]:
+    return sorted(key for key in engines if key and key.startswith(REPLICA_PREFIX))
+
+
+def use_primary(view):
+    """Read from the primary even for ``GET`` requests to *view*."""
+    view.use_primary = True
+    return view
+
+
+class RoutingSession(Session):
+    """``db.session`` that reads from the replica chosen for the current request."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+        replica = g.get("db_replica") if has_app_context() else None
+        if replica is None or self.info.get(_WROTE_KEY):
+            return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info[_WROTE_KEY] = True
+            return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        return self._db.engines[replica]
+
+
+def _wrote(session) -> bool:
+    return bool(session.info.get(_WROTE_KEY)) or bool(session.new or session.dirty or session.deleted)
+
+
+def _choose_replica() -> None:
+    from app.extensions import db
+
+    g.db_replica = None
+    if request.method not in _READ_METHODS:
+        return
+    view = current_app.view_functions.get(request.endpoint)
+    if view is None or getattr(view, "use_primary", False):
+        return
+    try:
+        if float(request.cookies.get(STICKY_COOKIE, 0)) > time.time():
+            return
+    except ValueError:
+        pass
+    keys = replica_keys(db.engines)
+    if keys:
+        g.db_replica = random.choice(keys)
+
+
+def _mark_sticky(response):
+    from app.extensions import db
+
+    wrote = request.method not in _READ_METHODS or _wrote(db.session)
+    if wrote and replica_keys(db.engines):
+        seconds = current_app.config.get("REPLICA_STICKY_SECONDS", 10)
+        response.set_cookie(STICKY_COOKIE, f"{time.time() + seconds:.3f}", max_age=int(seconds) + 1, httponly=True, samesite="Lax")
+    return response
+
+
+def init_app(app) -> None:
+    app.before_request(_choose_replica)
+    app.after_request(_mark_sticky)
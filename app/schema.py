@@ -0,0 +1,25 @@
+"""Add columns to existing tables.
+
+``create_all()`` creates missing tables but never touches existing ones, so
+migrations that add columns describe them in a ``MetaData`` of their own and
+pass it here; columns already present are skipped (see ``app/migrations``).
+"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+
+
+def add_missing_columns(conn, metadata) -> None:
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    preparer = conn.dialect.identifier_preparer
+
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present:
+                continue
+            column_ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {column_ddl}"))
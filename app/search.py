@@ -0,0 +1,117 @@
+"""Full-text search over defect text fields.
+
+SQLite gets an external-content FTS5 table (``defects_fts``) kept in sync by
+triggers on ``defects``; PostgreSQL gets a generated ``tsvector`` column with
+a GIN index, both created by a migration (see ``app/migrations``). The
+database maintains them itself, so every write path (ORM, bulk SQL, batch
+API) stays indexed without application hooks.
+Other backends, or SQLite builds without FTS5, fall back to ``ILIKE``.
+
+Every search word is matched as a prefix, so ``crac`` finds ``cracked``;
+all words must match.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Optional
+
+from sqlalchemy import Float, Integer, inspect, literal, or_, text
+
+from app.extensions import db
+from app.models import Defect
+
+FIELDS = ("description", "element", "location", "notes", "defect_type")
+# bm25 importance per field, in FIELDS order (the PostgreSQL weights are part
+# of the generated column, see app/migrations/v0002_defect_search.py).
+_SQLITE_WEIGHTS = (2.0, 1.5, 1.0, 1.0, 1.5)
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+# engine url -> "fts5" | "tsvector" | None, detected on first search
+_backends: Dict[str, Optional[str]] = {}
+
+
+def _detect(conn) -> Optional[str]:
+    inspector = inspect(conn)
+    if conn.dialect.name == "sqlite" and "defects_fts" in inspector.get_table_names():
+        return "fts5"
+    if conn.dialect.name == "postgresql" and any(
+        column["name"] == "search_vector" for column in inspector.get_columns("defects")
+    ):
+        return "tsvector"
+    return None
+
+
+def backend() -> Optional[str]:
+    """The index searches use, detected once per process from the migrated schema."""
+    url = str(db.engine.url)
+    if url not in _backends:
+        with db.engine.connect() as conn:
+            _backends[url] = _detect(conn)
+    return _backends[url]
+
+
+def words(query: str) -> List[str]:
+    return _WORD.findall(query.lower())
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def matches(query: str):
+    """Subquery of ``(id, score)`` for defects matching every word of *query*.
+
+    Higher scores are better matches. Returns ``None`` if *query* has no
+    searchable words.
+    """
+    terms = words(query)
+    if not terms:
+        return None
+
+    kind = backend()
+    if kind == "fts5":
+        expression = " AND ".join(f'"{term}"*' for term in terms)
+        weights = ", ".join(str(weight) for weight in _SQLITE_WEIGHTS)
+        return (
+            text(
+                f"SELECT rowid AS id, -bm25(defects_fts, {weights}) AS score "
+                "FROM defects_fts WHERE defects_fts MATCH :expression"
+            )
+            .bindparams(expression=expression)
+            .columns(id=Integer, score=Float)
+            .subquery("search_matches")
+        )
+
+    if kind == "tsvector":
+        vector = db.literal_column("defects.search_vector")
+        tsquery = db.func.to_tsquery("simple", " & ".join(f"{term}:*" for term in terms))
+        return (
+            db.select(Defect.id.label("id"), db.func.ts_rank(vector, tsquery).label("score"))
+            .where(vector.op("@@")(tsquery))
+            .subquery("search_matches")
+        )
+
+    # _WORD keeps "_", which LIKE would treat as a one-character wildcard.
+    patterns = [f"%{_escape_like(term)}%" for term in terms]
+    conditions = [
+        or_(*[getattr(Defect, field).ilike(pattern, escape="\\") for field in FIELDS])
+        for pattern in patterns
+    ]
+    return (
+        db.select(Defect.id.label("id"), literal(0.0).label("score"))
+        .where(*conditions)
+        .subquery("search_matches")
+    )
+
+
+def search(query: str, scan_id: Optional[int] = None, limit: int = 50, offset: int = 0):
+    """Return ``(Defect, score)`` pairs for *query*, best match first."""
+    found = matches(query)
+    if found is None:
+        return []
+    results = db.session.query(Defect, found.c.score).join(found, found.c.id == Defect.id)
+    if scan_id is not None:
+        results = results.filter(Defect.scan_id == scan_id)
+    return results.order_by(found.c.score.desc(), Defect.id.desc()).offset(offset).limit(limit).all()
@@ -0,0 +1,114 @@
+"""Status-transition timestamps and the SLA queries built on them.
+
+``Defect.status_changed_at`` is stamped whenever a defect's status changes
+and ``Defect.updated_at`` on every write. ORM writes are covered by an
+attribute listener and the column's ``onupdate``; the bulk SQL paths set
+both columns themselves. Ages are answered from the composite
+``(status, status_changed_at)`` index with range predicates, so no query
+here joins ``activity_logs`` or scans the table.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models import Defect, DefectStatus
+
+STALE_REVIEW_DAYS = 7
+# (label, lower bound in days) for the time-in-status histogram, youngest first.
+AGE_BUCKETS: Sequence[Tuple[str, int]] = (
+    ("under_1d", 0),
+    ("1_3d", 1),
+    ("3_7d", 3),
+    ("7_14d", 7),
+    ("14_30d", 14),
+    ("over_30d", 30),
+)
+
+
+def _status_set(target, value, oldvalue, initiator):
+    if value != oldvalue:
+        target.status_changed_at = datetime.utcnow()
+
+
+def status_changed_values(new_status: str, now: datetime) -> Dict[str, object]:
+    """Column values for a set-based UPDATE that moves rows to *new_status*.
+
+    Rows already in *new_status* keep their ``status_changed_at``.
+    """
+    return {
+        "status": new_status,
+        "status_changed_at": db.case(
+            (Defect.status.is_distinct_from(new_status), now),
+            else_=Defect.status_changed_at,
+        ),
+        "updated_at": now,
+    }
+
+
+def _statuses(status: Optional[str]) -> List[str]:
+    return [status] if status else [s.value for s in DefectStatus]
+
+
+def time_in_status(status: Optional[str] = None, scan_id: Optional[int] = None,
+                   now: Optional[datetime] = None) -> List[dict]:
+    """How long defects have been in their current status, bucketed by age."""
+    now = now or datetime.utcnow()
+    cutoffs = [(label, now - timedelta(days=days)) for label, days in AGE_BUCKETS]
+    columns = [Defect.status, db.func.count(Defect.id), db.func.min(Defect.status_changed_at)]
+    for position, (label, newest) in enumerate(cutoffs):
+        condition = Defect.status_changed_at <= newest
+        if position + 1 < len(cutoffs):
+            condition = condition & (Defect.status_changed_at > cutoffs[position + 1][1])
+        columns.append(db.func.coalesce(db.func.sum(db.case((condition, 1), else_=0)), 0))
+
+    query = db.session.query(*columns).filter(Defect.status.in_(_statuses(status)))
+    if scan_id is not None:
+        query = query.filter(Defect.scan_id == scan_id)
+    rows = {row[0]: row for row in query.group_by(Defect.status)}
+
+    result = []
+    for name in _statuses(status):
+        row = rows.get(name)
+        oldest = row[2] if row else None
+        result.append({
+            "status": name,
+            "count": int(row[1]) if row else 0,
+            "oldest_since": oldest.strftime("%Y-%m-%d %H:%M:%S") if oldest else None,
+            "max_days": round((now - oldest).total_seconds() / 86400, 2) if oldest else None,
+            "buckets": {label: int(row[3 + i]) if row else 0 for i, (label, _) in enumerate(AGE_BUCKETS)},
+        })
+    return result
+
+
+def overdue(status: str, days: float, scan_id: Optional[int] = None, limit: int = 100,
+            offset: int = 0, now: Optional[datetime] = None) -> Tuple[int, List[Defect]]:
+    """Defects that have been in *status* for more than *days*, longest first."""
+    now = now or datetime.utcnow()
+    query = Defect.query.filter(
+        Defect.status == status,
+        Defect.status_changed_at < now - timedelta(days=days),
+    )
+    if scan_id is not None:
+        query = query.filter(Defect.scan_id == scan_id)
+    total = query.count()
+    defects = query.order_by(Defect.status_changed_at.asc(), Defect.id.asc()).offset(offset).limit(limit).all()
+    return total, defects
+
+
+def stale_review_count(now: Optional[datetime] = None) -> int:
+    now = now or datetime.utcnow()
+    return Defect.query.filter(
+        Defect.status == DefectStatus.UNDER_REVIEW.value,
+        Defect.status_changed_at < now - timedelta(days=STALE_REVIEW_DAYS),
+    ).count()
+
+
+def init_app(app) -> None:
+    if not event.contains(Defect.status, "set", _status_set):
+        # active_history loads the old value of expired instances so unchanged writes are ignored
+        event.listen(Defect.status, "set", _status_set, active_history=True)
@@ -0,0 +1,203 @@
+"""Incrementally maintained per-scan defect counts (``scan_stats``).
+
+A flush listener turns every inserted, updated or deleted ``Defect`` into
+``+1``/``-1`` adjustments of the matching status, priority and severity
+counters and applies them with one ``UPDATE`` per scan inside the same
+transaction. Bulk SQL paths that bypass the unit of work build a
+:class:`StatsDelta` themselves and call :meth:`StatsDelta.apply`.
+"""
+
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models import Defect, DefectPriority, DefectSeverity, DefectStatus, Scan, ScanStats
+
+STATUS_COLUMNS = {
+    DefectStatus.REPORTED.value: "reported_count",
+    DefectStatus.UNDER_REVIEW.value: "review_count",
+    DefectStatus.FIXED.value: "fixed_count",
+}
+PRIORITY_COLUMNS = {
+    DefectPriority.URGENT.value: "urgent_priority_count",
+    DefectPriority.HIGH.value: "high_priority_count",
+    DefectPriority.MEDIUM.value: "medium_priority_count",
+    DefectPriority.LOW.value: "low_priority_count",
+}
+SEVERITY_COLUMNS = {
+    DefectSeverity.CRITICAL.value: "critical_severity_count",
+    DefectSeverity.HIGH.value: "high_severity_count",
+    DefectSeverity.MEDIUM.value: "medium_severity_count",
+    DefectSeverity.LOW.value: "low_severity_count",
+}
+URGENT_PRIORITIES = (DefectPriority.URGENT.value, DefectPriority.HIGH.value)
+COUNT_COLUMNS = (
+    ["defect_count"]
+    + list(STATUS_COLUMNS.values())
+    + list(PRIORITY_COLUMNS.values())
+    + list(SEVERITY_COLUMNS.values())
+    + ["open_urgent_count"]
+)
+TRACKED_FIELDS = ("scan_id", "status", "priority", "severity")
+
+
+def _columns_for(status: Optional[str], priority: Optional[str], severity: Optional[str]) -> List[str]:
+    # Missing priorities display as Medium everywhere else, so count them that way.
+    priority = priority or DefectPriority.MEDIUM.value
+    columns = ["defect_count"]
+    for mapping, value in ((STATUS_COLUMNS, status), (PRIORITY_COLUMNS, priority), (SEVERITY_COLUMNS, severity)):
+        if value in mapping:
+            columns.append(mapping[value])
+    if priority in URGENT_PRIORITIES and status != DefectStatus.FIXED.value:
+        columns.append("open_urgent_count")
+    return columns
+
+
+class StatsDelta:
+    """Counter adjustments for a set of scans, applied in one statement per scan."""
+
+    def __init__(self):
+        self.counts: Dict[int, Counter] = defaultdict(Counter)
+        self.touched: Set[int] = set()
+
+    def add(self, scan_id: int, status: Optional[str], priority: Optional[str],
+            severity: Optional[str], sign: int = 1) -> None:
+        self.touch(scan_id)
+        for column in _columns_for(status, priority, severity):
+            self.counts[scan_id][column] += sign
+
+    def touch(self, scan_id: int) -> None:
+        """Record activity on *scan_id* even if no counter changes."""
+        if scan_id is not None:
+            self.touched.add(scan_id)
+
+    def apply(self, connection, now: Optional[datetime] = None) -> None:
+        table = ScanStats.__table__
+        now = now or datetime.utcnow()
+        for scan_id in sorted(self.touched):
+            values = {
+                column: table.c[column] + amount
+                for column, amount in self.counts[scan_id].items()
+                if amount
+            }
+            values["last_activity_at"] = now
+            result = connection.execute(table.update().where(table.c.scan_id == scan_id).values(**values))
+            if result.rowcount == 0:
+                # No row yet (scan created before the rollup existed): the defects
+                # table already reflects this transaction, so count from scratch.
+                _insert_computed(connection, [scan_id], now)
+
+
+def _count_query(scan_ids: Optional[Iterable[int]] = None):
+    defects = Defect.__table__
+    priority = db.func.coalesce(defects.c.priority, DefectPriority.MEDIUM.value)
+
+    def total(condition):
+        return db.func.coalesce(db.func.sum(db.case((condition, 1), else_=0)), 0)
+
+    columns = [defects.c.scan_id, db.func.count(defects.c.id).label("defect_count")]
+    for mapping, column in ((STATUS_COLUMNS, defects.c.status), (PRIORITY_COLUMNS, priority),
+                            (SEVERITY_COLUMNS, defects.c.severity)):
+        columns.extend(total(column == value).label(name) for value, name in mapping.items())
+    columns.append(total(
+        priority.in_(URGENT_PRIORITIES) & (db.func.coalesce(defects.c.status, "") != DefectStatus.FIXED.value)
+    ).label("open_urgent_count"))
+
+    query = db.select(*columns).group_by(defects.c.scan_id)
+    if scan_ids is not None:
+        query = query.where(defects.c.scan_id.in_(list(scan_ids)))
+    return query
+
+
+def _insert_computed(connection, scan_ids: List[int], now: Optional[datetime] = None) -> None:
+    counted = {row.scan_id: row._mapping for row in connection.execute(_count_query(scan_ids))}
+    rows = []
+    for scan_id in scan_ids:
+        counts = counted.get(scan_id)
+        row = {column: int(counts[column]) if counts else 0 for column in COUNT_COLUMNS}
+        row.update(scan_id=scan_id, last_activity_at=now)
+        rows.append(row)
+    if rows:
+        connection.execute(ScanStats.__table__.insert(), rows)
+
+
+def backfill_missing(connection) -> None:
+    """Create rollup rows for scans that do not have one yet."""
+    missing = [
+        row[0]
+        for row in connection.execute(
+            db.select(Scan.__table__.c.id)
+            .select_from(Scan.__table__.outerjoin(ScanStats.__table__))
+            .where(ScanStats.__table__.c.scan_id.is_(None))
+        )
+    ]
+    if missing:
+        _insert_computed(connection, missing)
+
+
+def rebuild(connection) -> None:
+    """Recount every scan from the defects table."""
+    connection.execute(ScanStats.__table__.delete())
+    backfill_missing(connection)
+
+
+def _committed_value(obj, field: str):
+    history = inspect(obj).attrs[field].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(obj, field)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    delta = StatsDelta()
+    new_scans = []
+    for obj in session.new:
+        if isinstance(obj, Defect):
+            delta.add(obj.scan_id, obj.status, obj.priority, obj.severity)
+        elif isinstance(obj, Scan):
+            new_scans.append(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, Defect):
+            delta.add(*(_committed_value(obj, field) for field in TRACKED_FIELDS), sign=-1)
+    for obj in session.dirty:
+        if not isinstance(obj, Defect) or not session.is_modified(obj, include_collections=False):
+            continue
+        state = inspect(obj)
+        if any(state.attrs[field].history.has_changes() for field in TRACKED_FIELDS):
+            delta.add(*(_committed_value(obj, field) for field in TRACKED_FIELDS), sign=-1)
+            delta.add(obj.scan_id, obj.status, obj.priority, obj.severity)
+        else:
+            delta.touch(obj.scan_id)
+
+    if not new_scans and not delta.touched:
+        return
+    connection = session.connection()
+    if new_scans:
+        # Counted from scratch, so defects flushed with the scan are already included.
+        _insert_computed(connection, new_scans, datetime.utcnow())
+        delta.touched.difference_update(new_scans)
+    if delta.touched:
+        delta.apply(connection)
+
+
+@click.command("rebuild-scan-stats")
+@with_appcontext
+def rebuild_command() -> None:
+    """Recount the scan_stats rollup from the defects table."""
+    with db.engine.begin() as connection:
+        rebuild(connection)
+    click.echo("scan_stats rebuilt.")
+
+
+def init_app(app) -> None:
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
+    app.cli.add_command(rebuild_command)
@@ -7,12 +7,9 @@ from werkzeug.utils import secure_filename
 
 from .pdf_utils import extract_pdf_images
 
-try:
-    from pygltflib import GLTF2
-except ImportError:
-    GLTF2 = None
-
-from app.process_data.glb_snapshot import extract_snapshots
+from app.metrics import stage
+from app.querybudget import query_budget
+from app.process_data.glb_snapshot import extract_snapshots, gltf_available
 
 upload_data_bp = Blueprint("upload_data", __name__)
 
@@ -25,6 +22,7 @@ def _allowed_file(filename: str, allowed_exts) -> bool:
     return ext in allowed_exts
 
 @upload_data_bp.route("/upload-data", methods=["GET", "POST"])
+@query_budget(0)
 def upload_scan_data():
     """
     Use Case DM_01: Upload Scan Data
@@ -76,10 +74,12 @@ def upload_scan_data():
         glb_path = os.path.join(upload_root, glb_name)
         pdf_path = os.path.join(upload_root, pdf_name)
 
-        glb_file.save(glb_path)
-        pdf_file.save(pdf_path)
+        with stage("upload_scan_data.save_files"):
+            glb_file.save(glb_path)
+            pdf_file.save(pdf_path)
 
-        extracted_images = extract_pdf_images(pdf_path, image_dir)
+        with stage("upload_scan_data.extract_pdf_images"):
+            extracted_images = extract_pdf_images(pdf_path, image_dir)
         _persist_latest_upload_metadata(
             upload_root,
             {
@@ -100,7 +100,8 @@ def upload_scan_data():
             },
         )
 
-        _start_automated_data_processing(glb_path, pdf_path, scan_date, address, unit_no, notes)
+        with stage("upload_scan_data.process_defects"):
+            _start_automated_data_processing(glb_path, pdf_path, scan_date, address, unit_no, notes)
 
         flash("Scan data uploaded successfully. Automated processing has started.", "success")
         # Redirect to process data page
@@ -121,7 +122,7 @@ def _start_automated_data_processing(glb_path: str, pdf_path: str, scan_date: st
         current_app.logger.info("Notes: %s", notes)
     
     # Extract defects from GLB and save to processed folder
-    if GLTF2 is None:
+    if not gltf_available():
         current_app.logger.error("pygltflib is not installed; cannot process GLB defects")
         return
     
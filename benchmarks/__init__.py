@@ -0,0 +1 @@
+"""Benchmarks and load tests; run the modules with ``python -m benchmarks.<name>``."""
@@ -0,0 +1,182 @@
+"""Synthetic input files for the benchmarks: GLB models, PDF reports, defect JSON.
+
+Everything is generated from a seed so runs at the same scale are
+comparable across commits. The GLB snapshot nodes cycle through the shapes
+``glb_snapshot`` understands (extras dict, extras JSON string, name plus
+translation, lower-case key) so every parsing branch is exercised.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import random
+import struct
+import zlib
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+ELEMENTS = ("IfcWall", "IfcSlab", "IfcDoor", "IfcWindow", "IfcBuildingElementProxy")
+DEFECT_WORDS = ("crack", "leak", "stain", "chip", "gap", "mould", "scratch", "dent")
+
+
+def _snapshot_node(index: int, rng: random.Random) -> dict:
+    x, y, z = (round(rng.uniform(-20, 20), 4) for _ in range(3))
+    snapshot_id = f"SNAP-{index:05d}"
+    label = f"{rng.choice(DEFECT_WORDS)} near {rng.choice(ELEMENTS)} {index}"
+    element = ELEMENTS[index % len(ELEMENTS)]
+    variant = index % 4
+    if variant == 0:
+        return {"name": f"{element}/{snapshot_id}", "extras": {"Snapshot": {"id": snapshot_id, "label": label, "coordinates": {"x": x, "y": y, "z": z}}}}
+    if variant == 1:
+        payload = json.dumps({"Id": snapshot_id, "description": label, "Coordinates": [x, y, z]})
+        return {"name": f"{element}/{snapshot_id}", "extras": {"Snapshot": payload}}
+    if variant == 2:
+        return {"name": f"{element}/Snapshot-{index:05d}", "translation": [x, y, z]}
+    return {"name": f"{element}/{snapshot_id}", "extras": {"snapshot": {"ID": snapshot_id, "label": label, "coordinates": [x, y, z]}}}
+
+
+def make_glb(path: Path, nodes: int, snapshots: int, vertices: int, seed: int = 0) -> Path:
+    """Write a GLB with *nodes* mesh nodes sharing one *vertices*-vertex mesh plus *snapshots* Snapshot nodes."""
+    from pygltflib import (
+        ARRAY_BUFFER, FLOAT, GLTF2, Accessor, Asset, Attributes, Buffer, BufferView, Mesh, Node, Primitive, Scene,
+    )
+
+    rng = random.Random(seed)
+    positions = [rng.uniform(-20, 20) for _ in range(vertices * 3)]
+    blob = struct.pack(f"<{len(positions)}f", *positions)
+
+    gltf_nodes = [Node(name=f"{ELEMENTS[i % len(ELEMENTS)]}/mesh_{i}", mesh=0) for i in range(nodes)]
+    gltf_nodes.extend(Node(**_snapshot_node(i, rng)) for i in range(snapshots))
+
+    gltf = GLTF2(
+        asset=Asset(version="2.0", generator="benchmarks.fixtures"),
+        scene=0,
+        scenes=[Scene(nodes=list(range(len(gltf_nodes))))],
+        nodes=gltf_nodes,
+        meshes=[Mesh(primitives=[Primitive(attributes=Attributes(POSITION=0), mode=0)])],
+        accessors=[Accessor(
+            bufferView=0, componentType=FLOAT, count=vertices, type="VEC3",
+            min=[min(positions[axis::3]) for axis in range(3)] if vertices else None,
+            max=[max(positions[axis::3]) for axis in range(3)] if vertices else None,
+        )],
+        bufferViews=[BufferView(buffer=0, byteOffset=0, byteLength=len(blob), target=ARRAY_BUFFER)],
+        buffers=[Buffer(byteLength=len(blob))],
+    )
+    gltf.set_binary_blob(blob)
+    path = Path(path)
+    gltf.save_binary(str(path))
+    return path
+
+
+def _image_stream(width: int, height: int, rng: random.Random, jpeg: bool) -> tuple:
+    # A gradient with noise: compresses like a photo rather than a flat fill.
+    base = rng.randrange(256)
+    pixels = bytes((base + x + y + rng.randrange(16)) & 0xFF for y in range(height) for x in range(width) for _ in range(3))
+    if jpeg:
+        from PIL import Image
+
+        out = io.BytesIO()
+        Image.frombytes("RGB", (width, height), pixels).save(out, format="JPEG", quality=80)
+        return out.getvalue(), "/DCTDecode"
+    return zlib.compress(pixels), "/FlateDecode"
+
+
+def make_pdf(path: Path, pages: int, images_per_page: int, image_size: int = 128, jpeg: bool = False, seed: int = 0) -> Path:
+    """Write a PDF of *pages* pages, each showing *images_per_page* distinct RGB images."""
+    rng = random.Random(seed)
+    objects: Dict[int, bytes] = {}
+    page_ids: List[int] = []
+    next_id = 3  # 1: catalog, 2: page tree
+
+    for _ in range(pages):
+        page_id, content_id = next_id, next_id + 1
+        image_ids = list(range(next_id + 2, next_id + 2 + images_per_page))
+        next_id = next_id + 2 + images_per_page
+        page_ids.append(page_id)
+
+        drawing = []
+        for slot, image_id in enumerate(image_ids):
+            data, image_filter = _image_stream(image_size, image_size, rng, jpeg)
+            objects[image_id] = (
+                f"<< /Type /XObject /Subtype /Image /Width {image_size} /Height {image_size} "
+                f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter {image_filter} /Length {len(data)} >>\nstream\n"
+            ).encode() + data + b"\nendstream"
+            drawing.append(f"q {image_size} 0 0 {image_size} {20 + (slot % 4) * 140} {640 - (slot // 4) * 140} cm /Im{slot} Do Q")
+
+        content = "\n".join(drawing).encode()
+        objects[content_id] = f"<< /Length {len(content)} >>\nstream\n".encode() + content + b"\nendstream"
+        xobjects = " ".join(f"/Im{slot} {image_id} 0 R" for slot, image_id in enumerate(image_ids))
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /XObject << {xobjects} >> >> /Contents {content_id} 0 R >>"
+        ).encode()
+
+    objects[1] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[2] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = out.tell()
+        out.write(f"{object_id} 0 obj\n".encode() + objects[object_id] + b"\nendobj\n")
+    xref = out.tell()
+    size = max(objects) + 1
+    out.write(f"xref\n0 {size}\n0000000000 65535 f \n".encode())
+    for object_id in range(1, size):
+        out.write(f"{offsets[object_id]:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+    path = Path(path)
+    path.write_bytes(out.getvalue())
+    return path
+
+
+def defect_entries(count: int, seed: int = 0) -> List[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"SNAP-{index:05d}",
+            "description": f"{rng.choice(DEFECT_WORDS)} near {rng.choice(ELEMENTS)} {index}",
+            "coordinates": {axis: round(rng.uniform(-20, 20), 4) for axis in "xyz"},
+            "element": ELEMENTS[index % len(ELEMENTS)],
+            "defect_type": rng.choice(("Crack", "Water Damage", "Finish", "Structural")),
+            "severity": rng.choice(("Low", "Medium", "High", "Critical")),
+        }
+        for index in range(count)
+    ]
+
+
+def make_defects_json(path: Path, count: int, seed: int = 0) -> Path:
+    """Write a Metaroom-style ``defects.json`` with *count* defects."""
+    path = Path(path)
+    path.write_text(json.dumps({"source_file": "benchmark.glb", "defects": defect_entries(count, seed)}))
+    return path
+
+
+def upload_metadata(defect_ids: Sequence[str], images: int, image_dir: str, seed: int = 0) -> dict:
+    """``latest_upload.json`` contents whose image names exercise every auto-assign pass.
+
+    A third of the files carry a defect id, a third share a word with a
+    defect description and the rest only match by position.
+    """
+    rng = random.Random(seed)
+    entries = []
+    for index in range(images):
+        kind = index % 3
+        if kind == 0 and defect_ids:
+            name = f"{rng.choice(defect_ids).lower()}_photo.jpg"
+        elif kind == 1:
+            name = f"page{index:03d}_{rng.choice(DEFECT_WORDS)}.jpg"
+        else:
+            name = f"page{index:03d}_img{index}.png"
+        entries.append({"id": f"img_{index + 1}", "file": name, "page": index // 4 + 1, "width": 128, "height": 128})
+    return {
+        "id": "upload_benchmark",
+        "project_name": "Benchmark",
+        "image_dir": image_dir,
+        "images": entries,
+        "assignments": {"defect_to_image": {}},
+    }
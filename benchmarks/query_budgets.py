@@ -0,0 +1,277 @@
+"""Check every route's SQL statement count against its ``@query_budget``.
+
+Each route of the defects, developer, process_data and upload_data
+blueprints is requested once per dataset size (:mod:`benchmarks.seed`
+for the database, :mod:`benchmarks.fixtures` for the uploaded GLB and
+PDF) through the test client, and the statements it issues are counted
+with :func:`app.querybudget.count_queries`. Caches are invalidated before
+every request, so the count is the cold path.
+
+The run fails when a route
+
+* has no ``@query_budget``,
+* issues more statements than its budget, or
+* issues more statements on the large dataset than on the small one (the
+  count depends on the data: an N+1 loop).
+
+::
+
+    python -m benchmarks.query_budgets
+    python -m benchmarks.query_budgets --verbose   # print the statements of failing routes
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from . import fixtures
+
+BLUEPRINTS = ("defects", "developer", "process_data", "upload_data")
+
+
+class Size(NamedTuple):
+    scans: int
+    defects_per_scan: int
+    activity_per_scan: int
+    snapshots: int
+    pdf_pages: int
+    pdf_images_per_page: int
+
+
+SIZES: Dict[str, Size] = {
+    "small": Size(3, 20, 10, 4, 1, 2),
+    "large": Size(30, 300, 100, 60, 4, 3),
+}
+
+
+class Check(NamedTuple):
+    endpoint: str
+    method: str
+    path: str
+    # Extra test-client keyword arguments (query_string, data, json), built once the dataset exists.
+    options: Callable[["Dataset"], dict] = lambda dataset: {}
+
+
+class Dataset(NamedTuple):
+    glb: bytes
+    pdf: bytes
+    scan_id: int = 0
+    defect_ids: List[int] = []
+    image_id: str = ""
+    snapshot_id: str = ""
+    image_path: str = ""
+    profile: str = ""
+
+    def upload(self) -> dict:
+        return {
+            "glb_model": (io.BytesIO(self.glb), "budget.glb"),
+            "pdf_report": (io.BytesIO(self.pdf), "budget.pdf"),
+            "project_name": "Budget",
+        }
+
+
+def _checks() -> List[Check]:
+    return [
+        # upload_data first: it writes the GLB, PDF images and latest_upload.json the other routes read.
+        Check("upload_data.upload_scan_data", "GET", "/upload-data"),
+        Check("upload_data.upload_scan_data", "POST", "/upload-data", lambda d: {"data": d.upload()}),
+        Check("process_data.process_defect_file", "GET", "/process-data"),
+        Check("process_data.process_defect_file_json", "GET", "/process-data.json"),
+        Check("process_data.serve_extracted_image", "GET", "/process-data/image/{image_id}"),
+        Check("process_data.process_defect_file", "POST", "/process-data",
+              lambda d: {"data": {"save_to_db": "1", "scan_name": "budget"}}),
+        Check("process_data.assign_image_to_defect", "POST", "/process-data/assign-image",
+              lambda d: {"data": {"action": "assign", "image_id": d.image_id, "defect_id": d.snapshot_id}}),
+        Check("defects.list_projects", "GET", "/projects"),
+        Check("defects.visualize_scan", "GET", "/scans/{scan_id}/visualize"),
+        Check("defects.view_project", "GET", "/project/{scan_id}"),
+        Check("defects.get_scan_defects", "GET", "/scans/{scan_id}/defects"),
+        Check("defects.query_defects_bbox", "GET", "/scans/{scan_id}/defects/bbox",
+              lambda d: {"query_string": {"min_x": -10, "min_y": -10, "min_z": 0, "max_x": 10, "max_y": 10, "max_z": 10}}),
+        Check("defects.query_defects_radius", "GET", "/scans/{scan_id}/defects/radius",
+              lambda d: {"query_string": {"x": 0, "y": 0, "z": 5, "r": 10}}),
+        Check("defects.query_defects_nearest", "GET", "/scans/{scan_id}/defects/nearest",
+              lambda d: {"query_string": {"x": 0, "y": 0, "z": 5, "k": 10}}),
+        Check("defects.get_defect_clusters", "GET", "/scans/{scan_id}/defects/clusters"),
+        Check("defects.get_voxel_heatmap", "GET", "/scans/{scan_id}/defects/voxel-heatmap"),
+        Check("defects.get_defect_details", "GET", "/defect/{defect_0}"),
+        Check("defects.serve_defect_image", "GET", "/defects/image/{defect_0}"),
+        Check("defects.serve_model", "GET", "/scans/{scan_id}/model"),
+        Check("defects.scan_events", "GET", "/scans/{scan_id}/events"),
+        Check("defects.all_events", "GET", "/events"),
+        Check("defects.update_defect_status", "PUT", "/defect/{defect_1}/status",
+              lambda d: {"json": {"status": "Under Review", "notes": "checked"}}),
+        Check("defects.create_defect", "POST", "/scans/{scan_id}/defects",
+              lambda d: {"json": {"x": 1, "y": 2, "z": 3, "description": "budget check"}}),
+        Check("defects.batch_update_defects", "POST", "/scans/{scan_id}/defects/batch",
+              lambda d: {"json": {"operations": [
+                  {"op": "create", "data": {"x": 1, "y": 1, "z": 1}},
+                  *({"op": "update", "id": defect_id, "data": {"status": "Fixed"}} for defect_id in d.defect_ids[2:6]),
+                  {"op": "delete", "id": d.defect_ids[6]},
+              ]}}),
+        Check("defects.delete_defect", "DELETE", "/defect/{defect_7}"),
+        Check("developer.dashboard", "GET", "/developer"),
+        Check("developer.view_scan", "GET", "/developer/scan/{scan_id}"),
+        Check("developer.get_charts_data", "GET", "/developer/scan/{scan_id}/charts-data"),
+        Check("developer.get_heatmap_data", "GET", "/developer/scan/{scan_id}/heatmap-data"),
+        Check("developer.serve_defect_image", "GET", "/developer/image/{image_path}"),
+        Check("developer.update_defect_progress", "POST", "/developer/defect/{defect_8}/update",
+              lambda d: {"data": {"status": "Fixed", "priority": "High", "notes": "done"}}),
+        Check("developer.bulk_update_defects", "POST", "/developer/scan/{scan_id}/bulk-update",
+              lambda d: {"data": {"defect_ids[]": [str(defect_id) for defect_id in d.defect_ids[9:]], "bulk_status": "Under Review"}}),
+        Check("developer.export_scan_csv", "GET", "/developer/scan/{scan_id}/export-csv"),
+        Check("developer.export_scans_csv", "GET", "/developer/export-csv"),
+        Check("developer.export_scans_csv", "GET", "/developer/export-csv",
+              lambda d: {"query_string": {"status_filter": "in_progress", "date_range": "month"}}),
+        Check("developer.export_columnar", "GET", "/developer/export/defects.parquet",
+              lambda d: {"query_string": {"scan_id": d.scan_id}}),
+        Check("developer.search_defects", "GET", "/developer/search", lambda d: {"query_string": {"q": "crack"}}),
+        Check("developer.get_time_in_status", "GET", "/developer/sla/time-in-status"),
+        Check("developer.get_overdue_defects", "GET", "/developer/sla/overdue"),
+        Check("developer.get_recent_activity", "GET", "/developer/recent-activity"),
+        Check("developer.get_activity_feed", "GET", "/developer/activity"),
+        Check("developer.list_profiles", "GET", "/developer/profiles"),
+        Check("developer.view_profile", "GET", "/developer/profiles/{profile}"),
+    ]
+
+
+def run_size(name: str, size: Size, workdir: Path) -> Tuple[Dict[str, int], Dict[str, List[str]]]:
+    """Request every check once against a fresh dataset; returns the count and statements per check."""
+    from app import caching, create_app, migrations, profiling, stats
+    from app.changes import mark_scans_changed
+    from app.config import Config
+    from app.extensions import db
+    from app.models import Defect, Scan
+    from app.querybudget import count_queries
+
+    from .seed import seed
+
+    root = workdir / name
+    instance = root / "instance"
+    instance.mkdir(parents=True)
+
+    class BudgetConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{root / 'budget.db'}"
+        SQLALCHEMY_BINDS = {}
+        PROFILING_ENABLED = False
+        QUERY_BUDGET_MODE = "off"
+
+    app = create_app(BudgetConfig)
+    app.instance_path = str(instance)
+    client = app.test_client()
+
+    with app.app_context():
+        migrations.upgrade(db.engine)
+        scan_ids = seed(size.scans, size.defects_per_scan, size.activity_per_scan)
+    # One stored profile for the profile pages.
+    with app.app_context():
+        token = profiling.make_token(app)
+    client.get("/healthz", headers={profiling.HEADER: token})
+
+    glb = fixtures.make_glb(root / "budget.glb", size.snapshots * 4, size.snapshots, 200).read_bytes()
+    pdf = fixtures.make_pdf(root / "budget.pdf", size.pdf_pages, size.pdf_images_per_page).read_bytes()
+    dataset = Dataset(glb, pdf)
+
+    def prepare() -> Dataset:
+        # Called after the upload so the image and snapshot ids exist.
+        metadata = json.loads((instance / "uploads" / "upload_data" / "latest_upload.json").read_text())
+        image = metadata["images"][0]
+        image_path = f"{Path(metadata['image_dir']).name}/{image['file']}"
+        scan_id = scan_ids[len(scan_ids) // 2]
+        with app.app_context():
+            db.session.execute(db.update(Scan).where(Scan.id == scan_id).values(model_path="budget.glb"))
+            defect_ids = list(db.session.scalars(db.select(Defect.id).where(Defect.scan_id == scan_id).order_by(Defect.id)))
+            db.session.execute(db.update(Defect).where(Defect.id == defect_ids[0]).values(image_path=image_path))
+            # The write checks change these defects; start them from the same state at every size.
+            db.session.execute(db.update(Defect).where(Defect.id.in_(defect_ids)).values(status="Reported", priority="Medium"))
+            stats.rebuild(db.session.connection())
+            db.session.commit()
+            profile = profiling.slowest(1)[0]["name"]
+        from app.process_data.routes import _parse_defects_from_glb
+
+        snapshot_id = _parse_defects_from_glb(str(root / "budget.glb"))[0].id
+        return Dataset(glb, pdf, scan_id, defect_ids, image["id"], snapshot_id, image_path, profile)
+
+    counts: Dict[str, int] = {}
+    statements: Dict[str, List[str]] = {}
+    for check in _checks():
+        if not dataset.scan_id and not check.endpoint.startswith("upload_data."):
+            dataset = prepare()
+        path = check.path.format(
+            scan_id=dataset.scan_id, image_id=dataset.image_id, image_path=dataset.image_path, profile=dataset.profile,
+            **{f"defect_{index}": defect_id for index, defect_id in enumerate(dataset.defect_ids[:10])},
+        )
+        with app.app_context():
+            mark_scans_changed(db.session, scan_ids)
+            db.session.commit()
+        caching.responses.clear()
+
+        streamed = check.endpoint.endswith("_events")
+        with count_queries() as log:
+            response = client.open(path, method=check.method, buffered=not streamed, **check.options(dataset))
+        response.close()
+        if response.status_code >= 400:
+            raise RuntimeError(f"[{name}] {check.method} {path} answered {response.status_code}")
+
+        label = f"{check.method} {check.endpoint}"
+        counts[label] = max(counts.get(label, 0), log.count)
+        statements[label] = log.statements
+    with app.app_context():
+        db.engine.dispose()
+    return counts, statements
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--verbose", action="store_true", help="print the statements of failing routes")
+    args = parser.parse_args(argv)
+
+    from app import create_app
+    from app.querybudget import budget_for
+
+    app = create_app()
+    views = {
+        rule.endpoint: app.view_functions[rule.endpoint]
+        for rule in app.url_map.iter_rules()
+        if rule.endpoint.split(".")[0] in BLUEPRINTS
+    }
+    checked = {check.endpoint for check in _checks()}
+
+    with tempfile.TemporaryDirectory(prefix="ldms-budgets-") as workdir:
+        (small, _), (large, statements) = (run_size(name, size, Path(workdir)) for name, size in SIZES.items())
+
+    failures = []
+    for endpoint in sorted(set(views) - checked):
+        failures.append(f"{endpoint}: not exercised by benchmarks.query_budgets")
+    for endpoint, view in sorted(views.items()):
+        if budget_for(view) is None:
+            failures.append(f"{endpoint}: no @query_budget")
+
+    print(f"{'route':<52} {'budget':>6} {'small':>6} {'large':>6}")
+    for label in small:
+        endpoint = label.split(" ", 1)[1]
+        budget = budget_for(views[endpoint])
+        print(f"{label:<52} {budget if budget is not None else '-':>6} {small[label]:>6} {large[label]:>6}")
+        failed = False
+        if budget is not None and large[label] > budget:
+            failures.append(f"{label}: {large[label]} statements, budget is {budget}")
+            failed = True
+        if large[label] > small[label]:
+            failures.append(f"{label}: {small[label]} statements on the small dataset but {large[label]} on the large one")
+            failed = True
+        if failed and args.verbose:
+            for index, statement in enumerate(statements[label]):
+                print(f"    {index + 1}. {' '.join(statement.split())[:160]}")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
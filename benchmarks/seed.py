@@ -0,0 +1,90 @@
+"""Fill a migrated database with synthetic scans, defects and activity.
+
+Rows go in with bulk ``INSERT``s, which bypass the ORM flush hooks, so the
+``scan_stats`` rollup is rebuilt afterwards; the search index and status
+timestamps are maintained by the database and column defaults. Call
+:func:`seed` inside an app context.
+"""
+
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta
+from typing import List
+
+from app import stats
+from app.extensions import db
+from app.models import ActivityLog, Defect, DefectPriority, DefectSeverity, DefectStatus, Scan
+
+from .fixtures import DEFECT_WORDS, ELEMENTS
+
+CHUNK = 5_000
+LOCATIONS = ("Kitchen", "Bathroom", "Bedroom", "Living Room", "Hallway", "Balcony")
+DEFECT_TYPES = ("Crack", "Water Damage", "Structural", "Finish", "Electrical", "Plumbing")
+ACTIONS = ("updated status", "updated priority", "added notes")
+
+
+def _insert(model, rows: List[dict]) -> None:
+    for start in range(0, len(rows), CHUNK):
+        db.session.execute(db.insert(model), rows[start:start + CHUNK])
+
+
+def seed(scans: int, defects_per_scan: int, activity_per_scan: int = 0, seed: int = 0) -> List[int]:
+    """Insert *scans* scans with their defects and activity; returns the new scan ids."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    statuses = [status.value for status in DefectStatus]
+    priorities = [priority.value for priority in DefectPriority]
+    severities = [severity.value for severity in DefectSeverity]
+
+    scan_ids = list(db.session.scalars(
+        db.insert(Scan).returning(Scan.id, sort_by_parameter_order=True),
+        [{"name": f"bench_scan_{index}", "model_path": "benchmark.glb", "version": 0} for index in range(scans)],
+    ))
+
+    defects = []
+    for scan_id in scan_ids:
+        for index in range(defects_per_scan):
+            created = now - timedelta(days=rng.uniform(0, 90))
+            defects.append({
+                "scan_id": scan_id,
+                "x": rng.uniform(-20, 20),
+                "y": rng.uniform(-20, 20),
+                "z": rng.uniform(0, 10),
+                "element": rng.choice(ELEMENTS),
+                "location": rng.choice(LOCATIONS),
+                "defect_type": rng.choice(DEFECT_TYPES),
+                "severity": rng.choice(severities),
+                "priority": rng.choice(priorities),
+                "description": f"{rng.choice(DEFECT_WORDS)} on {rng.choice(ELEMENTS)} {index}",
+                "status": rng.choice(statuses),
+                "created_at": created,
+                "status_changed_at": created + timedelta(seconds=rng.uniform(0, (now - created).total_seconds())),
+                "updated_at": created,
+            })
+    _insert(Defect, defects)
+
+    if activity_per_scan:
+        defect_ids = db.session.execute(db.select(Defect.scan_id, Defect.id).where(Defect.scan_id.in_(scan_ids))).all()
+        by_scan = {}
+        for scan_id, defect_id in defect_ids:
+            by_scan.setdefault(scan_id, []).append(defect_id)
+        activity = []
+        for scan_id in scan_ids:
+            candidates = by_scan.get(scan_id)
+            if not candidates:
+                continue
+            for _ in range(activity_per_scan):
+                activity.append({
+                    "scan_id": scan_id,
+                    "defect_id": rng.choice(candidates),
+                    "action": rng.choice(ACTIONS),
+                    "old_value": rng.choice(statuses),
+                    "new_value": rng.choice(statuses),
+                    "timestamp": now - timedelta(minutes=rng.uniform(0, 60 * 24 * 30)),
+                })
+        _insert(ActivityLog, activity)
+
+    stats.rebuild(db.session.connection())
+    db.session.commit()
+    return scan_ids
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""Measure how long a fresh worker takes to import the package and build the app.
+
+Every run happens in a new interpreter, the way a gunicorn worker (or a
+recycled one) starts, and reports:
+
+* ``import``: ``import app``
+* ``create_app``: ``create_app()`` after the import
+* ``db_connections``: connections opened while doing both (should be 0)
+* ``heavy_modules``: which optional parsers were loaded (should be none)
+
+Usage::
+
+    python benchmarks/startup.py --runs 10 --json startup.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+# Modules that should only be imported by the request paths that need them.
+HEAVY_MODULES = ("pygltflib", "pypdf", "PIL", "pyarrow", "redis")
+
+_PROBE = """
+import json, sys, time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+connections = []
+event.listen(Engine, "connect", lambda *args: connections.append(1))
+
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+created = time.perf_counter()
+
+print(json.dumps({
+    "import": imported - started,
+    "create_app": created - imported,
+    "db_connections": len(connections),
+    "heavy_modules": sorted(name for name in %r if name in sys.modules),
+}))
+""" % (HEAVY_MODULES,)
+
+
+def _run_once() -> Dict[str, Any]:
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        cwd=REPO_ROOT,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "0"},
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "min_ms": round(min(values) * 1000, 2),
+        "median_ms": round(statistics.median(values) * 1000, 2),
+        "max_ms": round(max(values) * 1000, 2),
+    }
+
+
+def run(runs: int) -> Dict[str, Any]:
+    _run_once()  # warm the bytecode cache so every measured run is comparable
+    samples = [_run_once() for _ in range(runs)]
+    return {
+        "runs": runs,
+        "python": sys.version.split()[0],
+        "import": _summary([sample["import"] for sample in samples]),
+        "create_app": _summary([sample["create_app"] for sample in samples]),
+        "total": _summary([sample["import"] + sample["create_app"] for sample in samples]),
+        "db_connections": max(sample["db_connections"] for sample in samples),
+        "heavy_modules": sorted({name for sample in samples for name in sample["heavy_modules"]}),
+    }
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="fresh interpreters to time (default: 10)")
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    result = run(args.runs)
+    for stage in ("import", "create_app", "total"):
+        timing = result[stage]
+        print(f"{stage:<12} median {timing['median_ms']:>8.2f} ms  (min {timing['min_ms']:.2f}, max {timing['max_ms']:.2f})")
+    print(f"db connections during start-up: {result['db_connections']}")
+    print(f"heavy modules loaded: {', '.join(result['heavy_modules']) or 'none'}")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(result, indent=2) + "\n")
+    return 1 if result["db_connections"] or result["heavy_modules"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,228 @@
+"""Time the ingest helpers and the heaviest read views at several input scales.
+
+For every scale the suite generates a GLB, a PDF and a ``defects.json``
+(:mod:`benchmarks.fixtures`), seeds a fresh SQLite database
+(:mod:`benchmarks.seed`) and times:
+
+* ``extract_snapshots``, ``extract_pdf_images``, ``_auto_assign_images``
+  and ``_parse_defects_from_file`` called directly;
+* the save-to-DB path (``POST /process-data`` with ``save_to_db``);
+* the dashboard, scan detail and chart queries through the test client,
+  with the response cache cleared so every run does the database work.
+
+Results go to ``benchmarks/results/<UTC time>-<commit>.json``. Pass
+``--compare`` with an earlier file to print the change per benchmark, and
+``--fail-over`` to exit non-zero when anything slowed down by more than that
+percentage::
+
+    python -m benchmarks.suite --scale small --scale medium --repeat 5
+    python -m benchmarks.suite --compare benchmarks/results/<earlier>.json --fail-over 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from . import fixtures
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+class Scale(NamedTuple):
+    glb_nodes: int
+    glb_snapshots: int
+    glb_vertices: int
+    pdf_pages: int
+    pdf_images_per_page: int
+    images: int
+    scans: int
+    defects_per_scan: int
+    activity_per_scan: int
+
+
+SCALES: Dict[str, Scale] = {
+    "small": Scale(200, 20, 1_000, 5, 2, 10, 10, 50, 20),
+    "medium": Scale(2_000, 200, 20_000, 20, 4, 80, 50, 200, 100),
+    "large": Scale(10_000, 1_000, 100_000, 50, 6, 300, 200, 500, 500),
+}
+
+
+def measure(fn: Callable, repeat: int, setup: Optional[Callable[[], tuple]] = None) -> Dict[str, float]:
+    """Run *fn* *repeat* times (after an untimed warm-up) and summarise the wall times in ms."""
+    fn(*(setup() if setup else ()))
+    samples = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        started = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "runs": repeat,
+        "min_ms": round(min(samples), 3),
+        "median_ms": round(statistics.median(samples), 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "max_ms": round(max(samples), 3),
+    }
+
+
+def _expect(response, *statuses: int):
+    if response.status_code not in statuses:
+        raise RuntimeError(f"{response.request.path} answered {response.status_code}")
+    return response
+
+
+def run_scale(name: str, scale: Scale, workdir: Path, repeat: int) -> List[Dict[str, Any]]:
+    from app import caching, create_app, migrations
+    from app.config import Config
+    from app.extensions import db
+    from app.process_data.glb_snapshot import extract_snapshots
+    from app.process_data.routes import _auto_assign_images, _parse_defects_from_file, _parse_defects_from_glb
+    from app.upload_data.pdf_utils import extract_pdf_images
+
+    root = workdir / name
+    instance = root / "instance"
+    processed = instance / "processed" / "module1"
+    uploads = instance / "uploads" / "upload_data"
+    processed.mkdir(parents=True)
+    uploads.mkdir(parents=True)
+
+    glb = fixtures.make_glb(root / "model.glb", scale.glb_nodes, scale.glb_snapshots, scale.glb_vertices)
+    pdf = fixtures.make_pdf(root / "report.pdf", scale.pdf_pages, scale.pdf_images_per_page)
+    defects_json = fixtures.make_defects_json(processed / "defects.json", scale.glb_snapshots)
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{root / 'bench.db'}"
+        SQLALCHEMY_BINDS = {}
+        PROFILING_ENABLED = False
+
+    app = create_app(BenchConfig)
+    app.instance_path = str(instance)
+    client = app.test_client()
+    results = []
+
+    def record(benchmark: str, params: Dict[str, Any], timing: Dict[str, float]) -> None:
+        results.append({"scale": name, "benchmark": benchmark, "params": params, **timing})
+        print(f"  {benchmark:<32} median {timing['median_ms']:>10.2f} ms")
+
+    print(f"[{name}] {scale}")
+    with app.app_context():
+        migrations.upgrade(db.engine)
+        from .seed import seed
+
+        scan_ids = seed(scale.scans, scale.defects_per_scan, scale.activity_per_scan)
+
+        record("extract_snapshots", {"nodes": scale.glb_nodes, "snapshots": scale.glb_snapshots, "vertices": scale.glb_vertices},
+               measure(lambda: extract_snapshots(glb), repeat))
+
+        image_dir = root / "images"
+        record("extract_pdf_images", {"pages": scale.pdf_pages, "images_per_page": scale.pdf_images_per_page},
+               measure(lambda: extract_pdf_images(str(pdf), str(image_dir)), repeat,
+                       setup=lambda: (shutil.rmtree(image_dir, ignore_errors=True), ())[1]))
+
+        defects = _parse_defects_from_glb(str(glb))
+        metadata = fixtures.upload_metadata([defect.id for defect in defects], scale.images, str(image_dir))
+        record("_auto_assign_images", {"defects": len(defects), "images": scale.images},
+               measure(_auto_assign_images, repeat, setup=lambda: (copy.deepcopy(metadata), defects)))
+
+        record("_parse_defects_from_file", {"defects": scale.glb_snapshots},
+               measure(lambda: _parse_defects_from_file(str(defects_json)), repeat))
+
+    # The routes below run through the test client, each request in its own context.
+    (uploads / "latest_upload.json").write_text(json.dumps(metadata))
+    record("save_to_db", {"defects": scale.glb_snapshots},
+           measure(lambda: _expect(client.post("/process-data", data={"save_to_db": "1", "scan_name": "bench"}), 302), repeat))
+
+    scan_id = scan_ids[len(scan_ids) // 2]
+    views = {
+        "dashboard": "/developer",
+        "scan_detail": f"/developer/scan/{scan_id}",
+        "scan_charts": f"/developer/scan/{scan_id}/charts-data",
+        "scan_defects_json": f"/scans/{scan_id}/defects",
+    }
+    for benchmark, url in views.items():
+        record(benchmark, {"scans": scale.scans, "defects_per_scan": scale.defects_per_scan},
+               measure(lambda url=url: _expect(client.get(url), 200), repeat, setup=lambda: (caching.responses.clear(), ())[1]))
+
+    with app.app_context():
+        db.engine.dispose()
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=Path(__file__).resolve().parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: List[Dict[str, Any]], baseline_path: Path) -> List[Dict[str, Any]]:
+    """Median change per (scale, benchmark) present in both runs, in percent."""
+    baseline = {(row["scale"], row["benchmark"]): row for row in json.loads(baseline_path.read_text())["results"]}
+    changes = []
+    for row in current:
+        before = baseline.get((row["scale"], row["benchmark"]))
+        if not before or not before["median_ms"]:
+            continue
+        changes.append({
+            "scale": row["scale"],
+            "benchmark": row["benchmark"],
+            "before_ms": before["median_ms"],
+            "after_ms": row["median_ms"],
+            "change_pct": round((row["median_ms"] - before["median_ms"]) / before["median_ms"] * 100, 1),
+        })
+    return changes
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", action="append", choices=sorted(SCALES), help="scale to run (repeatable; default: small, medium)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark (default: 5)")
+    parser.add_argument("--output", type=Path, help=f"results file (default: {RESULTS_DIR}/<time>-<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier results file to compare against")
+    parser.add_argument("--fail-over", type=float, help="with --compare, exit 1 if any median grew by more than this percent")
+    args = parser.parse_args(argv)
+
+    scales = args.scale or ["small", "medium"]
+    results = []
+    with tempfile.TemporaryDirectory(prefix="ldms-bench-") as workdir:
+        for name in scales:
+            results.extend(run_scale(name, SCALES[name], Path(workdir), args.repeat))
+
+    commit = _git_commit()
+    report = {
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "scales": {name: SCALES[name]._asdict() for name in scales},
+        "results": results,
+    }
+    output = args.output or RESULTS_DIR / f"{datetime.utcnow():%Y%m%dT%H%M%S}-{commit or 'unknown'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"results written to {output}")
+
+    if args.compare:
+        changes = compare(results, args.compare)
+        for change in changes:
+            print(f"  {change['scale']:<7} {change['benchmark']:<32} {change['before_ms']:>10.2f} -> {change['after_ms']:>10.2f} ms  ({change['change_pct']:+.1f}%)")
+        if args.fail_over is not None and any(change["change_pct"] > args.fail_over for change in changes):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
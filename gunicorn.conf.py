@@ -0,0 +1,87 @@
+"""Gunicorn settings, read from the environment.
+
+    GUNICORN_BIND             address to listen on (default 0.0.0.0:5000)
+    WEB_CONCURRENCY           worker processes (default 2 x CPUs + 1 with a shared
+                              EVENTS_BROKER_URL, else 1)
+    GUNICORN_THREADS          page-serving threads per worker (default 4; > 1 uses gthread)
+    EVENTS_MAX_STREAMS        Server-Sent Events streams per worker (default 25, as in
+                              app/config.py); served by that many extra threads
+    GUNICORN_TIMEOUT          seconds before a silent worker is killed (default 60)
+    GUNICORN_MAX_REQUESTS     recycle a worker after this many requests (default 1000, 0 = never)
+    GUNICORN_PRELOAD          import the app once in the master (default true)
+    PROMETHEUS_MULTIPROC_DIR  directory where workers share /metrics values (see app/metrics.py);
+                              cleared on start
+
+With threads, each worker can hold up to GUNICORN_THREADS database
+connections at once, so keep WEB_CONCURRENCY x GUNICORN_THREADS within
+DB_POOL_SIZE + DB_MAX_OVERFLOW per worker and the server's connection
+limit overall. Server-Sent Events streams each occupy a thread for as long
+as the client stays connected but hold no database connection; each worker
+gets EVENTS_MAX_STREAMS threads for them on top of GUNICORN_THREADS, so
+open viewers never take threads from pages. Size it for the expected
+viewers: WEB_CONCURRENCY x EVENTS_MAX_STREAMS streams in total, beyond
+which clients fall back to polling.
+
+More than one worker needs a shared events broker (EVENTS_BROKER_URL =
+redis://...): the local broker only reaches clients of the worker that made
+the change. Without one the default is a single worker, and an explicit
+WEB_CONCURRENCY above 1 refuses to start.
+"""
+
+import glob
+import multiprocessing
+import os
+
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+shared_broker = (os.environ.get("EVENTS_BROKER_URL") or "local") != "local"
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1 if shared_broker else 1))
+event_streams = max(int(os.environ.get("EVENTS_MAX_STREAMS", 25)), 0)
+threads = int(os.environ.get("GUNICORN_THREADS", 4)) + event_streams
+worker_class = "gthread" if threads > 1 else "sync"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", max_requests // 10))
+preload_app = _env_bool("GUNICORN_PRELOAD", True)
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-")
+errorlog = "-"
+
+
+def on_starting(server):
+    if workers > 1 and not shared_broker:
+        raise RuntimeError(
+            f"WEB_CONCURRENCY={workers} with EVENTS_BROKER_URL=local: live updates would only reach "
+            "clients of the worker that made the change. Set EVENTS_BROKER_URL=redis://... or WEB_CONCURRENCY=1."
+        )
+    metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        # Values left by an earlier run would be summed into this one's
+        os.makedirs(metrics_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(metrics_dir, "*.db")):
+            os.remove(path)
+
+
+def post_fork(server, worker):
+    # With preload_app the engines were created in the master; connections
+    # must not be shared across processes, so each worker starts a fresh pool.
+    if preload_app:
+        from app.database import dispose_engines
+        from wsgi import app
+
+        dispose_engines(app)
+
+
+def child_exit(server, worker):
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)